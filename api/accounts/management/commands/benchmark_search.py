@@ -0,0 +1,98 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import models, transaction
+
+from core.models import SearchToken
+from accounts.models import Tenant
+
+FIRST_NAMES = ('Adam', 'Alice', 'Bruno', 'Camille', 'Chloé', 'David',
+               'Elena', 'Hugo', 'Inès', 'James', 'Julia', 'Léa', 'Lucas',
+               'Maria', 'Noah', 'Olivia', 'Paul', 'Rosa', 'Sofia', 'Zoë')
+LAST_NAMES = ('Almeida', 'Bernard', 'Brown', 'Costa', 'Dubois', 'Fischer',
+              'García', 'Jones', 'Martin', 'Müller', "O'Brien", 'Petit',
+              'Rossi', 'Santos', 'Schmidt', 'Silva', 'Smith', 'Taylor')
+
+
+class Command(BaseCommand):
+    help = ('Compares tenant name searches through search tokens with '
+            'leading wildcard searches on a rolled back set of tenants')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--tenants', type=int, default=1000000,
+            help='number of tenants created for the benchmark')
+        parser.add_argument(
+            '--queries', type=int, default=100,
+            help='number of searches timed for each implementation')
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='number of tenants inserted per batch')
+
+    def handle(self, *args, **options):
+        self.random = random.Random(0)
+        with transaction.atomic():
+            self.create_tenants(options['tenants'], options['batch_size'])
+            queries = [self.get_query() for x in range(options['queries'])]
+            self.stdout.write('{:<10}{:>10}{:>12}{:>12}'.format(
+                'search', 'queries', 'avg ms', 'max ms'))
+            for name, search in (('tokens', self.search_tokens),
+                                 ('icontains', self.search_icontains)):
+                timings = [self.time_search(search, query)
+                           for query in queries]
+                self.stdout.write('{:<10}{:>10}{:>12.2f}{:>12.2f}'.format(
+                    name, len(timings),
+                    sum(timings) / len(timings) if timings else 0,
+                    max(timings) if timings else 0))
+            transaction.set_rollback(True)
+
+    def get_name(self, names):
+        # random suffixes spread names the way real ones are
+        suffix = ''.join(self.random.choice('aeilnorstu')
+                         for x in range(self.random.randint(0, 4)))
+        return self.random.choice(names) + suffix
+
+    def get_query(self):
+        first_name = self.get_name(FIRST_NAMES)
+        query = first_name[:self.random.randint(2, len(first_name))]
+        if self.random.random() < 0.5:
+            last_name = self.get_name(LAST_NAMES)
+            query += ' ' + last_name[:self.random.randint(1, len(last_name))]
+        return query
+
+    def create_tenants(self, count, batch_size):
+        created = 0
+        while created < count:
+            size = min(batch_size, count - created)
+            tenants = [Tenant(first_name=self.get_name(FIRST_NAMES),
+                              last_name=self.get_name(LAST_NAMES),
+                              email='tenant{}@benchmark.com'.format(
+                                  created + index))
+                       for index in range(size)]
+            Tenant.objects.bulk_create(tenants)
+            SearchToken.objects.index(tenants, *Tenant.search_fields)
+            created += size
+
+    def search_tokens(self, query):
+        return Tenant.objects.order_by('first_name', 'last_name').search(
+            query)
+
+    def search_icontains(self, query):
+        condition = models.Q()
+        for word in query.split():
+            condition &= (models.Q(first_name__icontains=word) |
+                          models.Q(last_name__icontains=word))
+        return Tenant.objects.filter(condition).order_by(
+            'first_name', 'last_name')
+
+    def time_search(self, search, query):
+        """Returns the milliseconds taken to count and fetch a first page"""
+        start = time.time()
+        queryset = search(query)
+        queryset.count()
+        list(queryset[:20])
+        return (time.time() - start) * 1000
@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:09
+# flake8: noqa
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_auto_20171001_2011'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='landlord',
+            index=models.Index(fields=['first_name', 'last_name', 'id'], name='landlord_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='tenant',
+            index=models.Index(fields=['first_name', 'last_name', 'id'], name='tenant_name_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:21
+# flake8: noqa
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_auto_20261018_0609'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='landlord',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='date and time of the last change'),
+        ),
+        migrations.AddField(
+            model_name='tenant',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, help_text='date and time of the last change'),
+        ),
+    ]
@@ -1,14 +1,26 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from django.db import models
+
 from core.models import PropertyBaseUser
 
 
 class Landlord(PropertyBaseUser):
     """Landlord user representation"""
-    pass
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['first_name', 'last_name', 'id'],
+                         name='landlord_name_idx'),
+        ]
 
 
 class Tenant(PropertyBaseUser):
     """Tenant user representation"""
-    pass
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['first_name', 'last_name', 'id'],
+                         name='tenant_name_idx'),
+        ]
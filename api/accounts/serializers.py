@@ -3,18 +3,20 @@ from __future__ import unicode_literals
 
 from rest_framework import serializers
 
+from core.serializers import CachedFragmentMixin
 from accounts.models import Landlord, Tenant
 
 
 class PropertyUserSerializer(serializers.HyperlinkedModelSerializer):
 
     name = serializers.SerializerMethodField()
+    method_field_sources = {'name': ('first_name', 'last_name')}
 
     def get_name(self, obj):
         return obj.get_full_name()
 
 
-class LandlordSerializer(PropertyUserSerializer):
+class LandlordSerializer(CachedFragmentMixin, PropertyUserSerializer):
 
     class Meta:
         model = Landlord
@@ -28,7 +30,7 @@ class LandlordModificationSerializer(PropertyUserSerializer):
         fields = ('id', 'first_name', 'last_name', 'email')
 
 
-class TenantSerializer(PropertyUserSerializer):
+class TenantSerializer(CachedFragmentMixin, PropertyUserSerializer):
 
     class Meta:
         model = Tenant
@@ -1,12 +1,16 @@
 # -*- encoding: UTF-8 -*-
 from __future__ import unicode_literals
 
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from mock import patch
 from rest_framework import status
 
 from core.tests import JWTAuthenticationTestCase
 from accounts.tests.factories import (UserFactory, LandlordFactory,
                                       TenantFactory)
 from accounts.models import Landlord, Tenant
+from accounts.views import LandlordView
 
 
 class TestLandlordsEndpoint(JWTAuthenticationTestCase):
@@ -173,6 +177,35 @@ class TestLandlordsEndpoint(JWTAuthenticationTestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data, expected)
 
+    def test_search_landlord_by_full_name(self):
+        """
+        Should keep landlords with a name starting with every search term
+        """
+        params = {'search': '{} {}'.format(
+            self.landlord_one.first_name[:3],
+            self.landlord_one.last_name.upper())}
+        response = self.client.get(
+            '/api/landlords', params, **self.staff_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         [self.landlord_one.id])
+
+    def test_search_landlords_with_cursor(self):
+        """Should walk through ranked search results with cursor links"""
+        for name in ('Anna', 'Annabel', 'Ann'):
+            LandlordFactory(first_name=name,
+                            last_name=self.landlord_one.last_name)
+        params = {'search': 'ann', 'cursor': '', 'page_size': 1}
+        response = self.client.get(
+            '/api/landlords', params, **self.staff_headers)
+        ids = [item['id'] for item in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(
+                response.data['next'], **self.staff_headers)
+            ids += [item['id'] for item in response.data['results']]
+        names = [Landlord.objects.get(id=id).first_name for id in ids]
+        self.assertEqual(names, ['Ann', 'Anna', 'Annabel'])
+
     def test_search_landlord_as_staff(self):
         """
         Should get filter landlord results keeping records that match the
@@ -229,7 +262,7 @@ class TestLandlordsEndpoint(JWTAuthenticationTestCase):
                 'email': self.landlord_two.email
             }
         ]
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(self.get_streamed_data(response), expected_data)
 
     def test_list_landlords_split_in_pages_as_staff(self):
         """
@@ -482,7 +515,7 @@ class TestLandlordsEndpoint(JWTAuthenticationTestCase):
                 'email': self.landlord_two.email
             }
         ]
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(self.get_streamed_data(response), expected_data)
 
     def test_list_landlords_split_in_pages_as_common(self):
         """
@@ -695,6 +728,33 @@ class TestTenantsEndpoint(JWTAuthenticationTestCase):
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data, expected)
 
+    def test_search_tenant_by_full_name(self):
+        """
+        Should keep tenants with a name starting with every search term
+        """
+        params = {'search': '{} {}'.format(
+            self.tenant_one.first_name[:3], self.tenant_one.last_name.upper())}
+        response = self.client.get(
+            '/api/tenants', params, **self.staff_headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data['results']],
+                         [self.tenant_one.id])
+
+    def test_search_tenants_with_cursor(self):
+        """Should walk through ranked search results with cursor links"""
+        for name in ('Anna', 'Annabel', 'Ann'):
+            TenantFactory(first_name=name, last_name=self.tenant_one.last_name)
+        params = {'search': 'ann', 'cursor': '', 'page_size': 1}
+        response = self.client.get(
+            '/api/tenants', params, **self.staff_headers)
+        ids = [item['id'] for item in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(
+                response.data['next'], **self.staff_headers)
+            ids += [item['id'] for item in response.data['results']]
+        names = [Tenant.objects.get(id=id).first_name for id in ids]
+        self.assertEqual(names, ['Ann', 'Anna', 'Annabel'])
+
     def test_search_tenant_as_staff(self):
         """
         Should filter tenant results keeping records that match the
@@ -751,7 +811,7 @@ class TestTenantsEndpoint(JWTAuthenticationTestCase):
                 'email': self.tenant_two.email
             }
         ]
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(self.get_streamed_data(response), expected_data)
 
     def test_list_tenants_split_in_pages_as_staff(self):
         """
@@ -1004,7 +1064,7 @@ class TestTenantsEndpoint(JWTAuthenticationTestCase):
                 'email': self.tenant_two.email
             }
         ]
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(self.get_streamed_data(response), expected_data)
 
     def test_list_tenants_split_in_pages_as_common(self):
         """
@@ -1051,3 +1111,129 @@ class TestTenantsEndpoint(JWTAuthenticationTestCase):
             ]
         }
         self.assertEqual(response.data, expected_data)
+
+
+class TestBulkCreateEndpoints(JWTAuthenticationTestCase):
+    def setUp(self):
+        user = UserFactory(is_staff=False)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+        self.existing = LandlordFactory(first_name='George',
+                                        last_name='Foreman',
+                                        email='george@email.com')
+
+    def get_payload(self, count):
+        return [{'first_name': 'John', 'last_name': 'Doe{}'.format(index),
+                 'email': 'john{}@email.com'.format(index)}
+                for index in range(count)]
+
+    def post(self, url, payload):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                url, payload, format='json', **self.headers)
+        return response, len(queries)
+
+    def test_bulk_create_landlords(self):
+        """
+        Should create every landlord with a number of queries independent
+        of the number of landlords, keeping them searchable
+        """
+        response, few_queries = self.post(
+            '/api/landlords/bulk', self.get_payload(2))
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 0)
+        result = response.data['results'][0]
+        self.assertEqual(result['status'], status.HTTP_201_CREATED)
+        self.assertEqual(result['data']['email'], 'john0@email.com')
+        self.assertTrue(Landlord.objects.filter(
+            id=result['data']['id']).exists())
+
+        payload = self.get_payload(30)[2:]
+        response, many_queries = self.post('/api/landlords/bulk', payload)
+        self.assertEqual(response.data['created'], 28)
+        self.assertEqual(many_queries, few_queries)
+        self.assertEqual(Landlord.objects.search('john doe29').count(), 1)
+
+    def test_bulk_create_tenants(self):
+        """Should create tenants listed right after by the tenants endpoint"""
+        self.client.get('/api/tenants', **self.headers)
+        response, __ = self.post('/api/tenants/bulk', self.get_payload(3))
+        self.assertEqual(response.data['created'], 3)
+        response = self.client.get('/api/tenants', **self.headers)
+        self.assertEqual(response.data['count'], 3)
+
+    def test_invalid_items_reported(self):
+        """
+        Should report invalid and duplicated items and still create the
+        valid ones
+        """
+        payload = self.get_payload(2) + [
+            {'first_name': 'Ann', 'last_name': 'Lee', 'email': 'invalid'},
+            {'first_name': 'Ann', 'last_name': 'Lee',
+             'email': 'george@email.com'},
+            {'first_name': 'Ann', 'last_name': 'Lee',
+             'email': 'john0@email.com'},
+            {'last_name': 'Lee', 'email': 'ann@email.com'},
+            'not an object',
+        ]
+        response, __ = self.post('/api/landlords/bulk', payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        self.assertEqual(response.data['failed'], 5)
+        details = [result.get('detail')
+                   for result in response.data['results'][2:]]
+        self.assertEqual(details, [
+            "'email': Enter a valid email address.",
+            "'email': Landlord with this Email already exists.",
+            "'email': Landlord with this Email already exists.",
+            "'first_name': This field cannot be blank.",
+            'Expected an object',
+        ])
+        self.assertEqual(Landlord.objects.count(), 3)
+
+    def test_unique_values_compared_ignoring_case(self):
+        """
+        Should reject emails differing only in case from previous ones of
+        the batch, as the database collation does
+        """
+        payload = self.get_payload(1) + [
+            {'first_name': 'Ann', 'last_name': 'Lee',
+             'email': 'JOHN0@email.com'},
+        ]
+        response, __ = self.post('/api/landlords/bulk', payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['results'][1]['detail'],
+                         "'email': Landlord with this Email already exists.")
+
+    def test_unhashable_values_reported(self):
+        """Should report items with lists as values instead of failing"""
+        payload = self.get_payload(1) + [
+            {'first_name': 'Ann', 'last_name': 'Lee',
+             'email': ['ann@email.com']},
+        ]
+        response, __ = self.post('/api/landlords/bulk', payload)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['failed'], 1)
+
+    def test_no_valid_items(self):
+        """Should get 400 when no item could be created"""
+        response, __ = self.post('/api/landlords/bulk', [{}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['created'], 0)
+
+    def test_invalid_payload(self):
+        """Should get 400 for payloads which are not lists"""
+        response, __ = self.post('/api/landlords/bulk', {'email': 'x'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data,
+                         {'detail': 'Expected a list of objects'})
+
+    def test_too_many_items(self):
+        """Should get 400 when sending more items than allowed at once"""
+        with patch.object(LandlordView, 'bulk_max_items', 2):
+            response, __ = self.post(
+                '/api/landlords/bulk', self.get_payload(3))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Landlord.objects.count(), 1)
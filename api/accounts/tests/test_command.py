@@ -0,0 +1,26 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from StringIO import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+
+from accounts.models import Tenant
+
+
+class TestBenchmarkSearchCommand(TestCase):
+
+    def test_call_command(self):
+        """
+        Should report search timings for both implementations and roll back
+        the created tenants
+        """
+        output = StringIO()
+        call_command('benchmark_search', tenants=50, queries=5, batch_size=20,
+                     stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[1].split()[:2], ['tokens', '5'])
+        self.assertEqual(lines[2].split()[:2], ['icontains', '5'])
+        self.assertFalse(Tenant.objects.exists())
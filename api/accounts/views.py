@@ -2,9 +2,12 @@
 from __future__ import unicode_literals
 
 from rest_framework import viewsets, mixins
-from django.db import models
 from rest_framework.permissions import IsAuthenticated
 
+from core.views import (BulkCreateMixin, ConditionalRequestMixin,
+                        CachedResponseMixin, EagerLoadingMixin,
+                        ExportMixin, MultiGetMixin,
+                        StreamingListMixin)
 from core.exceptions import Api401
 from accounts.models import Landlord, Tenant
 from accounts.serializers import (LandlordSerializer,
@@ -13,7 +16,14 @@ from accounts.serializers import (LandlordSerializer,
                                   TenantModificationSerializer)
 
 
-class LandlordView(mixins.RetrieveModelMixin,
+class LandlordView(BulkCreateMixin,
+                   ExportMixin,
+                   ConditionalRequestMixin,
+                   CachedResponseMixin,
+                   EagerLoadingMixin,
+                   MultiGetMixin,
+                   StreamingListMixin,
+                   mixins.RetrieveModelMixin,
                    mixins.ListModelMixin,
                    mixins.CreateModelMixin,
                    mixins.UpdateModelMixin,
@@ -31,10 +41,20 @@ class LandlordView(mixins.RetrieveModelMixin,
 
         `GET /landlords/:id`
 
+    *   Retrieve many landlords by id, in the given order:
+
+        `GET /landlords?ids=id1,id2`
+
+        or, for long lists, `POST /landlords/multi-get` with the payload
+        `{'ids': ['id1', 'id2']}`. Up to 100 ids are accepted.
+
     *   Search by landlord name:
 
         `GET /landlords?search=:query`
 
+        Finds landlords with a first or last name starting with every word of
+        the query, ignoring case and accents. Whole word matches come first.
+
     *  Create landlord:
 
         `POST /landlords`
@@ -49,6 +69,30 @@ class LandlordView(mixins.RetrieveModelMixin,
         }
         ```
 
+    *  Create many landlords at once, up to 1000:
+
+        `POST /landlords/bulk`
+
+        Sample payload:
+
+        ```
+        [
+            {
+                'first_name': 'John',
+                'last_name': 'Doe',
+                'email': 'john@email.com'
+            },
+            {
+                'first_name': 'Jane',
+                'last_name': 'Doe',
+                'email': 'jane@email.com'
+            }
+        ]
+        ```
+
+        Valid items are created even when others are invalid. The response
+        lists the created data or the error of every item, in order.
+
     *  Update landlord:
 
         `PUT /landlords/:id`
@@ -83,10 +127,37 @@ class LandlordView(mixins.RetrieveModelMixin,
     *   `page_size`: specifies the page size. If not provided, results are
     paginated by 20. Max value is 40. If 'none' is provided, pagination is
     disabled.
+
+    *   `cursor`: switches to cursor pagination, which keeps pages stable
+    while new records are created and costs the same for any page. Send it
+    empty for the first page and follow the `next` and `previous` links.
+
+    Representation parameter, for list and retrieve:
+
+    *   `fields`: comma separated fields to render, like `fields=id,email`.
+    Columns of other fields are not read.
+
+    Export:
+
+    *   `GET /landlords/export?format=csv`: streams every Landlord matching
+    the list filters as CSV, or as one JSON object per line with
+    `format=ndjson`.
+
+    Conditional requests:
+
+    *   `If-None-Match`: list and retrieve responses carry an `ETag`.
+    Sending it back gets `304 Not Modified` while the data is unchanged.
+
+    *   `If-Match`: updates sending the `ETag` of the retrieved record get
+    `412 Precondition Failed` when it was modified meanwhile.
     """
 
     permission_classes = (IsAuthenticated,)
     queryset = Landlord.objects.all().order_by('first_name', 'last_name')
+    export_fields = ('id', 'first_name', 'last_name', 'email')
+    # sample list filters for the query plans checks
+    explain_filters = {'search': 'john do'}
+    sorted_filters = ('search',)
 
     def filter_queryset(self, queryset):
         queryset = super(LandlordView, self).filter_queryset(queryset)
@@ -96,17 +167,7 @@ class LandlordView(mixins.RetrieveModelMixin,
         # filter by text search
         search = self.request.query_params.get('search')
         if search:
-            splitted_search = search.split(' ')
-            if len(splitted_search) > 1:
-                first_name = splitted_search[0]
-                last_name = splitted_search[1:]
-                queryset = queryset.filter(
-                    models.Q(first_name__icontains=first_name) |
-                    models.Q(last_name__icontains=last_name))
-            else:
-                queryset = queryset.filter(
-                    models.Q(first_name__icontains=search) |
-                    models.Q(last_name__icontains=search))
+            queryset = queryset.search(search)
         return queryset
 
     def destroy(self, request, *args, **kwargs):
@@ -121,7 +182,14 @@ class LandlordView(mixins.RetrieveModelMixin,
         return LandlordModificationSerializer
 
 
-class TenantView(mixins.RetrieveModelMixin,
+class TenantView(BulkCreateMixin,
+                 ExportMixin,
+                 ConditionalRequestMixin,
+                 CachedResponseMixin,
+                 EagerLoadingMixin,
+                 MultiGetMixin,
+                 StreamingListMixin,
+                 mixins.RetrieveModelMixin,
                  mixins.ListModelMixin,
                  mixins.CreateModelMixin,
                  mixins.UpdateModelMixin,
@@ -139,10 +207,20 @@ class TenantView(mixins.RetrieveModelMixin,
 
         `GET /tenants/:id`
 
+    *   Retrieve many tenants by id, in the given order:
+
+        `GET /tenants?ids=id1,id2`
+
+        or, for long lists, `POST /tenants/multi-get` with the payload
+        `{'ids': ['id1', 'id2']}`. Up to 100 ids are accepted.
+
     *   Search by tenant name:
 
         `GET /tenants?search=:query`
 
+        Finds tenants with a first or last name starting with every word of
+        the query, ignoring case and accents. Whole word matches come first.
+
     *  Create Tenant:
 
         `POST /tenants`
@@ -157,6 +235,30 @@ class TenantView(mixins.RetrieveModelMixin,
         }
         ```
 
+    *  Create many tenants at once, up to 1000:
+
+        `POST /tenants/bulk`
+
+        Sample payload:
+
+        ```
+        [
+            {
+                'first_name': 'John',
+                'last_name': 'Doe',
+                'email': 'john@email.com'
+            },
+            {
+                'first_name': 'Jane',
+                'last_name': 'Doe',
+                'email': 'jane@email.com'
+            }
+        ]
+        ```
+
+        Valid items are created even when others are invalid. The response
+        lists the created data or the error of every item, in order.
+
     *  Update Tenant:
 
         `PUT /tenants/:id`
@@ -191,10 +293,37 @@ class TenantView(mixins.RetrieveModelMixin,
     *   `page_size`: specifies the page size. If not provided, results are
     paginated by 20. Max value is 40. If 'none' is provided, pagination is
     disabled.
+
+    *   `cursor`: switches to cursor pagination, which keeps pages stable
+    while new records are created and costs the same for any page. Send it
+    empty for the first page and follow the `next` and `previous` links.
+
+    Representation parameter, for list and retrieve:
+
+    *   `fields`: comma separated fields to render, like `fields=id,email`.
+    Columns of other fields are not read.
+
+    Export:
+
+    *   `GET /tenants/export?format=csv`: streams every Tenant matching
+    the list filters as CSV, or as one JSON object per line with
+    `format=ndjson`.
+
+    Conditional requests:
+
+    *   `If-None-Match`: list and retrieve responses carry an `ETag`.
+    Sending it back gets `304 Not Modified` while the data is unchanged.
+
+    *   `If-Match`: updates sending the `ETag` of the retrieved record get
+    `412 Precondition Failed` when it was modified meanwhile.
     """
 
     permission_classes = (IsAuthenticated,)
     queryset = Tenant.objects.all().order_by('first_name', 'last_name')
+    export_fields = ('id', 'first_name', 'last_name', 'email')
+    # sample list filters for the query plans checks
+    explain_filters = {'search': 'john do'}
+    sorted_filters = ('search',)
 
     def filter_queryset(self, queryset):
         queryset = super(TenantView, self).filter_queryset(queryset)
@@ -205,17 +334,7 @@ class TenantView(mixins.RetrieveModelMixin,
         # filter by text search
         search = self.request.query_params.get('search')
         if search:
-            splitted_search = search.split(' ')
-            if len(search) > 1:
-                first_name = splitted_search[0]
-                last_name = splitted_search[1:]
-                queryset = queryset.filter(
-                    models.Q(first_name__icontains=first_name) |
-                    models.Q(last_name__icontains=last_name))
-            else:
-                queryset = queryset.filter(
-                    models.Q(first_name__icontains=search) |
-                    models.Q(last_name__icontains=search))
+            queryset = queryset.search(search)
         return queryset
 
     def destroy(self, request, *args, **kwargs):
@@ -64,6 +64,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.RequestMetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -145,6 +146,10 @@ USE_TZ = True
 
 STATIC_URL = '/static/'
 
+# hash ids mode: 'sortable' ids start with a timestamp, keeping inserts
+# ordered in primary key indexes, while 'random' ids are fully random
+HASH_ID_MODE = os.environ.get('HASH_ID_MODE', 'sortable')
+
 HOST_NAME = os.environ.get('HOST_NAME', 'http://localhost')
 HOST_PORT = os.environ.get('HOST_PORT', '8000')
 
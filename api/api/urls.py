@@ -17,10 +17,13 @@ from django.conf.urls import include, url
 from django.contrib import admin
 from django.views.generic.base import RedirectView
 
+from core.views import MetricsView
+
 urlpatterns = [
     url(r'^admin/', admin.site.urls),
     url(r'^$', RedirectView.as_view(url='api/')),
     url(r'^api/', include('core.api', namespace='v1')),
+    url(r'^metrics$', MetricsView.as_view()),
     url(r'^api-auth/',
         include('rest_framework.urls', namespace='rest_framework')),
 ]
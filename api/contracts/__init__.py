@@ -0,0 +1 @@
+default_app_config = 'contracts.apps.ContractsConfig'
@@ -6,3 +6,6 @@ from django.apps import AppConfig
 
 class ContractsConfig(AppConfig):
     name = 'contracts'
+
+    def ready(self):
+        import contracts.signals  # noqa
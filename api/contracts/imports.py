@@ -0,0 +1,79 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from core.exception_handlers import parse_error_messages
+from core.signals import post_bulk_create
+from core.validators import find_missing_foreign_keys
+from contracts.models import Contract
+from contracts.validators import find_invalid_contracts
+
+IMPORT_FOREIGN_KEYS = ('property', 'tenant')
+IMPORT_FIELDS = ('start_date', 'end_date', 'rent')
+
+
+def build_contract(row):
+    """
+    Returns an unsaved contract with the values of a row of an import,
+    where empty values are missing ones
+    """
+    values = {}
+    for name in IMPORT_FIELDS + IMPORT_FOREIGN_KEYS:
+        value = row.get(name)
+        if value in ('', None):
+            continue
+        if name in IMPORT_FOREIGN_KEYS:
+            name = '{}_id'.format(name)
+        values[name] = value
+    return Contract(**values)
+
+
+def validate_contracts(contracts):
+    """
+    Validates a batch of contracts returning a dict which maps the index of
+    each invalid one to its error message. Foreign keys are checked with one
+    query each and overlaps with a single pass over the whole batch.
+    """
+    errors = {}
+    for index, contract in enumerate(contracts):
+        try:
+            # Contract.clean would look for overlaps one contract at a time
+            contract.clean_fields(exclude=IMPORT_FOREIGN_KEYS)
+        except ValidationError as e:
+            errors[index] = parse_error_messages(e.message_dict)
+    find_missing_foreign_keys(
+        Contract, contracts, IMPORT_FOREIGN_KEYS, errors)
+
+    valid = [index for index in range(len(contracts)) if index not in errors]
+    overlapping = find_invalid_contracts([contracts[index] for index in valid])
+    for position, error in overlapping.items():
+        errors[valid[position]] = error
+    return errors
+
+
+def insert_contracts(contracts, chunk_size=500):
+    """Inserts validated contracts with one statement per chunk"""
+    with transaction.atomic():
+        Contract.objects.bulk_create(contracts, batch_size=chunk_size)
+        post_bulk_create.send(sender=Contract, instances=contracts)
+
+
+def import_rows(rows, chunk_size=500):
+    """
+    Imports the valid contracts of rows of an import, returning the number
+    of imported contracts and a dict of the errors of the rejected rows by
+    index
+    """
+    contracts = [build_contract(row) if isinstance(row, dict)
+                 else build_contract({}) for row in rows]
+    errors = validate_contracts(contracts)
+    for index, row in enumerate(rows):
+        if not isinstance(row, dict):
+            errors[index] = 'Expected an object'
+    valid = [contract for index, contract in enumerate(contracts)
+             if index not in errors]
+    if valid:
+        insert_contracts(valid, chunk_size)
+    return len(valid), errors
@@ -0,0 +1,17 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from contracts.imports import import_rows
+
+
+def import_contracts(rows, chunk_size=1000):
+    """
+    Imports the rows of a queued import, returning the number of imported
+    contracts and the errors of the rejected rows by row number
+    """
+    imported, errors = import_rows(rows, chunk_size)
+    return {
+        'imported': imported,
+        'rejected': [{'row': index + 1, 'error': errors[index]}
+                     for index in sorted(errors)],
+    }
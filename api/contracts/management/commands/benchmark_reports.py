@@ -0,0 +1,65 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+
+from contracts.management.helpers import (get_render_processes,
+                                          render_in_pool)
+
+TEMPLATE = 'contracts_expiration_email.html'
+TEXT_TEMPLATE = 'contracts_expiration_email.txt'
+
+
+class Command(BaseCommand):
+    help = ('Compares the throughput of rendering expiration reports for '
+            'many recipients serially and in a pool of processes, with the '
+            'text part stripped from the HTML or rendered from its template')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--recipients', type=int, default=10000,
+            help='number of reports rendered in each mode')
+        parser.add_argument(
+            '--rows', type=int, default=5,
+            help='number of contracts in each report')
+        parser.add_argument(
+            '--processes', type=int, default=None,
+            help='number of processes of the pool modes, one per available '
+                 'core by default')
+
+    def get_contexts(self, recipients, rows):
+        """Returns the contexts of reports with sample contracts"""
+        contracts = [{
+            'contract_id': 'C{:05d}'.format(index),
+            'contract_url': ('http://localhost:8000/admin/contracts/'
+                             'contract/C{:05d}/change/'.format(index)),
+            'end_date': '2018-09-25',
+            'property': 'House at Baker Street, 221, London',
+            'landlord': 'George Foreman',
+            'tenant': 'Bill Murray',
+            'rent': Decimal('1250.25'),
+        } for index in range(rows)]
+        return [{'report': {'date': '2018-09-20 10:00:00',
+                            'contracts': contracts}}] * recipients
+
+    def handle(self, *args, **options):
+        recipients = options['recipients']
+        processes = get_render_processes(options['processes'])
+        contexts = self.get_contexts(recipients, options['rows'])
+        modes = (
+            ('strip_tags', None, 1),
+            ('text', TEXT_TEMPLATE, 1),
+            ('pool', TEXT_TEMPLATE, processes),
+        )
+        self.stdout.write('{:<12}{:>10}{:>12}{:>12}{:>16}'.format(
+            'mode', 'processes', 'recipients', 'seconds', 'recipients/s'))
+        for mode, text_template, mode_processes in modes:
+            start = time.time()
+            render_in_pool(TEMPLATE, contexts, text_template, mode_processes)
+            elapsed = time.time() - start
+            self.stdout.write('{:<12}{:>10}{:>12}{:>12.3f}{:>16.0f}'.format(
+                mode, mode_processes, recipients, elapsed,
+                recipients / elapsed if elapsed else 0))
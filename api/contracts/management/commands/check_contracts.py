@@ -1,71 +1,215 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-import urlparse
 import logging
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import date, datetime, timedelta
 
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.conf import settings
+from django.db import transaction
+from django.utils.safestring import mark_safe
 from validate_email import validate_email
 
-from contracts.models import Contract
-from contracts.management.helpers import send_template_mail
+from core.jobs import call_command_job
+from core.models import Job
+from core.querysets import iterate_in_chunks
+from contracts.models import ExpirationNotice
+from contracts.notices import NoticeLog
+from contracts.management.helpers import (
+    build_email_multi_alternatives, send_in_batches)
+from contracts.reports import (build_report_row, get_admin_url_format,
+                               get_expiring_contracts, group_by_recipient,
+                               render_report_rows)
 
 log = logging.getLogger(__name__)
 
+# options of the command given to the queued job running it
+QUEUED_OPTIONS = ('landlords', 'tenants', 'chunk_size', 'batch_size',
+                  'workers', 'retries', 'processes', 'days', 'incremental')
+
 
 class Command(BaseCommand):
     help = ('Checks for Contracts which are due to end within a week and '
-            'sends an e-mail to given address')
+            'sends an e-mail to given address and, optionally, one to each '
+            'landlord and tenant with their own contracts')
 
     def add_arguments(self, parser):
         parser.add_argument(
-            'email',
+            'email', nargs='?',
             help='e-mail to which the report should be sent')
+        parser.add_argument(
+            '--landlords', action='store_true',
+            help='send each landlord the report of their contracts')
+        parser.add_argument(
+            '--tenants', action='store_true',
+            help='send each tenant the report of their contracts')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='number of contracts read from the database at once')
+        parser.add_argument(
+            '--batch-size', type=int, default=100,
+            help='number of e-mails handed to a sending thread at once')
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='number of threads sending e-mails, each over one '
+                 'connection')
+        parser.add_argument(
+            '--retries', type=int, default=2,
+            help='number of times sending an e-mail is retried')
+        parser.add_argument(
+            '--processes', type=int, default=None,
+            help='number of processes rendering e-mails, one per available '
+                 'core by default')
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='queue the reports to be sent by run_workers instead')
+        parser.add_argument(
+            '--days', type=int, default=7,
+            help='number of days before their ending date contracts are '
+                 'reported')
+        parser.add_argument(
+            '--incremental', action='store_true',
+            help='only report contracts not reported before, examining '
+                 'the ones which entered the window since the last run; '
+                 'contracts are reported once whatever the e-mail')
+
+    @contextmanager
+    def phase(self, name):
+        """Adds the time spent in the block to the timing of phase name"""
+        start = time.time()
+        try:
+            yield
+        finally:
+            self.timings[name] = (self.timings.get(name, 0) +
+                                  time.time() - start)
+
+    def get_report_rows(self, chunk_size, roles=(), days=7, notices=None):
+        """
+        Returns the HTML and text of the report rows of the contracts due
+        to end within given days, the report lines of each landlord or
+        tenant, for the given roles, and the number of contracts, holding
+        one chunk of contracts in memory at a time besides those lines.
+        With a notice log, only the contracts still needing a notice are
+        reported.
+        """
+        # filters contracts which ending date is within the days from now
+        lower_limit = date.today()
+        upper_limit = lower_limit + timedelta(days=days)
+        queryset = get_expiring_contracts(lower_limit, upper_limit)
+        if notices:
+            queryset = notices.filter_contracts(queryset)
+        url_format = get_admin_url_format('{}:{}'.format(
+            settings.HOST_NAME, settings.HOST_PORT))
+
+        html = []
+        text = []
+        recipients = dict((role, OrderedDict()) for role in roles)
+        count = 0
+        chunks = iterate_in_chunks(queryset, chunk_size)
+        while True:
+            with self.phase('query'):
+                chunk = next(chunks, None)
+            if chunk is None:
+                break
+            with self.phase('rows'):
+                if notices:
+                    claimed = notices.claim(chunk)
+                else:
+                    claimed = dict((notice_type, chunk) for notice_type in
+                                   [ExpirationNotice.REPORT] + roles)
+                chunk_html, chunk_text = render_report_rows(
+                    [build_report_row(values, url_format)
+                     for values in claimed.get(ExpirationNotice.REPORT, ())])
+                html.append(chunk_html)
+                text.append(chunk_text)
+                for role in roles:
+                    groups = group_by_recipient(claimed[role], role)
+                    for recipient, values_list in groups.items():
+                        recipients[role].setdefault(recipient, []).extend(
+                            build_report_row(values) for values in values_list)
+            count += len(set(values['id'] for values_list in claimed.values()
+                             for values in values_list))
+        rows = (mark_safe(''.join(html)), mark_safe(''.join(text)))
+        return rows, recipients, count
 
     def handle(self, *args, **options):
         email = options['email']
+        roles = [role for role in ('landlord', 'tenant')
+                 if options['{}s'.format(role)]]
+        self.timings = OrderedDict()
+        if not email and not roles:
+            raise CommandError(
+                'Give an e-mail or choose --landlords or --tenants')
         # if email is valid
-        if validate_email(email):
-            # filters contracts which ending date is within a week from now
-            lower_limit = date.today()
-            upper_limit = lower_limit + timedelta(days=7)
-            contracts = Contract.objects.filter(
-                end_date__range=[lower_limit, upper_limit]).select_related()
+        if options['enqueue'] and (not email or validate_email(email)):
+            args = ['check_contracts'] + ([email] if email else [])
+            job = Job.objects.enqueue(call_command_job, args=args, kwargs=dict(
+                (name, options[name]) for name in QUEUED_OPTIONS))
+            self.stdout.write('Reports queued as job {}'.format(job.id))
+        elif not email or validate_email(email):
+            notices = None
+            if options['incremental']:
+                NoticeLog.create_watermark(options['days'], date.today())
+                # the watermark stays locked until notices are recorded
+                with transaction.atomic():
+                    notices = NoticeLog(
+                        options['days'], date.today(), email, roles)
+                    rows, recipients, count = self.get_report_rows(
+                        options['chunk_size'], roles, options['days'],
+                        notices)
+                    notices.save()
+            else:
+                rows, recipients, count = self.get_report_rows(
+                    options['chunk_size'], roles, options['days'])
             # if it finds contracts
-            if contracts:
-                # collects contract info for reporting
-                rhost = '{}:{}'.format(settings.HOST_NAME, settings.HOST_PORT)
-                report = {
-                    'date': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
-                    'contracts': []
-                }
-                for contract in contracts:
-                    data = {
-                        'contract_id': contract.id,
-                        'contract_url': urlparse.urljoin(
-                            rhost, contract.get_admin_url()),
-                        'end_date': contract.end_date.strftime('%Y-%m-%d'),
-                        'property': contract.property.__unicode__(),
-                        'tenant': contract.tenant.get_full_name(),
-                        'landlord': contract.property.landlord.get_full_name(),
-                        'rent': contract.rent
-                    }
-                    report['contracts'].append(data)
-                # sends email with collected info
-                send_template_mail(
-                    'Contracts expiration report',
-                    'contracts_expiration_email.html',
-                    [email],
-                    context={'report': report},
-                    from_email='admbot@propertymgmt.com')
+            if count:
+                now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+                contexts = []
+                # the notice type and recipient of each message
+                keys = []
+                if email:
+                    contexts.append(([email], {'report': {
+                        'date': now, 'rows': rows[0], 'text_rows': rows[1]}}))
+                    keys.append((ExpirationNotice.REPORT, email))
+                for role in roles:
+                    for (pk, address), contracts in recipients[role].items():
+                        contexts.append(([address], {'report': {
+                            'date': now, 'contracts': contracts}}))
+                        keys.append((role, address))
+                # renders and sends emails with collected info
+                with self.phase('build'):
+                    messages = build_email_multi_alternatives(
+                        'Contracts expiration report',
+                        'contracts_expiration_email.html', contexts,
+                        text_template='contracts_expiration_email.txt',
+                        from_email='admbot@propertymgmt.com',
+                        processes=options['processes'])
+                with self.phase('send'):
+                    failed = send_in_batches(
+                        messages, batch_size=options['batch_size'],
+                        workers=options['workers'],
+                        retries=options['retries'])
+                if notices:
+                    failed_ids = set(id(message) for message in failed)
+                    notices.mark_sent([
+                        key for key, message in zip(keys, messages)
+                        if id(message) not in failed_ids])
+                self.stdout.write('{} contracts reported'.format(count))
+                self.stdout.write('{} reports sent'.format(
+                    len(messages) - len(failed)))
+                if failed:
+                    self.stdout.write('{} reports failed'.format(len(failed)))
             else:
                 msg = (u'There were no contracts with due date '
-                       'to within one week')
+                       'to within {} days'.format(options['days']))
                 log.info(msg)
-                print msg
+                self.stdout.write(msg)
+            for name, seconds in self.timings.items():
+                self.stdout.write('{}: {:.3f}s'.format(name, seconds))
         else:
             msg = u'Given e-mail "{}" is not valid.'.format(email)
             log.error(msg)
-            print msg
+            self.stdout.write(msg)
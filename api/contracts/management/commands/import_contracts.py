@@ -0,0 +1,74 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import io
+import sys
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import Job
+from core.parsers import read_csv_rows, read_ndjson_rows
+from contracts.imports import import_rows
+from contracts.jobs import import_contracts
+
+READERS = {'csv': read_csv_rows, 'ndjson': read_ndjson_rows}
+
+
+class Command(BaseCommand):
+    help = ('Imports Contracts from a CSV file with a header line or from a '
+            'newline delimited JSON file, reporting the rejected rows')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='file to import, - reads the standard input')
+        parser.add_argument(
+            '--format', choices=sorted(READERS),
+            help='file format, guessed from the file extension by default')
+        parser.add_argument(
+            '--chunk-size', type=int, default=1000,
+            help='number of contracts inserted per statement')
+        parser.add_argument(
+            '--enqueue', action='store_true',
+            help='queue the rows to be imported by run_workers instead')
+
+    def get_format(self, path, file_format):
+        if file_format:
+            return file_format
+        extension = path.rsplit('.', 1)[-1].lower()
+        if extension in READERS:
+            return extension
+        raise CommandError('Could not guess the format of {}, use '
+                           '--format'.format(path))
+
+    def read_rows(self, path, file_format):
+        reader = READERS[self.get_format(path, file_format)]
+        try:
+            if path == '-':
+                return list(reader(sys.stdin))
+            with io.open(path, 'rb') as stream:
+                return list(reader(stream))
+        except IOError as e:
+            raise CommandError('Could not read {}: {}'.format(path, e))
+        except ValueError as e:
+            raise CommandError('Could not parse {}: {}'.format(path, e))
+
+    def handle(self, *args, **options):
+        start = time.time()
+        rows = self.read_rows(options['path'], options['format'])
+        if options['enqueue']:
+            job = Job.objects.enqueue(import_contracts, args=[rows], kwargs={
+                'chunk_size': options['chunk_size']})
+            self.stdout.write('{} rows queued as job {}'.format(
+                len(rows), job.id))
+            return
+        imported, errors = import_rows(rows, options['chunk_size'])
+        elapsed = time.time() - start
+
+        for index in sorted(errors):
+            self.stdout.write('Row {}: {}'.format(index + 1, errors[index]))
+        self.stdout.write(
+            '{} contracts imported, {} rejected in {:.2f}s '
+            '({:.0f} rows/s)'.format(
+                imported, len(errors), elapsed,
+                len(rows) / elapsed if elapsed else 0))
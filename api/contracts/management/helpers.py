@@ -1,28 +1,152 @@
 # -*- encoding: UTF-8 -*-
 import logging
+import smtplib
+import socket
+import threading
+import time
+from multiprocessing import Pool, cpu_count
+from multiprocessing.pool import ThreadPool
 
+from django.conf import settings
 from django.template.loader import render_to_string
 from django.utils.html import strip_tags
 from django.core.mail import get_connection, EmailMultiAlternatives
 
 log = logging.getLogger(__name__)
 
+# errors of a message which may be sent on a later attempt
+SEND_ERRORS = (smtplib.SMTPException, socket.error)
+
+# files telling the CPU time quota of the process and its period, for
+# version 2 and version 1 cgroups
+CGROUP_CPU_FILES = (
+    ('/sys/fs/cgroup/cpu.max', None),
+    ('/sys/fs/cgroup/cpu/cpu.cfs_quota_us',
+     '/sys/fs/cgroup/cpu/cpu.cfs_period_us'),
+)
+
+
+def read_first_line(path):
+    try:
+        with open(path) as data:
+            return data.readline().strip()
+    except IOError:
+        return None
+
+
+def get_affinity_cpus():
+    """Returns the number of cores the process may be scheduled on"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith('Cpus_allowed_list:'):
+                    cpus = 0
+                    for part in line.split(':', 1)[1].strip().split(','):
+                        bounds = part.split('-')
+                        cpus += int(bounds[-1]) - int(bounds[0]) + 1
+                    return cpus
+    except (IOError, ValueError):
+        pass
+    return None
+
+
+def get_quota_cpus():
+    """Returns the cores worth of CPU time the cgroup of the process gets"""
+    for quota_path, period_path in CGROUP_CPU_FILES:
+        line = read_first_line(quota_path)
+        if not line:
+            continue
+        values = line.split()
+        if period_path:
+            values.append(read_first_line(period_path))
+        try:
+            quota, period = int(values[0]), int(values[1])
+        except (IndexError, TypeError, ValueError):
+            # 'max' has no quota
+            return None
+        if quota > 0 and period > 0:
+            return max(1, quota // period)
+        return None
+    return None
+
+
+def available_cpus():
+    """
+    Returns the number of cores the process can use, as limited by its CPU
+    affinity and cgroup quota
+    """
+    limits = [cpus for cpus in (cpu_count(), get_affinity_cpus(),
+                                get_quota_cpus()) if cpus]
+    return min(limits)
+
+
+def get_render_processes(processes=None):
+    """
+    Returns the number of processes rendering messages, one per available
+    core by default, at most REPORT_RENDER_PROCESSES
+    """
+    processes = processes or available_cpus()
+    limit = getattr(settings, 'REPORT_RENDER_PROCESSES', None)
+    return min(processes, limit) if limit else processes
+
+
+def render_message_parts(template, context=None, text_template=None):
+    """
+    Returns the text and HTML of a message rendered from template, the text
+    coming from text_template or, without it, from the stripped HTML
+    """
+    html_message = render_to_string(template, context=context or {})
+    if text_template:
+        text_message = render_to_string(text_template, context=context or {})
+    else:
+        text_message = strip_tags(html_message)
+    return text_message, html_message
+
+
+def _render_task(task):
+    """Renders the parts of a message in a pool process"""
+    return render_message_parts(*task)
+
+
+def render_in_pool(template, contexts, text_template=None, processes=None):
+    """
+    Returns the text and HTML of a message rendered for each of contexts,
+    in a pool of processes, one per available core by default. Rendering is
+    CPU bound, so threads would not run it in parallel.
+
+    Out of the main thread, as in the threads of run_workers, messages are
+    rendered in the current process, as forking a threaded process only
+    copies the calling thread and the locks the others may hold.
+    """
+    tasks = [(template, context, text_template) for context in contexts]
+    processes = min(get_render_processes(processes), len(tasks))
+    main = isinstance(threading.current_thread(), threading._MainThread)
+    if processes < 2 or not main:
+        return [_render_task(task) for task in tasks]
+    pool = Pool(processes)
+    try:
+        return pool.map(_render_task, tasks)
+    finally:
+        pool.terminate()
+        pool.join()
+
 
 def build_email_multi_alternative(subject, template, recipient_list,
                                   context=None, from_email=None,
                                   connection=None, auth_user=None,
                                   auth_password=None, fail_silently=False,
+                                  text_template=None, rendered=None,
                                   **kwargs):
-    context = context or {}
+    # messages without a connection get the default one when sent
+    if connection is None and (auth_user or auth_password):
+        connection = get_connection(
+            username=auth_user,
+            password=auth_password,
+            fail_silently=fail_silently,
+        )
 
-    connection = connection or get_connection(
-        username=auth_user,
-        password=auth_password,
-        fail_silently=fail_silently,
-    )
-
-    html_message = render_to_string(template, context=context)
-    text_message = strip_tags(html_message)
+    text_message, html_message = rendered or render_message_parts(
+        template, context, text_template)
 
     mail = EmailMultiAlternatives(
         subject, text_message, from_email,
@@ -31,16 +155,100 @@ def build_email_multi_alternative(subject, template, recipient_list,
     return mail
 
 
-def send_template_mail(subject, template, recipient_list, context=None,
-                       from_email=None, **kwargs):
-    """Extends django.core.mail.send_mail to accept HTML templates"""
+def build_email_multi_alternatives(subject, template, recipients,
+                                   text_template=None, from_email=None,
+                                   processes=None):
+    """
+    Returns the messages of recipients, a list of (recipient_list, context)
+    pairs, rendering them in a pool of processes
+    """
+    parts = render_in_pool(
+        template, [context for recipient_list, context in recipients],
+        text_template, processes)
+    return [build_email_multi_alternative(
+        subject, template, recipient_list, from_email=from_email,
+        rendered=rendered)
+        for (recipient_list, context), rendered in zip(recipients, parts)]
+
+
+def send_message(message, connection=None, retries=2, retry_delay=1):
+    """
+    Sends message over connection, reopening it and retrying up to retries
+    times on SMTP and network errors, waiting twice as long after each one.
+    Without a connection, the one of the message is used and closed once
+    done. Returns whether the message was sent.
+    """
+    owned = connection is None
+    connection = connection or message.get_connection()
     try:
-        message = build_email_multi_alternative(
-            subject, template, recipient_list, context, from_email, **kwargs)
-    except Exception:
-        log.error('Failed building contracts expiration report email.')
-        return
+        for attempt in range(retries + 1):
+            if attempt:
+                time.sleep(retry_delay * 2 ** (attempt - 1))
+            try:
+                # reuses the connection when it is already open
+                connection.open()
+                return bool(connection.send_messages([message]))
+            except SEND_ERRORS as error:
+                log.warning('Failed sending "%s" to %s (attempt %s): %s',
+                            message.subject, ', '.join(message.recipients()),
+                            attempt + 1, error)
+                close_connection(connection)
+        return False
+    finally:
+        if owned:
+            close_connection(connection)
+
+
+def close_connection(connection):
+    """Closes connection, ignoring errors of connections already broken"""
     try:
-        return message.send()
-    except Exception:
-        log.error('Failed sending contracts expiration report email.')
+        connection.close()
+    except SEND_ERRORS:
+        pass
+
+
+def send_in_batches(messages, batch_size=100, workers=1, retries=2,
+                    retry_delay=1):
+    """
+    Sends messages in batches handed to up to workers threads. Each thread
+    opens one connection and reuses it for all of its batches, so a single
+    worker sends every message over one connection. Returns the messages
+    which could not be sent.
+    """
+    local = threading.local()
+    connections = []
+
+    def send_batch(batch):
+        if not hasattr(local, 'connection'):
+            local.connection = get_connection()
+            connections.append(local.connection)
+        return [message for message in batch if not send_message(
+            message, local.connection, retries, retry_delay)]
+
+    batches = [messages[index:index + batch_size]
+               for index in range(0, len(messages), batch_size)]
+    pool = ThreadPool(max(1, min(workers, len(batches))))
+    try:
+        failed = []
+        for batch_failed in pool.imap(send_batch, batches):
+            failed.extend(batch_failed)
+    finally:
+        pool.close()
+        pool.join()
+        for connection in connections:
+            close_connection(connection)
+    for message in failed:
+        log.error('Failed sending "%s" to %s.', message.subject,
+                  ', '.join(message.recipients()))
+    return failed
+
+
+def send_template_mail(subject, template, recipient_list, context=None,
+                       from_email=None, retries=2, **kwargs):
+    """Extends django.core.mail.send_mail to accept HTML templates"""
+    message = build_email_multi_alternative(
+        subject, template, recipient_list, context, from_email, **kwargs)
+    if send_message(message, retries=retries):
+        return 1
+    log.error('Failed sending contracts expiration report email.')
+    return 0
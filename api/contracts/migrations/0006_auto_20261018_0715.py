@@ -0,0 +1,53 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 07:15
+# flake8: noqa
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contracts', '0005_auto_20261018_0654'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExpirationNotice',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('notice_type', models.CharField(choices=[('report', 'Report'), ('landlord', 'Landlord'), ('tenant', 'Tenant')], max_length=10)),
+                ('window', models.PositiveSmallIntegerField(help_text='days before the ending date')),
+                ('recipient', models.EmailField(max_length=254)),
+                ('claimed_at', models.DateTimeField(help_text='date and time of the last attempt to send the notice')),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ExpirationWatermark',
+            fields=[
+                ('window', models.PositiveSmallIntegerField(primary_key=True, serialize=False)),
+                ('checked_until', models.DateField(help_text='last ending date of the contracts already checked')),
+                ('checked_at', models.DateTimeField(help_text='start of the last check')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='contract',
+            index=models.Index(fields=['updated_at'], name='contract_updated_at_idx'),
+        ),
+        migrations.AddField(
+            model_name='expirationnotice',
+            name='contract',
+            field=models.ForeignKey(help_text='contract which is about to end', on_delete=django.db.models.deletion.CASCADE, related_name='expiration_notices', to='contracts.Contract'),
+        ),
+        migrations.AddIndex(
+            model_name='expirationnotice',
+            index=models.Index(fields=['window', 'sent_at'], name='expiration_notice_sent_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='expirationnotice',
+            unique_together=set([('contract', 'notice_type', 'window')]),
+        ),
+    ]
@@ -8,6 +8,14 @@ from django.core.urlresolvers import reverse
 from core.models import HashIdModel
 from accounts.models import Tenant
 from properties.models import Property
+from contracts.occupancy import occupancy_index
+
+OVERLAPPING_CONTRACT_ERROR = (
+    u'There is already another contract for this property or for this '
+    'tenant and the given dates.')
+INVALID_DATES_ERROR = (
+    u'Invalid dates for contract. Ending date should come after starting '
+    'date.')
 
 
 class Contract(HashIdModel):
@@ -32,6 +40,27 @@ class Contract(HashIdModel):
             self.end_date.strftime('%Y-%m-%d'))
         return rep
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['property', 'start_date', 'end_date'],
+                         name='contract_property_dates_idx'),
+            models.Index(fields=['tenant', 'start_date', 'end_date'],
+                         name='contract_tenant_dates_idx'),
+            # listing ordering, alone and after each equality filter
+            models.Index(fields=['created', 'id'],
+                         name='contract_created_idx'),
+            models.Index(fields=['property', 'created', 'id'],
+                         name='contract_property_created_idx'),
+            models.Index(fields=['tenant', 'created', 'id'],
+                         name='contract_tenant_created_idx'),
+            # expiration reports scan contracts by ending date
+            models.Index(fields=['end_date', 'id'],
+                         name='contract_end_date_idx'),
+            # and look for the ones changed since their last run
+            models.Index(fields=['updated_at'],
+                         name='contract_updated_at_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         self.full_clean()
         super(Contract, self).save(*args, **kwargs)
@@ -39,27 +68,71 @@ class Contract(HashIdModel):
     def clean(self, *args, **kwargs):
         # if all required fields were provided
         if self.tenant and self.property and self.start_date and self.end_date:
-            # filters existing contracts for checking if there is a contract
-            # which includes the property or tenant with overlapping dates
-            contracts = Contract.objects.filter(
-                models.Q(tenant=self.tenant) |
-                models.Q(property=self.property),
-                models.Q(start_date__range=[self.start_date, self.end_date]) |
-                models.Q(end_date__range=[self.start_date, self.end_date]))
-            if self.id:
-                # excludes itself from the filter in a case of update
-                contracts = contracts.exclude(id=self.id)
-            if contracts:
-                raise ValidationError(
-                    u'There is already another contract for this property or '
-                    'for this tenant and the given dates.')
             # end date should be greater than start date
             if not self.end_date > self.start_date:
-                raise ValidationError(
-                    u'Invalid dates for contract. Ending date should come '
-                    'after starting date.')
+                raise ValidationError(INVALID_DATES_ERROR)
+            # checks if there is a contract which includes the property or
+            # the tenant with overlapping dates
+            overlapping = occupancy_index.find_overlapping(
+                self.start_date, self.end_date, exclude=self.id,
+                property_id=self.property_id, tenant_id=self.tenant_id)
+            if overlapping:
+                raise ValidationError(OVERLAPPING_CONTRACT_ERROR)
 
     def get_admin_url(self):
         info = (self._meta.app_label, self._meta.model_name)
         return reverse('admin:{0}_{1}_change'.format(info[0], info[1]),
                        args=(self.pk,))
+
+
+class ExpirationNotice(models.Model):
+    """
+    Record of the expiration notice of a contract sent, or being sent, to
+    one kind of recipient for a window, the number of days before the
+    contract ends
+    """
+    REPORT = 'report'
+    LANDLORD = 'landlord'
+    TENANT = 'tenant'
+    NOTICE_TYPE_CHOICES = (
+        (REPORT, 'Report'),
+        (LANDLORD, 'Landlord'),
+        (TENANT, 'Tenant'),
+    )
+
+    contract = models.ForeignKey(
+        Contract, related_name='expiration_notices',
+        help_text=u'contract which is about to end')
+    notice_type = models.CharField(max_length=10, choices=NOTICE_TYPE_CHOICES)
+    window = models.PositiveSmallIntegerField(
+        help_text=u'days before the ending date')
+    recipient = models.EmailField()
+    claimed_at = models.DateTimeField(
+        help_text=u'date and time of the last attempt to send the notice')
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        unique_together = ('contract', 'notice_type', 'window')
+        indexes = [
+            models.Index(fields=['window', 'sent_at'],
+                         name='expiration_notice_sent_idx'),
+        ]
+
+    def __unicode__(self):
+        return '{} notice of {} ({} days)'.format(
+            self.notice_type, self.contract_id, self.window)
+
+
+class ExpirationWatermark(models.Model):
+    """
+    Last run checking the contracts entering a window, which the next one
+    starts from
+    """
+    window = models.PositiveSmallIntegerField(primary_key=True)
+    checked_until = models.DateField(
+        help_text=u'last ending date of the contracts already checked')
+    checked_at = models.DateTimeField(
+        help_text=u'start of the last check')
+
+    def __unicode__(self):
+        return '{} days: {}'.format(self.window, self.checked_until)
@@ -0,0 +1,149 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q
+from django.utils import timezone
+
+from contracts.models import ExpirationNotice, ExpirationWatermark
+from contracts.reports import RECIPIENT_FIELDS
+
+# size of the id lists of the queries marking notices as sent
+MARK_BATCH_SIZE = 1000
+
+
+class NoticeLog(object):
+    """
+    Tells which contracts of a window still need each type of expiration
+    notice, recording them as pending. Instead of the whole window, only
+    the contracts which entered it or changed since the previous check are
+    examined, along with the ones whose notices could not be sent.
+
+    Meant to be used in a transaction, as the watermark of the window is
+    locked until it is saved. The watermark must be created beforehand, out
+    of the transaction, so that concurrent checks queue up on its lock.
+
+    Report notices are recorded once for all the addresses the report is
+    sent to, a contract reported to one is not reported to another.
+    """
+
+    def __init__(self, window, today, email=None, roles=()):
+        self.window = window
+        self.lower_limit = today
+        self.upper_limit = today + timedelta(days=window)
+        self.started = timezone.now()
+        self.notice_types = ([ExpirationNotice.REPORT] if email else []) + [
+            getattr(ExpirationNotice, role.upper()) for role in roles]
+        self.email = email
+        self.watermark = ExpirationWatermark.objects.select_for_update(
+        ).filter(window=window).first()
+        # contract ids of pending notices by notice type and recipient
+        self.pending = {}
+
+    @staticmethod
+    def create_watermark(window, today):
+        """
+        Creates the watermark of window if it was never checked, as checked
+        until the day before the window, so that its first check examines
+        the whole window
+        """
+        ExpirationWatermark.objects.get_or_create(window=window, defaults={
+            'checked_until': today - timedelta(days=1),
+            'checked_at': timezone.now()})
+
+    def get_retry_limit(self):
+        """
+        Returns the time before which notices not sent were claimed by a run
+        which failed sending them, rather than one still sending them
+        """
+        lease = getattr(settings, 'EXPIRATION_NOTICE_LEASE', 600)
+        return self.started - timedelta(seconds=lease)
+
+    def filter_contracts(self, queryset):
+        """
+        Keeps the contracts of queryset, which must end within the window,
+        that may need notices, with conditions evaluated by the database
+        rather than lists of ids
+        """
+        if self.watermark is None:
+            return queryset
+        retried = ExpirationNotice.objects.filter(
+            window=self.window, sent_at__isnull=True,
+            claimed_at__lt=self.get_retry_limit()).values('contract_id')
+        return queryset.filter(
+            Q(end_date__gt=self.watermark.checked_until) |
+            Q(updated_at__gte=self.watermark.checked_at) |
+            Q(id__in=retried))
+
+    def get_recipient(self, values, notice_type):
+        if notice_type == ExpirationNotice.REPORT:
+            return self.email
+        return values[RECIPIENT_FIELDS[notice_type][1]]
+
+    def claim(self, chunk):
+        """
+        Returns a dict mapping each notice type to the values of the
+        contracts of chunk still needing it, recording their notices as
+        pending
+        """
+        notices = dict(
+            ((contract_id, notice_type), (sent_at, claimed_at))
+            for contract_id, notice_type, sent_at, claimed_at in
+            ExpirationNotice.objects.filter(
+                window=self.window, notice_type__in=self.notice_types,
+                contract_id__in=[values['id'] for values in chunk]
+            ).values_list('contract_id', 'notice_type', 'sent_at',
+                          'claimed_at'))
+        retry_limit = self.get_retry_limit()
+        claimed = dict((notice_type, []) for notice_type in self.notice_types)
+        created = []
+        retried = []
+        for values in chunk:
+            for notice_type in self.notice_types:
+                key = (values['id'], notice_type)
+                if key in notices:
+                    sent_at, claimed_at = notices[key]
+                    if sent_at or claimed_at >= retry_limit:
+                        continue
+                    retried.append(values['id'])
+                else:
+                    created.append(ExpirationNotice(
+                        contract_id=values['id'], notice_type=notice_type,
+                        window=self.window, claimed_at=self.started,
+                        recipient=self.get_recipient(values, notice_type)))
+                claimed[notice_type].append(values)
+                recipient = self.get_recipient(values, notice_type)
+                self.pending.setdefault(
+                    (notice_type, recipient), []).append(values['id'])
+        ExpirationNotice.objects.bulk_create(created)
+        if retried:
+            ExpirationNotice.objects.filter(
+                window=self.window, notice_type__in=self.notice_types,
+                contract_id__in=retried, sent_at__isnull=True,
+                claimed_at__lt=retry_limit
+            ).update(claimed_at=self.started)
+        return claimed
+
+    def save(self):
+        """Moves the watermark of the window after this check"""
+        ExpirationWatermark.objects.update_or_create(
+            window=self.window, defaults={
+                'checked_until': self.upper_limit,
+                'checked_at': self.started})
+
+    def mark_sent(self, keys):
+        """
+        Records as sent the pending notices of the (notice type, recipient)
+        keys whose messages were sent
+        """
+        now = timezone.now()
+        for notice_type in self.notice_types:
+            ids = [contract_id for key in keys if key[0] == notice_type
+                   for contract_id in self.pending.get(key, ())]
+            for index in range(0, len(ids), MARK_BATCH_SIZE):
+                ExpirationNotice.objects.filter(
+                    window=self.window, notice_type=notice_type,
+                    contract_id__in=ids[index:index + MARK_BATCH_SIZE]
+                ).update(sent_at=now)
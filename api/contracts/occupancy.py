@@ -0,0 +1,87 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import bisect
+import threading
+from collections import OrderedDict
+from datetime import date
+
+from django.apps import apps
+
+from core.versions import get_version
+
+VERSION_KEY = 'contracts.contract'
+
+
+class OccupancyIndex(object):
+    """
+    In-process index of the contract intervals of each property and tenant.
+
+    The intervals of a property or tenant are loaded on first use and kept
+    sorted by starting date, up to max_keys properties and tenants. The
+    whole index is dropped whenever the contracts version token shared by
+    all processes changes, so no process answers from stale intervals.
+    """
+
+    def __init__(self, max_keys=10000):
+        self.max_keys = max_keys
+        self.version = None
+        self.intervals = OrderedDict()
+        self.lock = threading.RLock()
+
+    def clear(self):
+        """Drops every loaded interval"""
+        with self.lock:
+            self.version = None
+            self.intervals.clear()
+
+    def check_version(self):
+        """Drops loaded intervals when contracts changed in any process"""
+        version = get_version(VERSION_KEY)
+        with self.lock:
+            if version != self.version:
+                self.intervals.clear()
+                self.version = version
+
+    def get_intervals(self, field, value):
+        """
+        Returns the sorted (start_date, end_date, id) intervals of the
+        contracts with given value for field
+        """
+        key = (field, value)
+        with self.lock:
+            intervals = self.intervals.pop(key, None)
+            if intervals is None:
+                contract_model = apps.get_model('contracts', 'Contract')
+                intervals = sorted(contract_model.objects.filter(
+                    **{field: value}).values_list(
+                    'start_date', 'end_date', 'id'))
+            # most recently used keys are kept at the end
+            self.intervals[key] = intervals
+            if len(self.intervals) > self.max_keys:
+                self.intervals.popitem(last=False)
+        return intervals
+
+    def find_overlapping(self, start_date, end_date, exclude=None, **keys):
+        """
+        Returns the ids of contracts overlapping given dates for any of the
+        given keys, e.g. property_id and tenant_id
+        """
+        self.check_version()
+        overlapping = set()
+        for field, value in keys.items():
+            intervals = self.get_intervals(field, value)
+            # intervals starting after end_date can not overlap
+            stop = bisect.bisect_right(intervals, (end_date, date.max))
+            overlapping.update(
+                contract_id for start, end, contract_id in intervals[:stop]
+                if end >= start_date and contract_id != exclude)
+        return overlapping
+
+    def is_property_available(self, property_id, start_date, end_date):
+        """Checks if property has no contracts overlapping given dates"""
+        return not self.find_overlapping(
+            start_date, end_date, property_id=property_id)
+
+
+occupancy_index = OccupancyIndex()
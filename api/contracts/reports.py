@@ -0,0 +1,102 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import urlparse
+from collections import OrderedDict
+
+from django.core.urlresolvers import reverse
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from properties.models import Property
+from contracts.models import Contract
+
+ROWS_TEMPLATE = 'contracts_expiration_rows.html'
+TEXT_ROWS_TEMPLATE = 'contracts_expiration_rows.txt'
+
+# the only columns read for the expiration report
+REPORT_FIELDS = (
+    'id', 'end_date', 'rent', 'property__category', 'property__street',
+    'property__number', 'property__city', 'property__landlord_id',
+    'property__landlord__email', 'property__landlord__first_name',
+    'property__landlord__last_name', 'tenant_id', 'tenant__email',
+    'tenant__first_name', 'tenant__last_name')
+
+# the recipients each contract is reported to, by their id and email fields
+RECIPIENT_FIELDS = {
+    'landlord': ('property__landlord_id', 'property__landlord__email'),
+    'tenant': ('tenant_id', 'tenant__email'),
+}
+
+_id_placeholder = '__id__'
+
+
+def get_expiring_contracts(lower_limit, upper_limit):
+    """
+    Returns the values of the report fields of the contracts ending within
+    the limits, ordered by ending date
+    """
+    return Contract.objects.filter(
+        end_date__range=[lower_limit, upper_limit]
+    ).order_by('end_date', 'id').values(*REPORT_FIELDS)
+
+
+def get_admin_url_format(host):
+    """
+    Returns the format of the absolute admin urls of contracts, taking the
+    contract id, resolved once instead of once per contract
+    """
+    info = (Contract._meta.app_label, Contract._meta.model_name)
+    path = reverse('admin:{0}_{1}_change'.format(*info),
+                   args=(_id_placeholder,))
+    url = urlparse.urljoin(host, path)
+    return url.replace('{', '{{').replace('}', '}}').replace(
+        _id_placeholder, '{}')
+
+
+def get_full_name(first_name, last_name):
+    return '{} {}'.format(first_name, last_name).strip()
+
+
+def build_report_row(values, admin_url_format=None):
+    """
+    Returns the data of the report line of a contract from its values,
+    linking to its admin page only with admin_url_format, as landlords and
+    tenants have no access to it
+    """
+    row = {
+        'contract_id': values['id'],
+        'end_date': values['end_date'].strftime('%Y-%m-%d'),
+        'property': Property.get_label(
+            values['property__category'], values['property__street'],
+            values['property__number'], values['property__city']),
+        'tenant': get_full_name(
+            values['tenant__first_name'], values['tenant__last_name']),
+        'landlord': get_full_name(
+            values['property__landlord__first_name'],
+            values['property__landlord__last_name']),
+        'rent': values['rent'],
+    }
+    if admin_url_format:
+        row['contract_url'] = admin_url_format.format(values['id'])
+    return row
+
+
+def render_report_rows(rows):
+    """Returns the HTML of the table rows and the text of report lines"""
+    context = {'contracts': rows}
+    return (mark_safe(render_to_string(ROWS_TEMPLATE, context)),
+            mark_safe(render_to_string(TEXT_ROWS_TEMPLATE, context)))
+
+
+def group_by_recipient(values_list, role):
+    """
+    Returns an ordered dict mapping the (id, email) of the landlords or
+    tenants, following role, to the values of their contracts
+    """
+    id_field, email_field = RECIPIENT_FIELDS[role]
+    groups = OrderedDict()
+    for values in values_list:
+        key = (values[id_field], values[email_field])
+        groups.setdefault(key, []).append(values)
+    return groups
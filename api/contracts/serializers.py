@@ -12,6 +12,7 @@ class ContractSerializer(serializers.HyperlinkedModelSerializer):
     tenant = TenantSerializer(read_only=True)
     property = PropertySerializer(read_only=True)
     created = serializers.SerializerMethodField()
+    method_field_sources = {'created': ('created',)}
 
     def get_created(self, obj):
         return obj.created.strftime('%Y-%m-%d')
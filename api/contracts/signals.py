@@ -0,0 +1,20 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from core.signals import post_bulk_create
+from contracts.models import Contract
+from contracts.occupancy import occupancy_index
+
+
+@receiver(post_save, sender=Contract)
+@receiver(post_delete, sender=Contract)
+@receiver(post_bulk_create, sender=Contract)
+def invalidate_occupancy(sender, **kwargs):
+    """
+    Drops the intervals loaded by this process. Other processes drop theirs
+    when the contracts version token bumped by core.signals changes.
+    """
+    occupancy_index.clear()
@@ -1,13 +1,23 @@
 # -*- encoding: UTF-8 -*-
 from __future__ import unicode_literals
 
+import json
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 
+from core.models import Job
 from core.tests import JWTAuthenticationTestCase
-from accounts.tests.factories import UserFactory
+from accounts.tests.factories import UserFactory, TenantFactory
 from accounts.models import Tenant, Landlord
 from properties.models import Property
-from contracts.models import Contract
+from properties.tests.factories import PropertyFactory
+from contracts.models import (Contract, INVALID_DATES_ERROR,
+                              OVERLAPPING_CONTRACT_ERROR)
+from contracts.tests.factories import ContractFactory
 
 
 class TestContractEndpoints(JWTAuthenticationTestCase):
@@ -506,7 +516,7 @@ class TestContractEndpoints(JWTAuthenticationTestCase):
         response = self.client.get(
             '/api/contracts', params, **self.common_headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected)
+        self.assertEqual(self.get_streamed_data(response), expected)
 
     def test_list_contracts_split_pages_as_staff(self):
         """
@@ -878,7 +888,7 @@ class TestContractEndpoints(JWTAuthenticationTestCase):
         response = self.client.get(
             '/api/contracts', params, **self.common_headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected)
+        self.assertEqual(self.get_streamed_data(response), expected)
 
     def test_list_contracts_split_pages_as_common(self):
         """
@@ -917,3 +927,122 @@ class TestContractEndpoints(JWTAuthenticationTestCase):
             '/api/contracts', params, **self.common_headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data, expected)
+
+
+class TestContractBulkEndpoint(JWTAuthenticationTestCase):
+    def setUp(self):
+        user = UserFactory(is_staff=False)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+        self.existing = ContractFactory(
+            start_date='2018-01-01', end_date='2018-12-31')
+        self.property = self.existing.property
+        self.tenants = [TenantFactory(email='tenant{}@email.com'.format(i))
+                        for i in range(3)]
+
+    def get_item(self, tenant, start, end, aproperty=None):
+        return {'property': (aproperty or self.property).id,
+                'tenant': tenant.id, 'start_date': start, 'end_date': end,
+                'rent': '1000.00'}
+
+    def post(self, data, **kwargs):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(
+                '/api/contracts/bulk', data, **dict(kwargs, **self.headers))
+        return response, len(queries)
+
+    def test_bulk_create_contracts(self):
+        """
+        Should create valid contracts and reject overlapping ones with a
+        number of queries independent of the number of contracts
+        """
+        payload = [
+            self.get_item(self.tenants[0], '2019-01-01', '2019-06-30'),
+            # overlaps the existing contract
+            self.get_item(self.tenants[1], '2018-06-01', '2019-01-01'),
+            # overlaps the first contract of the batch
+            self.get_item(self.tenants[2], '2019-06-01', '2019-12-31'),
+            self.get_item(self.tenants[2], '2019-07-01', '2019-12-31',
+                          PropertyFactory(landlord=self.property.landlord)),
+            self.get_item(self.tenants[1], '2019-12-31', '2019-01-01'),
+            self.get_item(self.tenants[1], '2020-01-01', '2020-12-31',
+                          Property(id='unknown')),
+        ]
+        response, few_queries = self.post(payload, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        details = [result.get('detail')
+                   for result in response.data['results']]
+        self.assertEqual(details, [
+            None, OVERLAPPING_CONTRACT_ERROR, OVERLAPPING_CONTRACT_ERROR,
+            None, INVALID_DATES_ERROR,
+            'Property with id "unknown" does not exist'])
+        data = response.data['results'][0]['data']
+        self.assertEqual(data['tenant'], self.tenants[0].id)
+        self.assertTrue(Contract.objects.filter(id=data['id']).exists())
+
+        payload = [
+            self.get_item(self.tenants[1], '202{}-01-01'.format(year),
+                          '202{}-12-31'.format(year),
+                          PropertyFactory(landlord=self.property.landlord))
+            for year in range(1, 10)]
+        response, many_queries = self.post(payload, format='json')
+        self.assertEqual(response.data['created'], 9)
+        self.assertEqual(many_queries, few_queries)
+
+    def test_bulk_create_contracts_csv(self):
+        """Should create contracts sent as CSV with a header line"""
+        lines = ['property,tenant,start_date,end_date,rent']
+        lines.extend(
+            '{},{},2019-0{}-01,2019-0{}-28,800'.format(
+                self.property.id, tenant.id, month, month)
+            for month, tenant in enumerate(self.tenants, 1))
+        lines.append('{},,2020-01-01,2020-12-31,800'.format(self.property.id))
+        response, __ = self.post('\n'.join(lines), content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual(response.data['results'][3]['detail'],
+                         'Missing tenant parameter containing tenant id')
+        self.assertEqual(Contract.objects.filter(
+            property=self.property).count(), 4)
+
+    def test_bulk_create_contracts_ndjson(self):
+        """Should create contracts sent as one JSON object per line"""
+        lines = [json.dumps(self.get_item(
+            self.tenants[0], '2019-01-01', '2019-06-30')), '', '[]']
+        response, __ = self.post(
+            '\n'.join(lines), content_type='application/x-ndjson')
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['results'][1]['detail'],
+                         'Expected an object')
+
+    def test_queue_import(self):
+        """
+        Should queue contracts sent to the import endpoint, reporting the
+        imported and rejected ones in the result of the job
+        """
+        payload = [
+            self.get_item(self.tenants[0], '2019-01-01', '2019-06-30'),
+            self.get_item(self.tenants[1], '2018-06-01', '2019-01-01'),
+        ]
+        response = self.client.post('/api/contracts/import', payload,
+                                    format='json', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Job.QUEUED)
+        self.assertEqual(response['Location'],
+                         '/api/jobs/{}'.format(response.data['id']))
+        self.assertEqual(Contract.objects.count(), 1)
+
+        call_command('run_workers', burst=True, stdout=StringIO())
+        response = self.client.get(response['Location'], **self.headers)
+        self.assertEqual(response.data['status'], Job.DONE)
+        self.assertEqual(response.data['result'], {
+            'imported': 1,
+            'rejected': [{'row': 2, 'error': OVERLAPPING_CONTRACT_ERROR}]})
+        self.assertEqual(Contract.objects.count(), 2)
+
+    def test_invalid_ndjson(self):
+        """Should get 400 when a line is not valid JSON"""
+        response, __ = self.post(
+            '{"tenant": 1}\n{"tenant"', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Contract.objects.count(), 1)
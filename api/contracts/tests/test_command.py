@@ -1,12 +1,29 @@
 # -*- encoding: UTF-8 -*-
 from __future__ import unicode_literals
 
+import json
+import os
+import shutil
+import smtplib
+import tempfile
+from datetime import date, timedelta
+from StringIO import StringIO
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.core import mail
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from mock import patch
 from testfixtures import LogCapture
 from freezegun import freeze_time
 
+from core.models import Job
+from accounts.tests.factories import TenantFactory
+from contracts.models import (Contract, ExpirationNotice, ExpirationWatermark,
+                              OVERLAPPING_CONTRACT_ERROR)
+from contracts.notices import NoticeLog
 from contracts.tests.factories import ContractFactory
 
 
@@ -38,9 +55,19 @@ class TestContractsReportCommand(TestCase):
         expected = (('contracts.management.commands.check_contracts',
                      'INFO',
                      (u'There were no contracts with due date '
-                      'to within one week')))
+                      'to within 7 days')))
         output.check(expected)
 
+    @freeze_time('2018-09-20')
+    def test_call_command_no_contracts_in_days(self):
+        """Should tell the window searched when no contract was found"""
+        output = StringIO()
+        call_command('check_contracts', 'report@fake.mail', days=1,
+                     stdout=output)
+        self.assertEqual(
+            output.getvalue().splitlines()[0],
+            'There were no contracts with due date to within 1 days')
+
     @freeze_time('2018-09-20')
     def test_call_command_send_report(self):
         """
@@ -77,3 +104,325 @@ class TestContractsReportCommand(TestCase):
         self.assertIn('<td> {} </td>'.format(
             self.contract_two.tenant.get_full_name()), content)
         self.assertIn('<td> {}'.format(self.contract_two.rent), content)
+
+    @freeze_time('2018-09-20')
+    def test_call_command_in_chunks(self):
+        """
+        Should read contracts chunk by chunk without a query per contract
+        and report the timing of each phase
+        """
+        output = StringIO()
+        with CaptureQueriesContext(connection) as queries:
+            call_command('check_contracts', 'report@fake.mail',
+                         chunk_size=1, stdout=output)
+        # two chunks of one contract and the empty one ending the scan
+        self.assertEqual(len(queries), 3)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(lines[:2], ['2 contracts reported', '1 reports sent'])
+        self.assertEqual([line.split(':')[0] for line in lines[2:]],
+                         ['query', 'rows', 'build', 'send'])
+        content, mimetype = mail.outbox[0].alternatives[0]
+        self.assertIn(self.contract_one.id, content)
+        self.assertIn(self.contract_two.id, content)
+
+    @freeze_time('2018-09-20')
+    def test_call_command_per_landlord(self):
+        """
+        Should send each landlord and tenant the report of their own
+        contracts besides the report of all of them
+        """
+        other = ContractFactory(
+            property__landlord=self.contract_one.property.landlord,
+            tenant=TenantFactory(email='another.tenant@email.com'),
+            start_date='2017-09-01', end_date='2018-09-26')
+        output = StringIO()
+        call_command('check_contracts', 'report@fake.mail', landlords=True,
+                     tenants=True, chunk_size=2, workers=2, batch_size=2,
+                     stdout=output)
+        self.assertIn('6 reports sent', output.getvalue())
+        reports = dict((message.to[0], message.alternatives[0][0])
+                       for message in mail.outbox)
+        self.assertEqual(len(reports), 6)
+        for contract in (self.contract_one, self.contract_two, other):
+            self.assertIn(contract.id, reports['report@fake.mail'])
+            self.assertIn(contract.id, reports[contract.tenant.email])
+        landlord_report = reports[self.contract_one.property.landlord.email]
+        self.assertIn(self.contract_one.id, landlord_report)
+        self.assertIn(other.id, landlord_report)
+        self.assertNotIn(self.contract_two.id, landlord_report)
+        self.assertNotIn(other.id, reports[self.contract_one.tenant.email])
+        # only the admin report links to the admin site
+        self.assertIn('/admin/contracts/contract/',
+                      reports['report@fake.mail'])
+        for address, report in reports.items():
+            if address != 'report@fake.mail':
+                self.assertNotIn('/admin/', report)
+
+    @freeze_time('2018-09-20')
+    def test_call_command_landlords_only(self):
+        """Should send the landlord reports without an admin e-mail"""
+        call_command('check_contracts', landlords=True, stdout=StringIO())
+        self.assertEqual(
+            sorted(message.to[0] for message in mail.outbox),
+            sorted([self.contract_one.property.landlord.email,
+                    self.contract_two.property.landlord.email]))
+
+    @freeze_time('2018-09-20')
+    def test_call_command_text_part(self):
+        """Should render the text part from its own template"""
+        call_command('check_contracts', 'report@fake.mail', landlords=True,
+                     processes=2, stdout=StringIO())
+        for message in mail.outbox:
+            self.assertIn('Contracts reporting @ ', message.body)
+            self.assertNotIn('<', message.body)
+        contract = Contract.objects.get(pk=self.contract_one.pk)
+        line = '{} | {} | {} | {} | {} | {} \xa3'.format(
+            contract.id, contract.end_date.strftime('%Y-%m-%d'),
+            contract.property.__unicode__(),
+            contract.property.landlord.get_full_name(),
+            contract.tenant.get_full_name(), contract.rent)
+        bodies = dict((message.to[0], message.body)
+                      for message in mail.outbox)
+        self.assertIn(line, bodies['report@fake.mail'])
+        self.assertIn(line, bodies[contract.property.landlord.email])
+
+    @freeze_time('2018-09-20')
+    def test_call_command_enqueue(self):
+        """Should queue the reports to be sent by a worker"""
+        output = StringIO()
+        call_command('check_contracts', landlords=True, enqueue=True,
+                     stdout=output)
+        self.assertEqual(len(mail.outbox), 0)
+        job = Job.objects.get()
+        self.assertEqual(output.getvalue(),
+                         'Reports queued as job {}\n'.format(job.id))
+        call_command('run_workers', burst=True, stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertIn('2 reports sent', Job.objects.get().get_result())
+
+    def test_call_command_without_recipients(self):
+        """Should refuse running without any recipient"""
+        with self.assertRaises(CommandError):
+            call_command('check_contracts')
+
+
+class TestIncrementalContractsReport(TestCase):
+
+    def setUp(self):
+        with freeze_time('2018-09-19'):
+            self.contract_one = ContractFactory(
+                start_date='2017-09-25', end_date='2018-09-25')
+            self.contract_two = ContractFactory(
+                start_date='2017-10-22', end_date='2018-09-22')
+
+    def call_command(self, **options):
+        output = StringIO()
+        call_command('check_contracts', 'report@fake.mail', incremental=True,
+                     retries=0, stdout=output, **options)
+        return output.getvalue().splitlines()[0]
+
+    def get_report(self):
+        return [message for message in mail.outbox
+                if message.to == ['report@fake.mail']][0].body
+
+    def test_notices_sent_once(self):
+        """
+        Should only report contracts which were not reported before, once
+        for each kind of recipient
+        """
+        with freeze_time('2018-09-20 08:00:00') as frozen:
+            self.assertEqual(self.call_command(landlords=True),
+                             '2 contracts reported')
+            self.assertEqual(len(mail.outbox), 3)
+            self.assertEqual(ExpirationNotice.objects.filter(
+                sent_at__isnull=False).count(), 4)
+            mail.outbox = []
+            frozen.tick(timedelta(minutes=5))
+            self.assertEqual(
+                self.call_command(landlords=True),
+                'There were no contracts with due date to within 7 days')
+            self.assertEqual(len(mail.outbox), 0)
+            # reported once it enters the window
+            later = ContractFactory(
+                start_date='2017-09-28', end_date='2018-09-28',
+                tenant=TenantFactory(email='third@email.com'),
+                property__landlord=self.contract_one.property.landlord)
+
+        with freeze_time('2018-09-21 08:00:00'):
+            self.assertEqual(self.call_command(landlords=True),
+                             '1 contracts reported')
+        report = self.get_report()
+        self.assertIn(later.id, report)
+        self.assertNotIn(self.contract_one.id, report)
+        self.assertEqual(len(mail.outbox), 2)
+        landlord_report = mail.outbox[1]
+        self.assertEqual(landlord_report.to,
+                         [self.contract_one.property.landlord.email])
+        self.assertIn(later.id, landlord_report.body)
+        self.assertNotIn(self.contract_one.id, landlord_report.body)
+
+    def test_changed_contracts(self):
+        """
+        Should report contracts changed since the last run to end within
+        the window, without examining the others
+        """
+        with freeze_time('2018-09-20 08:00:00') as frozen:
+            self.call_command()
+            frozen.tick(timedelta(minutes=5))
+            changed = ContractFactory(
+                start_date='2017-09-23', end_date='2018-09-28',
+                tenant=TenantFactory(email='third@email.com'),
+                property__landlord=self.contract_one.property.landlord)
+            changed.end_date = '2018-09-23'
+            changed.save()
+            frozen.tick(timedelta(minutes=5))
+            mail.outbox = []
+            with CaptureQueriesContext(connection) as queries:
+                self.assertEqual(self.call_command(), '1 contracts reported')
+        self.assertIn(changed.id, self.get_report())
+        self.assertNotIn(self.contract_one.id, self.get_report())
+        scans = [query['sql'] for query in queries
+                 if 'FROM "contracts_contract"' in query['sql'] and
+                 'JOIN' in query['sql']]
+        self.assertEqual(len(scans), 1)
+        # candidates are selected by the scan itself, not by a list of ids
+        self.assertIn('"contracts_contract"."updated_at" >=', scans[0])
+        self.assertIn('FROM "contracts_expirationnotice"', scans[0])
+        self.assertNotIn(changed.id, scans[0])
+
+    def test_watermark_of_unfinished_first_run(self):
+        """
+        Should examine the whole window while its first check did not finish,
+        the watermark being created before it is locked
+        """
+        with freeze_time('2018-09-20 08:00:00') as frozen:
+            NoticeLog.create_watermark(7, date.today())
+            frozen.tick(timedelta(hours=1))
+            self.assertEqual(self.call_command(), '2 contracts reported')
+            watermark = ExpirationWatermark.objects.get(window=7)
+            self.assertEqual(watermark.checked_until, date(2018, 9, 27))
+
+    @patch('contracts.management.helpers.time.sleep')
+    def test_failed_notices_retried(self, sleep):
+        """
+        Should retry the notices which could not be sent once their lease
+        expired
+        """
+        with freeze_time('2018-09-20 08:00:00') as frozen:
+            with patch('django.core.mail.backends.locmem.EmailBackend.'
+                       'send_messages', side_effect=smtplib.SMTPException):
+                with LogCapture():
+                    self.call_command()
+            self.assertFalse(ExpirationNotice.objects.filter(
+                sent_at__isnull=False).exists())
+            frozen.tick(timedelta(minutes=5))
+            self.assertEqual(
+                self.call_command(),
+                'There were no contracts with due date to within 7 days')
+            frozen.tick(timedelta(minutes=10))
+            self.assertEqual(self.call_command(), '2 contracts reported')
+        self.assertEqual(ExpirationNotice.objects.filter(
+            sent_at__isnull=False).count(), 2)
+
+
+class TestImportContractsCommand(TestCase):
+
+    def setUp(self):
+        self.existing = ContractFactory(
+            start_date='2018-01-01', end_date='2018-12-31')
+        self.property = self.existing.property
+        self.tenant = self.existing.tenant
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write_file(self, name, lines):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w') as output:
+            output.write('\n'.join(lines).encode('utf-8'))
+        return path
+
+    def call_command(self, path, **options):
+        output = StringIO()
+        call_command('import_contracts', path, stdout=output, **options)
+        return output.getvalue().splitlines()
+
+    def test_import_csv(self):
+        """
+        Should import valid rows of a CSV file, reporting rejected rows and
+        the throughput
+        """
+        path = self.write_file('contracts.csv', [
+            'property,tenant,start_date,end_date,rent',
+            '{},{},2019-01-01,2019-12-31,900'.format(
+                self.property.id, self.tenant.id),
+            '{},{},2018-06-01,2019-12-31,900'.format(
+                self.property.id, TenantFactory(email='t@email.com').id),
+            '{},{},2020-01-01,2020-12-31,nine'.format(
+                self.property.id, self.tenant.id),
+            '{},{},2021-01-01,2021-12-31,900'.format(
+                self.property.id, self.tenant.id),
+        ])
+        lines = self.call_command(path, chunk_size=1)
+        self.assertEqual(lines[:2], [
+            'Row 2: {}'.format(OVERLAPPING_CONTRACT_ERROR),
+            "Row 3: 'rent': 'nine' value must be a decimal number."])
+        self.assertTrue(lines[2].startswith(
+            '2 contracts imported, 2 rejected in '))
+        self.assertTrue(lines[2].endswith(' rows/s)'))
+        self.assertEqual(Contract.objects.filter(
+            tenant=self.tenant).count(), 3)
+
+    def test_import_ndjson(self):
+        """Should import a newline delimited JSON file"""
+        path = self.write_file('contracts.txt', [json.dumps({
+            'property': self.property.id, 'tenant': self.tenant.id,
+            'start_date': '2019-01-01', 'end_date': '2019-12-31',
+            'rent': 900})])
+        lines = self.call_command(path, format='ndjson')
+        self.assertTrue(lines[0].startswith(
+            '1 contracts imported, 0 rejected in '))
+        self.assertEqual(Contract.objects.count(), 2)
+
+    def test_import_enqueue(self):
+        """Should queue the rows of the file to be imported by a worker"""
+        path = self.write_file('contracts.csv', [
+            'property,tenant,start_date,end_date,rent',
+            '{},{},2019-01-01,2019-12-31,900'.format(
+                self.property.id, self.tenant.id)])
+        lines = self.call_command(path, enqueue=True)
+        job = Job.objects.get()
+        self.assertEqual(lines, ['1 rows queued as job {}'.format(job.id)])
+        self.assertEqual(Contract.objects.count(), 1)
+        call_command('run_workers', burst=True, stdout=StringIO())
+        self.assertEqual(Job.objects.get().get_result(),
+                         {'imported': 1, 'rejected': []})
+        self.assertEqual(Contract.objects.count(), 2)
+
+    def test_unknown_format(self):
+        """Should fail when the format can not be guessed"""
+        path = self.write_file('contracts.txt', [])
+        with self.assertRaises(CommandError):
+            self.call_command(path)
+
+    def test_invalid_file(self):
+        """Should fail without importing rows of a malformed file"""
+        path = self.write_file('contracts.ndjson', [
+            json.dumps({'property': self.property.id}), '{"tenant"'])
+        with self.assertRaises(CommandError):
+            self.call_command(path)
+        self.assertEqual(Contract.objects.count(), 1)
+
+
+class TestBenchmarkReportsCommand(TestCase):
+
+    def test_call_command(self):
+        """Should report the rendering throughput of every mode"""
+        output = StringIO()
+        call_command('benchmark_reports', recipients=4, rows=2, processes=2,
+                     stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual([line.split()[:3] for line in lines[1:]],
+                         [['strip_tags', '1', '4'], ['text', '1', '4'],
+                          ['pool', '2', '4']])
@@ -1,58 +1,153 @@
 # -*- encoding: UTF-8 -*-
 from __future__ import unicode_literals
 
-from django.test import TestCase
+import logging
+import smtplib
+import socket
+import threading
+
 from django.core import mail
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.core.mail.backends import locmem
+from django.template import TemplateDoesNotExist
+from django.test import TestCase, override_settings
 from mock import patch
 from testfixtures import LogCapture
 
+from contracts.management.helpers import (available_cpus,
+                                          get_render_processes,
+                                          render_in_pool, send_in_batches,
+                                          send_template_mail)
 
-from contracts.management.helpers import send_template_mail
 
+class TestHelpers(TestCase):
 
-class MockMessage(object):
-    def __init__(self, *args, **kwargs):
-        super(MockMessage, *args, **kwargs)
+    def test_send_email_building_failure(self):
+        """
+        Should not hide errors building the report email, which sending
+        again would not fix
+        """
+        with self.assertRaises(TemplateDoesNotExist):
+            send_template_mail('Test', 'missing_template.html',
+                               ['user@fake.mail'])
+        self.assertEqual(len(mail.outbox), 0)
 
-    def send(self):
-        raise Exception('Testing message')
+    @patch('contracts.management.helpers.get_quota_cpus', return_value=2)
+    @patch('contracts.management.helpers.get_affinity_cpus', return_value=3)
+    @patch('contracts.management.helpers.cpu_count', return_value=8)
+    def test_available_cpus(self, cpu_count, affinity, quota):
+        """Should count the cores allowed by the affinity and cgroup quota"""
+        self.assertEqual(available_cpus(), 2)
+        quota.return_value = None
+        self.assertEqual(available_cpus(), 3)
 
+    @override_settings(REPORT_RENDER_PROCESSES=4)
+    @patch('contracts.management.helpers.available_cpus', return_value=6)
+    def test_render_processes_capped(self, available):
+        """Should use at most REPORT_RENDER_PROCESSES processes"""
+        self.assertEqual(get_render_processes(), 4)
+        self.assertEqual(get_render_processes(8), 4)
+        self.assertEqual(get_render_processes(2), 2)
 
-class TestHelpers(TestCase):
+    @patch('contracts.management.helpers.Pool')
+    def test_render_in_thread(self, pool):
+        """Should render in the current process out of the main thread"""
+        contexts = [{'report': {'date': date, 'contracts': []}}
+                    for date in ('2017-09-20', '2017-09-21')]
+        results = []
+        thread = threading.Thread(target=lambda: results.append(
+            render_in_pool('contracts_expiration_email.html', contexts,
+                           'contracts_expiration_email.txt', processes=2)))
+        thread.start()
+        thread.join()
+        self.assertFalse(pool.called)
+        self.assertEqual(len(results[0]), 2)
 
-    def test_send_email_building_failure(self):
+    @patch('contracts.management.helpers.time.sleep')
+    def test_send_email_sending_failure(self, sleep):
         """
-        Should log an error message when an exception happens while
-        building the report email
+        Should retry sending the report email and log an error message when
+        every attempt fails
         """
-        with LogCapture() as output:
-            with patch(
-                'contracts.management.helpers.build_email_multi_alternative',
-                    side_effect=Exception):
-                    send_template_mail(
-                        'Test', 'contracts_expiration_email.html',
-                        ['user@fake.mail'])
+        with LogCapture(level=logging.ERROR) as output:
+            with patch('django.core.mail.backends.locmem.EmailBackend.'
+                       'send_messages', side_effect=smtplib.SMTPException):
+                sent = send_template_mail(
+                    'Test', 'contracts_expiration_email.html',
+                    ['user@fake.mail'], retries=2)
+        self.assertEqual(sent, 0)
+        self.assertEqual(sleep.call_count, 2)
         expected = (('contracts.management.helpers',
                      'ERROR',
-                     'Failed building contracts expiration report email.'))
+                     'Failed sending contracts expiration report email.'))
         output.check(expected)
 
-    def test_send_email_sending_failure(self):
+    @patch('contracts.management.helpers.time.sleep')
+    def test_send_email_retried(self, sleep):
+        """Should send the report email when a retry succeeds"""
+        with patch('django.core.mail.backends.locmem.EmailBackend.'
+                   'send_messages', side_effect=[socket.error, 1]):
+            sent = send_template_mail(
+                'Test', 'contracts_expiration_email.html',
+                ['user@fake.mail'])
+        self.assertEqual(sent, 1)
+        sleep.assert_called_once_with(1)
+
+    def test_render_in_pool(self):
         """
-        Should log an error message when an exception happens while
-        sending the report email
+        Should render the same messages in a pool of processes as in the
+        current one, in the order of their contexts
         """
-        with LogCapture() as output:
-            with patch(
-                'contracts.management.helpers.build_email_multi_alternative',
-                    return_value=MockMessage()):
-                    send_template_mail(
-                        'Test', 'contracts_expiration_email.html',
-                        ['user@fake.mail'])
-        expected = (('contracts.management.helpers',
-                     'ERROR',
-                     'Failed sending contracts expiration report email.'))
-        output.check(expected)
+        contexts = [{'report': {'date': date, 'contracts': []}}
+                    for date in ('2017-09-20', '2017-09-21', '2017-09-22')]
+        parts = render_in_pool('contracts_expiration_email.html', contexts,
+                               'contracts_expiration_email.txt', processes=2)
+        self.assertEqual(parts, render_in_pool(
+            'contracts_expiration_email.html', contexts,
+            'contracts_expiration_email.txt', processes=1))
+        self.assertEqual(
+            [text.splitlines()[0] for text, html in parts],
+            ['Contracts reporting @ 2017-09-20',
+             'Contracts reporting @ 2017-09-21',
+             'Contracts reporting @ 2017-09-22'])
+
+    @patch('contracts.management.helpers.time.sleep')
+    def test_send_in_batches(self, sleep):
+        """
+        Should send every message over one connection per worker and return
+        the ones failing on every attempt
+        """
+        messages = [EmailMultiAlternatives('Test', 'Body', to=[address])
+                    for address in ('one@fake.mail', 'fail@fake.mail',
+                                    'two@fake.mail', 'three@fake.mail')]
+        send_messages = locmem.EmailBackend.send_messages
+
+        def send_or_fail(backend, messages):
+            if messages[0].to == ['fail@fake.mail']:
+                raise smtplib.SMTPException
+            return send_messages(backend, messages)
+
+        with LogCapture(level=logging.ERROR) as output:
+            with patch('contracts.management.helpers.get_connection',
+                       wraps=get_connection) as connections:
+                with patch.object(locmem.EmailBackend, 'send_messages',
+                                  autospec=True, side_effect=send_or_fail):
+                    failed = send_in_batches(messages, batch_size=2,
+                                             retries=1)
+        self.assertEqual(connections.call_count, 1)
+        self.assertEqual(failed, [messages[1]])
+        self.assertEqual([message.to[0] for message in mail.outbox],
+                         ['one@fake.mail', 'two@fake.mail', 'three@fake.mail'])
+        output.check(('contracts.management.helpers', 'ERROR',
+                      'Failed sending "Test" to fail@fake.mail.'))
+
+    def test_send_email_closes_connection(self):
+        """Should close the connection opened for sending the email"""
+        with patch.object(locmem.EmailBackend, 'close') as close:
+            send_template_mail('Test', 'contracts_expiration_email.html',
+                               ['user@fake.mail'], context={'report': {}})
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(close.call_count, 1)
 
     def test_send_email_successfully(self):
         """Should successfully send e-mail with given template and data"""
@@ -5,6 +5,7 @@ from django.core.exceptions import ValidationError, ObjectDoesNotExist
 
 from contracts.models import Contract
 from contracts.tests.factories import ContractFactory
+from accounts.tests.factories import TenantFactory
 
 
 class TestContract(TestCase):
@@ -300,3 +301,23 @@ class TestContract(TestCase):
         expected_url = ('/admin/contracts/contract/{}/'
                         'change/').format(contract.id)
         self.assertEqual(expected_url, contract.get_admin_url())
+
+    def test_create_contract_containing_existing_dates(self):
+        """
+        Should raise ValidationError when trying to create a contract whose
+        dates fully contain the dates of another contract for the property
+        """
+        contract = ContractFactory(
+            start_date='2017-10-01', end_date='2017-12-01')
+        invalid_contract_data = {
+            'start_date': '2017-09-01',
+            'end_date': '2018-01-01',
+            'property': contract.property,
+            'tenant': TenantFactory(email='other@email.com'),
+            'rent': 1000.00
+        }
+        expected = ('There is already another contract for this property or '
+                    'for this tenant and the given dates.')
+        with self.assertRaises(ValidationError) as raised:
+            Contract(**invalid_contract_data).save()
+        self.assertIn(expected, raised.exception.message_dict['__all__'])
@@ -0,0 +1,92 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.versions import bump_versions
+from contracts.models import Contract
+from contracts.occupancy import (OccupancyIndex, occupancy_index,
+                                 VERSION_KEY)
+from contracts.tests.factories import ContractFactory
+
+
+class TestOccupancyIndex(TestCase):
+
+    def setUp(self):
+        self.contract = ContractFactory(
+            start_date='2018-01-01', end_date='2018-12-31')
+        self.index = OccupancyIndex()
+
+    def find(self, start, end, **keys):
+        keys = keys or {'property_id': self.contract.property_id}
+        return self.index.find_overlapping(date(*start), date(*end), **keys)
+
+    def test_find_overlapping(self):
+        """
+        Should find contracts overlapping given dates, including contracts
+        starting or ending at the given dates
+        """
+        self.assertEqual(self.find((2018, 6, 1), (2018, 7, 1)),
+                         {self.contract.id})
+        self.assertEqual(self.find((2017, 1, 1), (2018, 1, 1)),
+                         {self.contract.id})
+        self.assertEqual(self.find((2018, 12, 31), (2019, 6, 1)),
+                         {self.contract.id})
+        self.assertEqual(self.find((2017, 1, 1), (2019, 1, 1),
+                                   tenant_id=self.contract.tenant_id),
+                         {self.contract.id})
+        self.assertEqual(self.find((2019, 1, 1), (2019, 6, 1)), set())
+        self.assertEqual(self.find((2017, 1, 1), (2017, 12, 31)), set())
+
+    def test_intervals_loaded_once(self):
+        """
+        Should only check the shared version once intervals of a key were
+        loaded
+        """
+        self.find((2018, 6, 1), (2018, 7, 1))
+        with CaptureQueriesContext(connection) as queries:
+            self.find((2019, 6, 1), (2019, 7, 1))
+        self.assertEqual(len(queries), 1)
+        self.assertIn('core_dataversion', queries[0]['sql'])
+
+    def test_invalidated_by_other_process(self):
+        """
+        Should reload intervals when contracts changed in another process
+        """
+        self.find((2018, 6, 1), (2018, 7, 1))
+        # simulates a change made by another process
+        contract = Contract(
+            start_date=date(2019, 1, 1), end_date=date(2019, 6, 1),
+            rent=100, property=self.contract.property,
+            tenant=self.contract.tenant)
+        Contract.objects.bulk_create([contract])
+        self.assertEqual(self.find((2019, 2, 1), (2019, 3, 1)), set())
+        bump_versions(VERSION_KEY)
+        self.assertEqual(self.find((2019, 2, 1), (2019, 3, 1)),
+                         {contract.id})
+
+    def test_invalidated_by_signals(self):
+        """
+        Should reload intervals when contracts are saved or deleted
+        """
+        occupancy_index.find_overlapping(
+            date(2018, 6, 1), date(2018, 7, 1),
+            property_id=self.contract.property_id)
+        self.assertTrue(occupancy_index.intervals)
+        self.contract.delete()
+        self.assertFalse(occupancy_index.intervals)
+        self.assertTrue(occupancy_index.is_property_available(
+            self.contract.property_id, date(2018, 6, 1), date(2018, 7, 1)))
+
+    def test_max_keys(self):
+        """Should evict least recently used keys above max_keys"""
+        self.index.max_keys = 1
+        self.find((2018, 6, 1), (2018, 7, 1))
+        self.find((2018, 6, 1), (2018, 7, 1),
+                  tenant_id=self.contract.tenant_id)
+        self.assertEqual(list(self.index.intervals.keys()),
+                         [('tenant_id', self.contract.tenant_id)])
@@ -0,0 +1,122 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from datetime import date
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from accounts.tests.factories import TenantFactory
+from properties.tests.factories import PropertyFactory
+from contracts.models import (Contract, INVALID_DATES_ERROR,
+                              OVERLAPPING_CONTRACT_ERROR)
+from contracts.tests.factories import ContractFactory
+from contracts.validators import find_invalid_contracts
+
+
+class TestFindInvalidContracts(TestCase):
+
+    def setUp(self):
+        self.existing = ContractFactory(
+            start_date='2018-01-01', end_date='2018-12-31')
+        self.property = self.existing.property
+        self.tenant = self.existing.tenant
+        self.other_property = PropertyFactory(
+            landlord=self.property.landlord)
+        self.other_tenant = TenantFactory(email='other@email.com')
+
+    def build(self, start, end, aproperty=None, tenant=None):
+        return Contract(
+            start_date=date(*start), end_date=date(*end), rent=1000,
+            property=aproperty or self.other_property,
+            tenant=tenant or self.other_tenant)
+
+    def test_valid_batch(self):
+        """Should return no errors when candidates do not overlap"""
+        contracts = [
+            self.build((2017, 1, 1), (2017, 6, 30), aproperty=self.property),
+            self.build((2019, 1, 1), (2019, 6, 30), tenant=self.tenant),
+            self.build((2021, 1, 1), (2021, 12, 31)),
+            self.build((2022, 1, 1), (2022, 12, 31)),
+        ]
+        self.assertEqual(find_invalid_contracts(contracts), {})
+
+    def test_overlapping_existing_contracts(self):
+        """
+        Should reject candidates overlapping existing contracts by property
+        or by tenant, including ranges containing the existing one
+        """
+        contracts = [
+            self.build((2018, 6, 1), (2019, 6, 1), aproperty=self.property),
+            self.build((2017, 1, 1), (2019, 1, 1), tenant=self.tenant),
+            self.build((2017, 1, 1), (2017, 12, 31), tenant=self.tenant),
+        ]
+        expected = {
+            0: OVERLAPPING_CONTRACT_ERROR,
+            1: OVERLAPPING_CONTRACT_ERROR,
+        }
+        self.assertEqual(find_invalid_contracts(contracts), expected)
+
+    def test_overlapping_candidates(self):
+        """
+        Should reject the candidate starting later when two candidates
+        overlap each other
+        """
+        contracts = [
+            self.build((2020, 3, 1), (2020, 9, 1)),
+            self.build((2020, 1, 1), (2020, 6, 1)),
+            self.build((2020, 9, 2), (2021, 1, 1)),
+        ]
+        expected = {0: OVERLAPPING_CONTRACT_ERROR}
+        self.assertEqual(find_invalid_contracts(contracts), expected)
+
+    def test_candidate_rejected_by_tenant_keeps_property_free(self):
+        """
+        Should not reject candidates overlapping only a candidate which was
+        itself rejected for the other key
+        """
+        ContractFactory(property=self.other_property, tenant=self.tenant,
+                        start_date='2030-01-01', end_date='2030-01-31')
+        third_tenant = TenantFactory(email='third@email.com')
+        contracts = [
+            self.build((2030, 1, 10), (2030, 3, 1), tenant=self.tenant,
+                       aproperty=self.property),
+            self.build((2030, 2, 1), (2030, 4, 1), tenant=third_tenant,
+                       aproperty=self.property),
+        ]
+        self.assertEqual(find_invalid_contracts(contracts),
+                         {0: OVERLAPPING_CONTRACT_ERROR})
+
+    def test_existing_contract_starting_later(self):
+        """
+        Should reject candidates overlapping an existing contract which
+        starts after them
+        """
+        contracts = [
+            self.build((2017, 6, 1), (2018, 2, 1), aproperty=self.property),
+        ]
+        self.assertEqual(find_invalid_contracts(contracts),
+                         {0: OVERLAPPING_CONTRACT_ERROR})
+
+    def test_invalid_dates(self):
+        """Should reject candidates ending before they start"""
+        contracts = [self.build((2020, 3, 1), (2020, 1, 1))]
+        self.assertEqual(find_invalid_contracts(contracts),
+                         {0: INVALID_DATES_ERROR})
+
+    def test_updated_contract_ignores_itself(self):
+        """
+        Should not reject an existing contract checked with changed dates
+        against its own previous dates
+        """
+        self.existing.end_date = date(2019, 6, 30)
+        self.assertEqual(find_invalid_contracts([self.existing]), {})
+
+    def test_number_of_queries(self):
+        """Should check any number of candidates with two queries"""
+        contracts = [self.build((2020 + year, 1, 1), (2020 + year, 6, 1))
+                     for year in range(20)]
+        with CaptureQueriesContext(connection) as queries:
+            find_invalid_contracts(contracts)
+        self.assertEqual(len(queries), 2)
@@ -0,0 +1,73 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from bisect import bisect_right
+
+from contracts.models import (Contract, INVALID_DATES_ERROR,
+                              OVERLAPPING_CONTRACT_ERROR)
+
+
+def find_invalid_contracts(contracts):
+    """
+    Checks a batch of candidate contracts against the existing contracts and
+    against each other, returning a dict which maps the index of each
+    invalid candidate to its error message.
+
+    Existing contracts are fetched with one index backed query per key
+    (property and tenant). Candidates are then checked in a single pass in
+    start date order, against both keys at once, so the one starting first
+    is kept when two candidates overlap and a rejected candidate never
+    rejects the ones after it.
+    """
+    errors = {}
+    for index, contract in enumerate(contracts):
+        if not contract.end_date > contract.start_date:
+            errors[index] = INVALID_DATES_ERROR
+
+    candidates = [(index, contract) for index, contract in enumerate(contracts)
+                  if index not in errors]
+    if not candidates:
+        return errors
+
+    lower_limit = min(contract.start_date for index, contract in candidates)
+    upper_limit = max(contract.end_date for index, contract in candidates)
+    candidate_ids = [contract.id for index, contract in candidates]
+
+    keys = ('property_id', 'tenant_id')
+    # starts and highest end so far of the existing contracts of each key
+    # value, sorted by start
+    existing = {}
+    for key in keys:
+        key_values = set(getattr(contract, key)
+                         for index, contract in candidates)
+        intervals = sorted(Contract.objects.filter(
+            start_date__lte=upper_limit, end_date__gte=lower_limit,
+            **{'{}__in'.format(key): key_values}).exclude(
+            id__in=candidate_ids).values_list(key, 'start_date', 'end_date'))
+        for value, start, end in intervals:
+            starts, reaches = existing.setdefault((key, value), ([], []))
+            starts.append(start)
+            reaches.append(max(end, reaches[-1]) if reaches else end)
+
+    def overlaps_existing(key, contract):
+        starts, reaches = existing.get(
+            (key, getattr(contract, key)), ((), ()))
+        position = bisect_right(starts, contract.end_date)
+        return bool(position) and reaches[position - 1] >= contract.start_date
+
+    # highest end of the accepted candidates of each key value
+    reach = {}
+    candidates.sort(key=lambda candidate: (
+        candidate[1].start_date, candidate[1].end_date, candidate[0]))
+    for index, contract in candidates:
+        key_values = [(key, getattr(contract, key)) for key in keys]
+        if any(overlaps_existing(key, contract) or
+               (key, value) in reach and
+               reach[(key, value)] >= contract.start_date
+               for key, value in key_values):
+            errors[index] = OVERLAPPING_CONTRACT_ERROR
+            continue
+        for key_value in key_values:
+            reach[key_value] = max(
+                reach.get(key_value, contract.end_date), contract.end_date)
+    return errors
@@ -3,19 +3,37 @@ from __future__ import unicode_literals
 
 from django.core.exceptions import ValidationError
 from rest_framework import viewsets, mixins
+from rest_framework.decorators import list_route
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 
+from core.models import Job
+from core.serializers import JobSerializer
+from core.views import (BULK_PARSER_CLASSES, BulkCreateMixin,
+                        ConditionalRequestMixin,
+                        CachedResponseMixin, EagerLoadingMixin,
+                        ExportMixin, MultiGetMixin,
+                        StreamingListMixin)
 from core.exceptions import Api400, Api401, Api404
 from accounts.models import Tenant
 from properties.models import Property
 from contracts.serializers import (ContractSerializer,
                                    ContractModificationsSerializer)
 from contracts.models import Contract
-
-
-class ContractView(mixins.RetrieveModelMixin,
+from contracts.imports import (build_contract, insert_contracts,
+                               validate_contracts)
+from contracts.jobs import import_contracts
+
+
+class ContractView(BulkCreateMixin,
+                   ExportMixin,
+                   ConditionalRequestMixin,
+                   CachedResponseMixin,
+                   EagerLoadingMixin,
+                   MultiGetMixin,
+                   StreamingListMixin,
+                   mixins.RetrieveModelMixin,
                    mixins.ListModelMixin,
                    mixins.CreateModelMixin,
                    mixins.UpdateModelMixin,
@@ -33,6 +51,13 @@ class ContractView(mixins.RetrieveModelMixin,
 
         `GET /contracts/:id`
 
+    *   Retrieve many Contracts by id, in the given order:
+
+        `GET /contracts?ids=id1,id2`
+
+        or, for long lists, `POST /contracts/multi-get` with the payload
+        `{'ids': ['id1', 'id2']}`. Up to 100 ids are accepted.
+
     *  Create Contract:
 
         `POST /contracts`
@@ -48,6 +73,26 @@ class ContractView(mixins.RetrieveModelMixin,
         }
         ```
 
+    *  Create many Contracts at once, each one validated independently:
+
+        `POST /contracts/bulk`
+
+        The payload is a list of Contracts like the one above, which can
+        also be sent as CSV (`Content-Type: text/csv`, with a header line
+        naming the columns) or as one JSON object per line
+        (`Content-Type: application/x-ndjson`). Contracts overlapping
+        existing ones or one of the list starting earlier are rejected. Up to
+        1000 Contracts are accepted per request.
+
+    *  Import any number of Contracts in the background:
+
+        `POST /contracts/import`
+
+        The payload is the same as the one of `/contracts/bulk`. The
+        response, `202 Accepted`, describes the queued job, whose status and
+        result, the number of imported Contracts and the errors of the
+        rejected ones, are reported by `GET /jobs/:id`.
+
     *  Update Contract:
 
         `PUT /contracts/:id`
@@ -101,10 +146,49 @@ class ContractView(mixins.RetrieveModelMixin,
     *   `page_size`: specifies the page size. If not provided, results are
     paginated by 20. Max value is 40. If 'none' is provided, pagination is
     disabled.
+
+    *   `cursor`: switches to cursor pagination, which keeps pages stable
+    while new records are created and costs the same for any page. Send it
+    empty for the first page and follow the `next` and `previous` links.
+
+    Representation parameters, for list and retrieve:
+
+    *   `fields`: comma separated fields to render, dotted for fields of
+    embedded objects, like `fields=id,end_date,tenant.name`.
+    Columns of other fields are not read.
+
+    *   `expand`: comma separated relations to embed, dotted for nested
+    ones. Relations not listed are rendered as ids, without joining their
+    tables.
+
+    Export:
+
+    *   `GET /contracts/export?format=csv`: streams every Contract matching
+    the list filters as CSV, or as one JSON object per line with
+    `format=ndjson`.
+
+    Conditional requests:
+
+    *   `If-None-Match`: list and retrieve responses carry an `ETag`.
+    Sending it back gets `304 Not Modified` while the data is unchanged.
+
+    *   `If-Match`: updates sending the `ETag` of the retrieved record get
+    `412 Precondition Failed` when it was modified meanwhile.
     """
 
     permission_classes = (IsAuthenticated,)
     queryset = Contract.objects.all().order_by('-created')
+    export_fields = ('id', 'created', 'start_date', 'end_date', 'rent',
+                     'property', 'tenant')
+    # sample list filters for the query plans checks
+    explain_filters = {
+        'tenant_id': 'aryh149jfl0pol1r', 'property_id': 'aryh149jfl0pol1r',
+        'start_date': '2017-01-01', 'end_date': '2017-12-31'}
+    # contracts of one property or tenant are few enough to be sorted
+    sorted_filters = ('tenant_id', 'property_id')
+    # open ended date ranges match most contracts, found walking the ordering
+    scanned_filters = ('start_date', 'end_date')
+    bulk_foreign_keys = ('property', 'tenant')
 
     def filter_queryset(self, queryset):
         queryset = super(ContractView, self).filter_queryset(queryset)
@@ -168,6 +252,28 @@ class ContractView(mixins.RetrieveModelMixin,
 
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    def build_bulk_instance(self, item, fields):
+        return build_contract(item)
+
+    def validate_bulk_instances(self, instances):
+        return validate_contracts(instances)
+
+    def perform_bulk_create(self, instances):
+        insert_contracts(instances, self.bulk_batch_size)
+
+    @list_route(methods=['post'], url_path='import',
+                parser_classes=BULK_PARSER_CLASSES)
+    def queue_import(self, request, *args, **kwargs):
+        rows = request.data
+        if not isinstance(rows, list):
+            raise Api400('Expected a list of objects')
+        job = Job.objects.enqueue(import_contracts, args=[rows],
+                                  user=request.user)
+        return Response(
+            JobSerializer(job, context={'request': request}).data,
+            status=status.HTTP_202_ACCEPTED,
+            headers={'Location': '/api/jobs/{}'.format(job.id)})
+
     def destroy(self, request, *args, **kwargs):
         if not request.user.is_staff:
             raise Api401('You do not have the permission to delete '
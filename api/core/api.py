@@ -5,6 +5,7 @@ from django.conf.urls import include, url
 from rest_framework import routers
 from rest_framework_jwt.views import obtain_jwt_token, refresh_jwt_token
 
+from core.views import BatchView, FragmentCacheStatsView, JobView
 from accounts.views import LandlordView, TenantView
 from properties.views import PropertyView
 from contracts.views import ContractView
@@ -20,4 +21,7 @@ urlpatterns = [
     url(r'^', include(router.urls)),
     url(r'^auth/login$', obtain_jwt_token),
     url(r'^auth/refresh-token$', refresh_jwt_token),
+    url(r'^stats/fragment-cache$', FragmentCacheStatsView.as_view()),
+    url(r'^batch$', BatchView.as_view()),
+    url(r'^jobs/(?P<pk>\d+)$', JobView.as_view()),
 ]
@@ -0,0 +1,83 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import json
+import re
+from io import BytesIO
+
+from django.core.handlers.wsgi import WSGIRequest
+from django.utils import six
+from django.utils.encoding import force_text
+
+_reference = re.compile(r'\{\{\s*([\w.-]+)\s*\}\}')
+
+# headers of the batch request which do not apply to its sub-requests
+BATCH_ONLY_HEADERS = ('HTTP_ACCEPT', 'HTTP_IF_MATCH', 'HTTP_IF_NONE_MATCH')
+
+
+def get_reference_value(results, reference):
+    """
+    Returns the value of a dotted reference like 'contract.property.id',
+    whose first name is the name of an earlier result, raising ValueError
+    when it does not exist
+    """
+    names = reference.split('.')
+    if names[0] not in results:
+        raise ValueError('Unknown reference "{}"'.format(reference))
+    value = results[names[0]]
+    for name in names[1:]:
+        if isinstance(value, dict) and name in value:
+            value = value[name]
+        elif (isinstance(value, list) and name.isdigit() and
+                int(name) < len(value)):
+            value = value[int(name)]
+        else:
+            raise ValueError('Unknown reference "{}"'.format(reference))
+    return value
+
+
+def resolve_references(value, results):
+    """
+    Returns value with the {{reference}} strings replaced by the values of
+    the results they reference. A string made of a single reference takes
+    the referenced value as is, so lists and numbers keep their type.
+    """
+    if isinstance(value, dict):
+        return dict((key, resolve_references(item, results))
+                    for key, item in value.items())
+    if isinstance(value, list):
+        return [resolve_references(item, results) for item in value]
+    if not isinstance(value, six.string_types):
+        return value
+    match = _reference.match(value)
+    if match and match.end() == len(value):
+        return get_reference_value(results, match.group(1))
+    return _reference.sub(lambda match: force_text(
+        get_reference_value(results, match.group(1))), value)
+
+
+def build_sub_request(request, method, path, body=None):
+    """
+    Returns a request for method and path, with body as JSON, carrying the
+    headers and the authenticated user of request so it is not
+    authenticated again
+    """
+    path, __, query = path.partition('?')
+    content = b'' if body is None else json.dumps(body).encode('utf-8')
+    environ = dict(request.META)
+    for header in BATCH_ONLY_HEADERS:
+        environ.pop(header, None)
+    environ.update({
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'CONTENT_TYPE': 'application/json',
+        'CONTENT_LENGTH': str(len(content)),
+        'wsgi.input': BytesIO(content),
+    })
+    sub_request = WSGIRequest(environ)
+    sub_request.user = request.user
+    # read by rest_framework.request.Request instead of authenticating
+    sub_request._force_auth_user = request.user
+    sub_request._force_auth_token = request.auth
+    return sub_request
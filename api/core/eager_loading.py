@@ -0,0 +1,210 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework import serializers
+
+from core.fieldsets import DEFAULT_FIELDSET, prune_serializer
+
+MAX_PLANS = 1000
+
+_plans = {}
+
+
+class EagerLoadingPlan(object):
+    """
+    Holds the select_related, prefetch_related and only lookups needed for
+    rendering a serializer without issuing extra queries per row, and the
+    labels of the models whose rows are rendered
+    """
+
+    def __init__(self):
+        self.select_related = []
+        self.prefetch_related = []
+        self.only = []
+        self.models = []
+
+    def apply(self, queryset):
+        """Returns given queryset with the plan lookups applied"""
+        if self.select_related:
+            queryset = queryset.select_related(*self.select_related)
+        if self.prefetch_related:
+            queryset = queryset.prefetch_related(*self.prefetch_related)
+        if self.only:
+            queryset = queryset.only(*self.only)
+        return queryset
+
+    def __repr__(self):
+        return ('<EagerLoadingPlan select_related={} prefetch_related={} '
+                'only={}>'.format(self.select_related, self.prefetch_related,
+                                  self.only))
+
+
+def _get_model_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        return None
+
+
+def _concrete_field_names(model):
+    return [field.name for field in model._meta.concrete_fields]
+
+
+def _walk_serializer(serializer, model, prefix, plan):
+    """
+    Collects the lookups needed by the fields of serializer, which renders
+    instances of model reached through the lookup prefix. Returns the list of
+    columns to be loaded for model or None when it can not be restricted.
+    """
+    method_field_sources = getattr(serializer, 'method_field_sources', {})
+    columns = []
+    restricted = True
+
+    for field_name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+
+        if isinstance(field, serializers.SerializerMethodField):
+            sources = method_field_sources.get(field_name)
+            if sources is None:
+                restricted = False
+            else:
+                columns.extend(sources)
+            continue
+
+        if field.source == '*':
+            if isinstance(field, serializers.BaseSerializer):
+                nested = _walk_serializer(field, model, prefix, plan)
+                if nested is None:
+                    restricted = False
+                else:
+                    columns.extend(nested)
+            elif not isinstance(field, serializers.HyperlinkedIdentityField):
+                restricted = False
+            continue
+
+        # walks dotted sources through forward relations
+        current_model = model
+        current_prefix = prefix
+        attrs = field.source.split('.')
+        for attr in attrs[:-1]:
+            model_field = _get_model_field(current_model, attr)
+            if (model_field is None or not model_field.is_relation or
+                    model_field.many_to_many or model_field.one_to_many):
+                restricted = False
+                current_model = None
+                break
+            if current_model is model:
+                columns.append(attr)
+            else:
+                plan.only.append(current_prefix + attr)
+            current_prefix = current_prefix + attr + LOOKUP_SEP
+            plan.select_related.append(current_prefix[:-len(LOOKUP_SEP)])
+            current_model = model_field.related_model
+            plan.models.append(current_model._meta.label_lower)
+
+        if current_model is None:
+            continue
+
+        attr = attrs[-1]
+        model_field = _get_model_field(current_model, attr)
+        if model_field is None:
+            # properties and methods might touch any column
+            restricted = False
+            continue
+
+        lookup = current_prefix + attr
+        if current_model is model:
+            column = attr
+        else:
+            column = None
+
+        if model_field.is_relation:
+            many = model_field.many_to_many or model_field.one_to_many
+            related_model = model_field.related_model
+            if many:
+                plan.models.append(related_model._meta.label_lower)
+                if isinstance(field, serializers.ListSerializer):
+                    child_plan = EagerLoadingPlan()
+                    child_columns = _walk_serializer(
+                        field.child, related_model, '', child_plan)
+                    if child_columns is None:
+                        child_columns = _concrete_field_names(related_model)
+                    elif model_field.one_to_many:
+                        # prefetching needs the key back to the parent
+                        child_columns.append(model_field.field.name)
+                    child_plan.only = child_columns + child_plan.only
+                    plan.models.extend(child_plan.models)
+                    plan.prefetch_related.append(Prefetch(
+                        lookup,
+                        queryset=child_plan.apply(
+                            related_model._default_manager.all())))
+                else:
+                    plan.prefetch_related.append(lookup)
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                plan.select_related.append(lookup)
+                plan.models.append(related_model._meta.label_lower)
+                nested = _walk_serializer(
+                    field, related_model, lookup + LOOKUP_SEP, plan)
+                if nested is None:
+                    nested = _concrete_field_names(related_model)
+                plan.only.extend(
+                    lookup + LOOKUP_SEP + name for name in nested)
+            if column is not None:
+                columns.append(column)
+            else:
+                plan.only.append(lookup)
+            continue
+
+        if column is not None:
+            columns.append(column)
+        else:
+            plan.only.append(lookup)
+
+    if not restricted:
+        return None
+    # columns read by the serializer outside of its fields
+    columns.extend(getattr(serializer, 'required_sources', ()))
+    return columns
+
+
+def build_eager_loading_plan(serializer):
+    """
+    Walks the fields of given serializer instance, including nested
+    serializers, and builds the EagerLoadingPlan for its model
+    """
+    model = serializer.Meta.model
+    plan = EagerLoadingPlan()
+    columns = _walk_serializer(serializer, model, '', plan)
+    if columns is None:
+        columns = _concrete_field_names(model)
+    plan.only = columns + plan.only
+    # removes duplicated lookups keeping their original order
+    plan.select_related = sorted(
+        set(plan.select_related), key=plan.select_related.index)
+    plan.only = sorted(set(plan.only), key=plan.only.index)
+    plan.models = sorted(set([model._meta.label_lower] + plan.models))
+    return plan
+
+
+def get_eager_loading_plan(serializer_class, fieldset=DEFAULT_FIELDSET):
+    """
+    Returns the cached EagerLoadingPlan for given serializer class, pruned
+    to fieldset
+    """
+    key = (serializer_class, fieldset)
+    plan = _plans.get(key)
+    if plan is None:
+        serializer = serializer_class()
+        if fieldset != DEFAULT_FIELDSET:
+            prune_serializer(serializer, fieldset)
+        plan = build_eager_loading_plan(serializer)
+        # fieldsets come from requests, the cache must stay bounded
+        if len(_plans) >= MAX_PLANS:
+            _plans.clear()
+        _plans[key] = plan
+    return plan
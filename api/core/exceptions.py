@@ -27,3 +27,11 @@ class Api404(APIException):
 
     def __init__(self, detail=None):
         self.detail = detail or self.default_detail
+
+
+class Api412(APIException):
+    status_code = status.HTTP_412_PRECONDITION_FAILED
+    default_detail = 'Precondition failed'
+
+    def __init__(self, detail=None):
+        self.detail = detail or self.default_detail
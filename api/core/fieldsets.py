@@ -0,0 +1,106 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from rest_framework import serializers
+
+from core.exceptions import Api400
+
+# the fieldset of serializers rendering their declared fields
+DEFAULT_FIELDSET = (None, None)
+
+
+def parse_field_tree(value):
+    """
+    Returns the tree of a comma separated list of dotted field paths, like
+    'id,property.city', as a dict mapping each name to the tree of its own
+    fields, None standing for all of them. Returns None for a missing value.
+    """
+    if value is None:
+        return None
+    tree = {}
+    for path in value.split(','):
+        names = [name.strip() for name in path.split('.')]
+        if not all(names):
+            continue
+        node = tree
+        for name in names[:-1]:
+            if name in node and node[name] is None:
+                # every field of name was already requested
+                node = None
+                break
+            node = node.setdefault(name, {})
+        if node is not None:
+            node[names[-1]] = None
+    return tree
+
+
+def freeze_tree(tree):
+    """Returns a hashable version of a field tree"""
+    if tree is None:
+        return None
+    return tuple(sorted(
+        (name, freeze_tree(subtree)) for name, subtree in tree.items()))
+
+
+def thaw_tree(frozen):
+    """Returns the field tree of a frozen one"""
+    if frozen is None:
+        return None
+    return dict((name, thaw_tree(subtree)) for name, subtree in frozen)
+
+
+def get_fieldset(fields=None, expand=None):
+    """Returns the hashable fieldset of the fields and expand params"""
+    return (freeze_tree(parse_field_tree(fields)),
+            freeze_tree(parse_field_tree(expand)))
+
+
+def _collapse(field):
+    """Returns a field rendering the primary keys a nested one embeds"""
+    kwargs = {'read_only': True}
+    if field.source != field.field_name:
+        kwargs['source'] = field.source
+    if isinstance(field, serializers.ListSerializer):
+        kwargs['many'] = True
+    return serializers.PrimaryKeyRelatedField(**kwargs)
+
+
+def _prune(serializer, fields, expand, prefix):
+    declared = dict(serializer.fields.items())
+    for name in fields or ():
+        if name not in declared:
+            raise Api400('Unknown field "{}{}"'.format(prefix, name))
+    for name in expand or ():
+        if not isinstance(declared.get(name), serializers.BaseSerializer):
+            raise Api400('Field "{}{}" can not be expanded'.format(
+                prefix, name))
+
+    for name, field in declared.items():
+        if fields is not None and name not in fields:
+            serializer.fields.pop(name)
+            continue
+        if not isinstance(field, serializers.BaseSerializer):
+            continue
+        if expand is not None and name not in expand:
+            serializer.fields[name] = _collapse(field)
+            continue
+        child = field
+        if isinstance(field, serializers.ListSerializer):
+            child = field.child
+        _prune(child,
+               None if fields is None else fields[name],
+               None if expand is None else expand[name] or {},
+               prefix + name + '.')
+    serializer.fieldset = (freeze_tree(fields), freeze_tree(expand))
+
+
+def prune_serializer(serializer, fieldset):
+    """
+    Restricts in place the fields of serializer, and of its nested
+    serializers, to the fields tree of fieldset, None keeping all of them.
+    When the expand tree of fieldset is not None, nested serializers missing
+    from it render the primary keys of their objects instead.
+    """
+    fields, expand = fieldset
+    _prune(serializer, thaw_tree(fields), thaw_tree(expand), '')
+    return serializer
@@ -0,0 +1,77 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import json
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from rest_framework.utils.encoders import JSONEncoder
+
+
+class FragmentCache(object):
+    """
+    In-process LRU cache of serialized objects. Sizes are estimated from the
+    JSON length of each fragment, and least recently used fragments are
+    evicted once their total exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.clear()
+
+    def clear(self):
+        """Drops every fragment and resets the counters"""
+        with self.lock:
+            self.fragments = OrderedDict()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def get(self, key):
+        """Returns the fragment stored for key or None"""
+        with self.lock:
+            entry = self.fragments.pop(key, None)
+            if entry is None:
+                self.misses += 1
+                return None
+            # most recently used fragments are kept at the end
+            self.fragments[key] = entry
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, data):
+        """Stores data for key, evicting least recently used fragments"""
+        size = len(json.dumps(data, cls=JSONEncoder))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            previous = self.fragments.pop(key, None)
+            if previous is not None:
+                self.bytes -= previous[1]
+            self.fragments[key] = (data, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                __, (__, evicted) = self.fragments.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def get_stats(self):
+        """Returns the counters of this process for monitoring"""
+        with self.lock:
+            lookups = self.hits + self.misses
+            return OrderedDict([
+                ('hits', self.hits),
+                ('misses', self.misses),
+                ('hit_ratio', float(self.hits) / lookups if lookups else 0.0),
+                ('evictions', self.evictions),
+                ('fragments', len(self.fragments)),
+                ('bytes', self.bytes),
+                ('max_bytes', self.max_bytes),
+            ])
+
+
+fragment_cache = FragmentCache(
+    getattr(settings, 'FRAGMENT_CACHE_MAX_BYTES', 16 * 1024 * 1024))
@@ -0,0 +1,134 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import json
+import logging
+import os
+import socket
+import threading
+import traceback
+from contextlib import contextmanager
+from datetime import timedelta
+from StringIO import StringIO
+
+from django.conf import settings
+from django.core.management import call_command
+from django.db import connection
+from django.utils import timezone
+from django.utils.module_loading import import_string
+
+from core.models import Job
+
+log = logging.getLogger(__name__)
+
+
+def get_retry_delay(attempts):
+    """
+    Returns the seconds to wait before running again a job which failed
+    attempts times, doubling after each failure
+    """
+    delay = getattr(settings, 'JOB_RETRY_DELAY', 30)
+    max_delay = getattr(settings, 'JOB_MAX_RETRY_DELAY', 3600)
+    return min(delay * 2 ** max(attempts - 1, 0), max_delay)
+
+
+def run_job(job):
+    """
+    Runs the function of a claimed job, storing its result, or its error
+    and when it will be retried. Returns whether the job succeeded.
+    """
+    now = timezone.now()
+    # a job whose lease expired meanwhile may have been claimed again
+    claimed = Job.objects.filter(
+        pk=job.pk, status=Job.RUNNING, attempts=job.attempts)
+    try:
+        function = import_string(job.task)
+        args, kwargs = job.get_arguments()
+        result = json.dumps(function(*args, **kwargs))
+    # jobs run arbitrary code, every error is stored and retried
+    except Exception:
+        error = traceback.format_exc()
+        log.error('Job %s %s failed (attempt %s): %s', job.id, job.task,
+                  job.attempts, error)
+        if job.attempts < job.max_attempts:
+            claimed.update(
+                status=Job.QUEUED, leased_until=None, last_error=error,
+                run_at=now + timedelta(
+                    seconds=get_retry_delay(job.attempts)))
+        else:
+            claimed.update(status=Job.FAILED, leased_until=None,
+                           last_error=error, finished_at=timezone.now())
+        return False
+    claimed.update(status=Job.DONE, leased_until=None, result=result,
+                   finished_at=timezone.now())
+    return True
+
+
+@contextmanager
+def keep_leased(job, lease=300):
+    """
+    Renews the lease of job every third of it in a background thread while
+    the block runs, so jobs running longer than their lease are not run
+    again by other workers
+    """
+    stopped = threading.Event()
+
+    def renew():
+        try:
+            while not stopped.wait(lease / 3.0):
+                Job.objects.renew_lease(job, lease)
+        finally:
+            # each thread has its own database connection
+            connection.close()
+
+    thread = threading.Thread(target=renew)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield
+    finally:
+        stopped.set()
+        thread.join()
+
+
+def get_worker_name(index=0):
+    return '{}:{}:{}'.format(socket.gethostname(), os.getpid(), index)
+
+
+class Worker(object):
+    """Loop claiming and running queued jobs one at a time"""
+
+    def __init__(self, name, lease=300, poll_interval=1, stopped=None):
+        self.name = name
+        self.lease = lease
+        self.poll_interval = poll_interval
+        self.stopped = stopped or threading.Event()
+        self.processed = 0
+
+    def run_once(self):
+        """Runs the next job due, returning False when there is none"""
+        Job.objects.release_expired()
+        jobs = Job.objects.claim(self.name, lease=self.lease)
+        for job in jobs:
+            with keep_leased(job, self.lease):
+                run_job(job)
+            self.processed += 1
+        return bool(jobs)
+
+    def run(self, burst=False):
+        """
+        Runs jobs until stopped, polling for new ones every poll_interval
+        seconds, or until none is due with burst
+        """
+        while not self.stopped.is_set():
+            if not self.run_once():
+                if burst:
+                    break
+                self.stopped.wait(self.poll_interval)
+
+
+def call_command_job(name, *args, **options):
+    """Runs a management command as a job, returning its output"""
+    output = StringIO()
+    call_command(name, *args, stdout=output, **options)
+    return output.getvalue()
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from core.models import get_random_hash_id, get_sortable_hash_id
+
+GENERATORS = (
+    ('random', get_random_hash_id),
+    ('sortable', get_sortable_hash_id),
+)
+
+
+class Command(BaseCommand):
+    help = ('Compares bulk insert throughput and primary key index size of '
+            'random and sortable hash ids on a scratch table')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--rows', type=int, default=10000000,
+            help='number of rows inserted for each hash id mode')
+        parser.add_argument(
+            '--batch-size', type=int, default=10000,
+            help='number of rows inserted per statement batch')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        batch_size = options['batch_size']
+        self.stdout.write('{:<10}{:>12}{:>14}{:>16}'.format(
+            'mode', 'rows', 'rows/s', 'index bytes'))
+        for mode, generator in GENERATORS:
+            table = 'benchmark_hash_id_{}'.format(mode)
+            with connection.cursor() as cursor:
+                cursor.execute('DROP TABLE IF EXISTS {}'.format(table))
+                cursor.execute(
+                    'CREATE TABLE {} (id varchar(16) NOT NULL PRIMARY KEY, '
+                    'payload varchar(100) NOT NULL)'.format(table))
+                try:
+                    elapsed = self.insert_rows(
+                        cursor, table, generator, rows, batch_size)
+                    size = self.get_index_size(cursor, table)
+                finally:
+                    cursor.execute('DROP TABLE {}'.format(table))
+            self.stdout.write('{:<10}{:>12}{:>14.0f}{:>16}'.format(
+                mode, rows, rows / elapsed if elapsed else 0, size))
+
+    def insert_rows(self, cursor, table, generator, rows, batch_size):
+        """Inserts rows in batches returning the elapsed time in seconds"""
+        statement = 'INSERT INTO {} (id, payload) VALUES (%s, %s)'.format(
+            table)
+        payload = 'x' * 100
+        elapsed = 0.0
+        inserted = 0
+        while inserted < rows:
+            size = min(batch_size, rows - inserted)
+            batch = [(generator(), payload) for x in range(size)]
+            start = time.time()
+            cursor.executemany(statement, batch)
+            elapsed += time.time() - start
+            inserted += size
+        return elapsed
+
+    def get_index_size(self, cursor, table):
+        """Returns the size in bytes of table and its indexes"""
+        if connection.vendor == 'mysql':
+            cursor.execute('ANALYZE TABLE {}'.format(table))
+            cursor.fetchall()
+            cursor.execute(
+                'SELECT data_length + index_length FROM '
+                'information_schema.tables WHERE table_schema = DATABASE() '
+                'AND table_name = %s', [table])
+            return cursor.fetchone()[0]
+        if connection.vendor == 'sqlite':
+            cursor.execute(
+                'SELECT SUM(pgsize) FROM dbstat WHERE name IN (SELECT name '
+                'FROM sqlite_master WHERE tbl_name = %s)', [table])
+            return cursor.fetchone()[0]
+        return 'n/a'
@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from core.models import SearchToken, PropertyBaseUser
+from core.querysets import iterate_in_chunks
+
+
+class Command(BaseCommand):
+    help = ('Rebuilds the search tokens of existing landlords and tenants '
+            'and deletes the tokens of removed ones')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'models', nargs='*', metavar='app_label.model',
+            help='models to index, all searchable models by default')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='number of objects indexed per batch')
+
+    def get_models(self, labels):
+        searchable = [model for model in apps.get_models()
+                      if issubclass(model, PropertyBaseUser)]
+        if not labels:
+            return searchable
+        models = []
+        for label in labels:
+            try:
+                model = apps.get_model(label)
+            except (LookupError, ValueError):
+                raise CommandError('Unknown model {}'.format(label))
+            if model not in searchable:
+                raise CommandError('Model {} is not searchable'.format(label))
+            models.append(model)
+        return models
+
+    def handle(self, *args, **options):
+        for model in self.get_models(options['models']):
+            indexed = 0
+            queryset = model.objects.only('pk', *model.search_fields)
+            for chunk in iterate_in_chunks(queryset, options['batch_size']):
+                SearchToken.objects.index(chunk, *model.search_fields)
+                indexed += len(chunk)
+            removed, __ = SearchToken.objects.filter(
+                kind=model._meta.label_lower
+            ).exclude(object_id__in=model.objects.values('pk')).delete()
+            self.stdout.write('{}: {} indexed, {} stale tokens removed'.format(
+                model._meta.label_lower, indexed, removed))
@@ -0,0 +1,32 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.api import router
+from core.query_plans import (get_query_plan_cases, explain,
+                              find_plan_problems)
+
+
+class Command(BaseCommand):
+    help = ('Runs EXPLAIN for every filter combination of the api list '
+            'endpoints and fails on full table and index scans and sorts')
+
+    def handle(self, *args, **options):
+        failures = 0
+        cases = get_query_plan_cases(router.registry, connection.vendor)
+        for case in cases:
+            problems = find_plan_problems(
+                explain(case.queryset), connection.vendor, case.allow_sort,
+                case.allow_index_scan)
+            if problems:
+                failures += 1
+                self.stdout.write('FAIL {}: {}'.format(
+                    case.name, ', '.join(problems)))
+            elif options['verbosity'] > 1:
+                self.stdout.write('OK {}'.format(case.name))
+        if failures:
+            raise CommandError('{} of {} list queries have full scans or '
+                               'sorts'.format(failures, len(cases)))
+        self.stdout.write('{} list queries checked'.format(len(cases)))
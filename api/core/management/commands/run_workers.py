@@ -0,0 +1,76 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import signal
+import threading
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from core.jobs import Worker, get_worker_name
+
+
+class Command(BaseCommand):
+    help = ('Runs queued background jobs with a number of concurrent '
+            'workers until interrupted')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=1,
+            help='number of worker threads, each running one job at a time')
+        parser.add_argument(
+            '--lease', type=int, default=300,
+            help='seconds a job may run before other workers retry it')
+        parser.add_argument(
+            '--poll-interval', type=float, default=1,
+            help='seconds waited before looking for jobs again when there '
+                 'is none')
+        parser.add_argument(
+            '--burst', action='store_true',
+            help='exit once there are no jobs due instead of waiting')
+
+    def run_worker(self, worker, burst):
+        try:
+            worker.run(burst)
+        finally:
+            # each thread has its own database connection
+            connection.close()
+
+    def handle(self, *args, **options):
+        concurrency = options['concurrency']
+        if concurrency < 1:
+            raise CommandError('Concurrency must be at least 1')
+        stopped = threading.Event()
+
+        def stop(signum, frame):
+            stopped.set()
+
+        handlers = dict((signum, signal.signal(signum, stop))
+                        for signum in (signal.SIGINT, signal.SIGTERM))
+        try:
+            processed = self.run_workers(options, stopped)
+        finally:
+            for signum, handler in handlers.items():
+                signal.signal(signum, handler)
+        self.stdout.write('{} jobs processed'.format(processed))
+
+    def run_workers(self, options, stopped):
+        """Runs the workers until stopped, returning the jobs processed"""
+        concurrency = options['concurrency']
+        workers = [Worker(get_worker_name(index), options['lease'],
+                          options['poll_interval'], stopped)
+                   for index in range(concurrency)]
+        if concurrency == 1:
+            workers[0].run(options['burst'])
+        else:
+            threads = [threading.Thread(target=self.run_worker,
+                                        args=(worker, options['burst']))
+                       for worker in workers]
+            for thread in threads:
+                thread.daemon = True
+                thread.start()
+            # joining with a timeout keeps the main thread receiving signals
+            while any(thread.is_alive() for thread in threads):
+                for thread in threads:
+                    thread.join(0.5)
+        return sum(worker.processed for worker in workers)
@@ -0,0 +1,276 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import errno
+import fcntl
+import glob
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.conf import settings
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+                    10)
+QUERY_BUCKETS = (1, 2, 5, 10, 20, 50, 100)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# histograms recorded for every request, by name
+HISTOGRAMS = OrderedDict([
+    ('api_request_duration_seconds',
+     ('Time spent answering requests.', DURATION_BUCKETS)),
+    ('api_request_db_duration_seconds',
+     ('Time spent running database queries.', DURATION_BUCKETS)),
+    ('api_request_queries',
+     ('Database queries run by requests.', QUERY_BUCKETS)),
+    ('api_request_serializer_duration_seconds',
+     ('Time spent serializing response data.', DURATION_BUCKETS)),
+    ('api_response_size_bytes',
+     ('Size of response bodies.', SIZE_BUCKETS)),
+])
+
+# file summing the histograms of the processes which exited
+ARCHIVE_NAME = 'archive.json'
+
+_local = threading.local()
+_process_file = re.compile(r'^metrics-(\d+)-\d+\.json$')
+
+
+def start_timings():
+    """Starts collecting the named timings of the current request"""
+    _local.timings = {}
+
+
+def stop_timings():
+    """Stops collecting the timings of the current request, returning them"""
+    timings = getattr(_local, 'timings', None) or {}
+    _local.timings = None
+    return timings
+
+
+@contextmanager
+def timed(name):
+    """Adds the time spent in the block to the timing name of the request"""
+    start = time.time()
+    try:
+        yield
+    finally:
+        timings = getattr(_local, 'timings', None)
+        if timings is not None:
+            timings[name] = timings.get(name, 0) + time.time() - start
+
+
+def time_serializer(serializer):
+    """
+    Counts the time serializer spends building its data as serializer time
+    of the current request. Nested serializers are built by the one given,
+    so only top level ones are timed.
+    """
+    to_representation = serializer.to_representation
+
+    def timed_representation(*args, **kwargs):
+        with timed('serializer'):
+            return to_representation(*args, **kwargs)
+
+    serializer.to_representation = timed_representation
+    return serializer
+
+
+def get_metrics_dir():
+    return getattr(settings, 'METRICS_DIR', os.path.join(
+        tempfile.gettempdir(), 'property_manager_metrics'))
+
+
+class RequestMetrics(object):
+    """
+    Histograms of the requests answered by the process, by route and method.
+
+    Each process writes its histograms to its own file of the metrics
+    directory, named after its pid and start time, at most once every flush
+    interval. Collecting them moves the files of dead processes into an
+    archive file and sums every file, so any worker can report them all and
+    counters never go backwards as workers are recycled.
+    """
+
+    def __init__(self, directory=None, flush_interval=None):
+        self.directory = directory
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        # bucket counts, then sum and count, by (histogram, route, method)
+        self.series = {}
+        self.flushed_at = 0
+        self.pid = None
+        self.started = None
+
+    def get_directory(self):
+        return self.directory or get_metrics_dir()
+
+    def get_path(self):
+        return os.path.join(self.get_directory(), 'metrics-{}-{}.json'.format(
+            self.pid, self.started))
+
+    def check_process(self):
+        """Starts new histograms in a process forked after they were made"""
+        if self.pid != os.getpid():
+            self.pid = os.getpid()
+            self.started = int(time.time() * 1000)
+            self.series = {}
+            self.flushed_at = 0
+
+    def observe(self, route, method, values):
+        """Records values, a dict mapping histogram names to observations"""
+        with self.lock:
+            self.check_process()
+            for name, value in values.items():
+                buckets = HISTOGRAMS[name][1]
+                key = (name, route, method)
+                series = self.series.get(key)
+                if series is None:
+                    series = self.series[key] = [0] * (len(buckets) + 2)
+                for index, bound in enumerate(buckets):
+                    if value <= bound:
+                        series[index] += 1
+                series[-2] += value
+                series[-1] += 1
+        self.flush()
+
+    def flush(self, force=False):
+        """Writes the histograms of the process to its file when due"""
+        interval = self.flush_interval
+        if interval is None:
+            interval = getattr(settings, 'METRICS_FLUSH_INTERVAL', 1)
+        now = time.time()
+        with self.lock:
+            self.check_process()
+            if not force and now - self.flushed_at < interval:
+                return
+            self.flushed_at = now
+            rows = [list(key) + series for key, series in self.series.items()]
+            path = self.get_path()
+        directory = self.get_directory()
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        write_rows(path, rows)
+
+    @contextmanager
+    def locked(self):
+        """Keeps other processes from collecting while the block runs"""
+        path = os.path.join(self.get_directory(), 'metrics.lock')
+        with open(path, 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def archive_dead_processes(self):
+        """
+        Adds the histograms of the processes which exited to the archive
+        file, removing their files
+        """
+        archive_path = os.path.join(self.get_directory(), ARCHIVE_NAME)
+        dead = [path for pid, path in self.get_process_paths()
+                if not is_alive(pid)]
+        if not dead:
+            return
+        archived = read_series([archive_path] + dead)
+        write_rows(archive_path, [list(key) + series
+                                  for key, series in archived.items()])
+        for path in dead:
+            os.remove(path)
+
+    def get_process_paths(self):
+        """Returns the pid and path of the file of each process"""
+        paths = []
+        for path in glob.glob(os.path.join(self.get_directory(),
+                                           'metrics-*.json')):
+            match = _process_file.match(os.path.basename(path))
+            if match:
+                paths.append((int(match.group(1)), path))
+        return paths
+
+    def collect(self):
+        """Returns the histograms of every process, summed"""
+        self.flush(force=True)
+        with self.locked():
+            self.archive_dead_processes()
+            paths = [path for pid, path in self.get_process_paths()]
+            return read_series(
+                [os.path.join(self.get_directory(), ARCHIVE_NAME)] + paths)
+
+    def render(self):
+        """Returns the histograms of every process in Prometheus format"""
+        collected = self.collect()
+        lines = []
+        for name, (description, buckets) in HISTOGRAMS.items():
+            lines.append('# HELP {} {}'.format(name, description))
+            lines.append('# TYPE {} histogram'.format(name))
+            for key in sorted(key for key in collected if key[0] == name):
+                series = collected[key]
+                labels = 'route="{}",method="{}"'.format(
+                    escape_label(key[1]), escape_label(key[2]))
+                for bound, count in zip(buckets, series):
+                    lines.append('{}_bucket{{{},le="{}"}} {}'.format(
+                        name, labels, format_value(bound), count))
+                lines.append('{}_bucket{{{},le="+Inf"}} {}'.format(
+                    name, labels, series[-1]))
+                lines.append('{}_sum{{{}}} {}'.format(
+                    name, labels, format_value(series[-2])))
+                lines.append('{}_count{{{}}} {}'.format(
+                    name, labels, series[-1]))
+        return '\n'.join(lines) + '\n'
+
+
+def is_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except OSError as error:
+        # the process exists when only signalling it is not permitted
+        return error.errno != errno.ESRCH
+    return True
+
+
+def write_rows(path, rows):
+    temporary = '{}.{}.tmp'.format(path, threading.current_thread().ident)
+    with open(temporary, 'w') as output:
+        json.dump(rows, output)
+    # renaming is atomic, readers never see a partial file
+    os.rename(temporary, path)
+
+
+def read_series(paths):
+    """Returns the histograms of the files in paths, summed"""
+    collected = {}
+    for path in paths:
+        try:
+            with open(path) as data:
+                rows = json.load(data)
+        except (IOError, ValueError):
+            continue
+        for row in rows:
+            key, values = tuple(row[:3]), row[3:]
+            if key[0] not in HISTOGRAMS:
+                continue
+            series = collected.get(key)
+            if series is None:
+                collected[key] = values
+            else:
+                collected[key] = [a + b for a, b in zip(series, values)]
+    return collected
+
+
+def escape_label(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace(
+        '\n', '\\n')
+
+
+def format_value(value):
+    return repr(float(value))
+
+
+request_metrics = RequestMetrics()
@@ -0,0 +1,77 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import time
+
+from django.db import connections
+
+from core.metrics import request_metrics, start_timings, stop_timings
+
+
+class RequestMetricsMiddleware(object):
+    """
+    Records the total time, database time, number of queries, serializer
+    time and response size of every request in the metrics histograms of
+    its route and method, echoing the timings in a Server-Timing header.
+
+    Queries run while streaming a response body are not counted.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def get_route(self, request):
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            return 'unmatched'
+        return match.view_name
+
+    def __call__(self, request):
+        start = time.time()
+        start_timings()
+        databases = []
+        for connection in connections.all():
+            databases.append((connection, connection.force_debug_cursor,
+                              len(connection.queries_log)))
+            # logs the queries and their time without DEBUG
+            connection.force_debug_cursor = True
+        try:
+            response = self.get_response(request)
+        finally:
+            timings = stop_timings()
+            queries = []
+            for connection, force_debug_cursor, logged in databases:
+                connection.force_debug_cursor = force_debug_cursor
+                queries.extend(list(connection.queries_log)[logged:])
+        total = time.time() - start
+        db_time = sum(float(query['time']) for query in queries)
+        serializer_time = timings.get('serializer', 0)
+        response['Server-Timing'] = ', '.join([
+            'total;dur={:.1f}'.format(total * 1000),
+            'db;dur={:.1f};desc="{} queries"'.format(
+                db_time * 1000, len(queries)),
+            'serializer;dur={:.1f}'.format(serializer_time * 1000),
+        ])
+        values = {
+            'api_request_duration_seconds': total,
+            'api_request_db_duration_seconds': db_time,
+            'api_request_queries': len(queries),
+            'api_request_serializer_duration_seconds': serializer_time,
+        }
+        route = self.get_route(request)
+        if response.streaming:
+            response.streaming_content = self.count_size(
+                response.streaming_content, route, request.method, values)
+        else:
+            values['api_response_size_bytes'] = len(response.content)
+            request_metrics.observe(route, request.method, values)
+        return response
+
+    def count_size(self, content, route, method, values):
+        """Yields content, recording the request once it was all sent"""
+        size = 0
+        for chunk in content:
+            size += len(chunk)
+            yield chunk
+        values['api_response_size_bytes'] = size
+        request_metrics.observe(route, method, values)
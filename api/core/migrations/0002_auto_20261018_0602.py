@@ -0,0 +1,34 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:02
+# flake8: noqa
+from __future__ import unicode_literals
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchToken',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=100)),
+                ('object_id', models.CharField(max_length=16)),
+                ('token', models.CharField(max_length=30)),
+                ('weight', models.PositiveSmallIntegerField(default=1)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchtoken',
+            index=models.Index(fields=['kind', 'object_id'], name='search_token_object_idx'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='searchtoken',
+            unique_together=set([('kind', 'token', 'object_id')]),
+        ),
+    ]
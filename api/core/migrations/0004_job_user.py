@@ -0,0 +1,24 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 07:40
+# flake8: noqa
+from __future__ import unicode_literals
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('core', '0003_auto_20261018_0708'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='job',
+            name='user',
+            field=models.ForeignKey(blank=True, help_text='user who queued the job', null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='jobs', to=settings.AUTH_USER_MODEL),
+        ),
+    ]
@@ -1,30 +1,160 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+import json
 import string
 import random
+import time
+from datetime import timedelta
 
-from django.db import models
+from django.conf import settings
+from django.db import connections, models, transaction
+from django.utils import timezone
 
+from core.search import get_search_terms, get_search_tokens
 from core.validators import validate_hash_id
 
+HASH_ID_CHARS = string.digits + string.ascii_lowercase
+HASH_ID_TIMESTAMP_LENGTH = 8
+
+_random = random.SystemRandom()
+
+
+def get_random_hash_id(hash_length=16):
+    """
+    Generates random string with numbers and lowercase letters, which may
+    repeat
+    """
+    return ''.join(_random.choice(HASH_ID_CHARS) for x in range(hash_length))
+
+
+def get_sortable_hash_id(hash_length=16):
+    """
+    Generates string with numbers and lowercase letters starting with the
+    base36 encoded current time in milliseconds, followed by random chars.
+    Hash ids generated later sort after earlier ones, so inserts land at the
+    end of primary key indexes.
+    """
+    if hash_length <= HASH_ID_TIMESTAMP_LENGTH:
+        return get_random_hash_id(hash_length)
+    timestamp = int(time.time() * 1000)
+    prefix = ''
+    for x in range(HASH_ID_TIMESTAMP_LENGTH):
+        timestamp, index = divmod(timestamp, len(HASH_ID_CHARS))
+        prefix = HASH_ID_CHARS[index] + prefix
+    return prefix + get_random_hash_id(
+        hash_length - HASH_ID_TIMESTAMP_LENGTH)
+
 
 def get_hash_id(hash_length=16):
     """
-    Generates random 16 char lowercase string with numbers and
-    lowercase letters
+    Generates 16 char lowercase string with numbers and lowercase letters,
+    either sortable or fully random according to settings.HASH_ID_MODE
+    """
+    if getattr(settings, 'HASH_ID_MODE', 'random') == 'sortable':
+        return get_sortable_hash_id(hash_length)
+    return get_random_hash_id(hash_length)
+
+
+class DataVersion(models.Model):
+    """
+    Change marker shared by all processes for a named set of rows. The token
+    is replaced by a new random one on every change.
     """
-    hash_seed = string.ascii_lowercase + string.digits
-    hash_string = ''
-    for x in random.sample(hash_seed, hash_length):
-        hash_string += x
-    return hash_string
+    key = models.CharField(primary_key=True, max_length=100)
+    token = models.CharField(max_length=16, default=get_random_hash_id)
+
+    def __unicode__(self):
+        return '{}: {}'.format(self.key, self.token)
+
+
+class SearchTokenManager(models.Manager):
+
+    def index(self, instances, *fields):
+        """
+        Replaces the search tokens of instances by the prefixes of the words
+        in given fields, with two queries for any number of instances
+        """
+        instances = list(instances)
+        if not instances:
+            return
+        kind = instances[0]._meta.label_lower
+        self.remove(instances)
+        self.bulk_create([
+            SearchToken(kind=kind, object_id=instance.pk, token=token,
+                        weight=weight)
+            for instance in instances
+            for token, weight in get_search_tokens(
+                *[getattr(instance, field) for field in fields]).items()
+        ])
+
+    def remove(self, instances):
+        """Deletes the search tokens of instances"""
+        instances = list(instances)
+        if instances:
+            self.filter(
+                kind=instances[0]._meta.label_lower,
+                object_id__in=[instance.pk for instance in instances]
+            ).delete()
+
+
+class SearchToken(models.Model):
+    """
+    Normalised word prefix of a searchable object. Searches look tokens up
+    by equality through the kind and token index instead of scanning the
+    searched table with leading wildcards.
+    """
+    kind = models.CharField(max_length=100)
+    object_id = models.CharField(max_length=16)
+    token = models.CharField(max_length=30)
+    weight = models.PositiveSmallIntegerField(default=1)
+
+    objects = SearchTokenManager()
+
+    class Meta:
+        unique_together = ('kind', 'token', 'object_id')
+        indexes = [
+            models.Index(fields=['kind', 'object_id'],
+                         name='search_token_object_idx'),
+        ]
+
+    def __unicode__(self):
+        return '{} {}: {}'.format(self.kind, self.object_id, self.token)
+
+
+class SearchQuerySet(models.QuerySet):
+
+    def search(self, query):
+        """
+        Keeps the objects with a word starting with every term of query,
+        ranked by how many terms match whole words and then by the current
+        ordering. Queries without any word match nothing.
+        """
+        terms = get_search_terms(query)
+        if not terms:
+            return self.none()
+        kind = self.model._meta.label_lower
+        queryset = self
+        for term in terms:
+            queryset = queryset.filter(pk__in=SearchToken.objects.filter(
+                kind=kind, token=term).values('object_id'))
+        rank = SearchToken.objects.filter(
+            kind=kind, token__in=terms, object_id=models.OuterRef('pk')
+        ).values('object_id').annotate(
+            rank=models.Sum('weight')).values('rank')
+        ordering = list(queryset.query.order_by or self.model._meta.ordering)
+        return queryset.annotate(
+            search_rank=models.Subquery(
+                rank, output_field=models.IntegerField())
+        ).order_by('-search_rank', *ordering)
 
 
 class HashIdModel(models.Model):
     id = models.CharField(
         primary_key=True, max_length=16, default=get_hash_id,
         validators=[validate_hash_id], editable=False)
+    updated_at = models.DateTimeField(
+        auto_now=True, help_text=u'date and time of the last change')
 
     class Meta:
         abstract = True
@@ -35,9 +165,18 @@ class PropertyBaseUser(HashIdModel):
     last_name = models.CharField(max_length=30, blank=False, null=False)
     email = models.EmailField(unique=True)
 
+    objects = SearchQuerySet.as_manager()
+
+    search_fields = ('first_name', 'last_name')
+
     def save(self, *args, **kwargs):
         self.full_clean()
         super(PropertyBaseUser, self).save(*args, **kwargs)
+        SearchToken.objects.index([self], *self.search_fields)
+
+    def delete(self, *args, **kwargs):
+        SearchToken.objects.remove([self])
+        return super(PropertyBaseUser, self).delete(*args, **kwargs)
 
     def get_full_name(self):
         """
@@ -51,3 +190,149 @@ class PropertyBaseUser(HashIdModel):
 
     class Meta:
         abstract = True
+
+
+class JobManager(models.Manager):
+
+    def enqueue(self, task, args=(), kwargs=None, priority=0, delay=0,
+                max_attempts=3, user=None):
+        """
+        Queues a call of task, a function or its dotted path, with JSON
+        serializable arguments, to be run by a worker after delay seconds.
+        Jobs with higher priority run first. Only user, when given, and
+        staff users may follow the job through the api.
+        """
+        if callable(task):
+            task = '{}.{}'.format(task.__module__, task.__name__)
+        return self.create(
+            task=task,
+            payload=json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+            priority=priority, max_attempts=max_attempts, user=user,
+            run_at=timezone.now() + timedelta(seconds=delay))
+
+    def get_claimable(self, now):
+        return self.filter(status=Job.QUEUED, run_at__lte=now).order_by(
+            '-priority', 'run_at', 'id')
+
+    def release_expired(self):
+        """
+        Queues again the running jobs whose lease expired, as their worker
+        died, failing the ones without attempts left
+        """
+        now = timezone.now()
+        expired = self.filter(status=Job.RUNNING, leased_until__lt=now)
+        expired.filter(attempts__gte=models.F('max_attempts')).update(
+            status=Job.FAILED, finished_at=now, leased_until=None,
+            last_error='Lease expired')
+        expired.update(status=Job.QUEUED, run_at=now, leased_until=None)
+
+    def _select_skip_locked(self, queryset, limit):
+        """
+        Returns the ids of the first rows of queryset not locked by other
+        transactions, locking them, or None when the database can not skip
+        locked rows
+        """
+        connection = connections[self.db]
+        if connection.features.has_select_for_update_skip_locked:
+            return list(queryset.select_for_update(
+                skip_locked=True).values_list('id', flat=True)[:limit])
+        if (connection.vendor == 'mysql' and
+                connection.mysql_version >= (8, 0, 1)):
+            # supported since MySQL 8 although not flagged by Django yet
+            sql, params = queryset.values('id')[:limit].query.sql_with_params()
+            with connection.cursor() as cursor:
+                cursor.execute(sql + ' FOR UPDATE SKIP LOCKED', params)
+                return [row[0] for row in cursor.fetchall()]
+        return None
+
+    def claim(self, worker, lease=300, limit=1):
+        """
+        Marks up to limit queued jobs due to run as running for worker
+        during lease seconds, and returns them. Jobs are claimed with
+        SELECT ... FOR UPDATE SKIP LOCKED so concurrent workers never wait
+        for each other, or by polling with conditional updates, which only
+        one worker can win, where that is not supported.
+        """
+        now = timezone.now()
+        claimed = {
+            'status': Job.RUNNING, 'worker': worker,
+            'leased_until': now + timedelta(seconds=lease),
+            'attempts': models.F('attempts') + 1,
+        }
+        queryset = self.get_claimable(now)
+        with transaction.atomic(using=self.db):
+            ids = self._select_skip_locked(queryset, limit)
+            if ids:
+                self.filter(id__in=ids).update(**claimed)
+        if ids is None:
+            ids = []
+            for pk in queryset.values_list('id', flat=True)[:limit]:
+                if self.filter(pk=pk, status=Job.QUEUED).update(**claimed):
+                    ids.append(pk)
+        return list(self.filter(id__in=ids).order_by(
+            '-priority', 'run_at', 'id'))
+
+    def renew_lease(self, job, lease=300):
+        """
+        Extends the lease of a claimed job by lease seconds from now, while
+        it was not claimed again, returning whether it was extended
+        """
+        return bool(self.filter(
+            pk=job.pk, status=Job.RUNNING, attempts=job.attempts
+        ).update(leased_until=timezone.now() + timedelta(seconds=lease)))
+
+
+class Job(models.Model):
+    """
+    Call of a function queued to run in a worker process, outside of the
+    request which queued it
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    )
+
+    task = models.CharField(max_length=200, help_text='dotted function path')
+    payload = models.TextField(help_text='JSON arguments of the function')
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(
+        max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=3)
+    worker = models.CharField(max_length=100, blank=True)
+    leased_until = models.DateTimeField(null=True, blank=True)
+    result = models.TextField(
+        null=True, blank=True, help_text='JSON return value of the function')
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    user = models.ForeignKey(
+        settings.AUTH_USER_MODEL, null=True, blank=True,
+        on_delete=models.SET_NULL, related_name='jobs',
+        help_text='user who queued the job')
+
+    objects = JobManager()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', '-priority', 'run_at'],
+                         name='job_claim_idx'),
+        ]
+
+    def __unicode__(self):
+        return '{} {}: {}'.format(self.task, self.id, self.status)
+
+    def get_arguments(self):
+        """Returns the args and kwargs of the function"""
+        payload = json.loads(self.payload)
+        return payload['args'], payload['kwargs']
+
+    def get_result(self):
+        return None if self.result is None else json.loads(self.result)
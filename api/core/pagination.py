@@ -1,6 +1,15 @@
 from __future__ import unicode_literals
 
+from collections import OrderedDict
+
+from django.core import signing
 from rest_framework import pagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from core.exceptions import Api400
+from core.querysets import (get_keyset_ordering, get_keyset_position,
+                            load_ordering_columns, seek)
 
 
 class BasePagination(pagination.PageNumberPagination):
@@ -8,9 +17,110 @@ class BasePagination(pagination.PageNumberPagination):
     max_page_size = 40
     max_page_number = 1000
     page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    cursor_salt = 'core.pagination.cursor'
+
+    cursor_mode = False
 
     def get_page_size(self, request):
         page_size = request.query_params.get(self.page_size_query_param)
         if page_size and page_size.lower() == 'none':
             return None
         return super(BasePagination, self).get_page_size(request)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param in request.query_params:
+            return self.paginate_queryset_by_cursor(queryset, request)
+        return super(BasePagination, self).paginate_queryset(
+            queryset, request, view)
+
+    def paginate_queryset_by_cursor(self, queryset, request):
+        """
+        Paginates queryset seeking from the position stored in the cursor,
+        which keeps pages stable while rows are inserted and avoids counting
+        and offsetting rows
+        """
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        self.cursor_mode = True
+        self.request = request
+        self.ordering = get_keyset_ordering(queryset)
+        queryset = load_ordering_columns(
+            queryset.order_by(*self.ordering), self.ordering)
+
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            queryset = seek(queryset, self.ordering, position, reverse)
+        if reverse:
+            queryset = queryset.reverse()
+
+        results = list(queryset[:page_size + 1])
+        has_more = len(results) > page_size
+        results = results[:page_size]
+        if reverse:
+            results.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next = has_more
+            self.has_previous = position is not None
+
+        self.first_position = self.last_position = position
+        if results:
+            self.first_position = get_keyset_position(
+                results[0], self.ordering)
+            self.last_position = get_keyset_position(
+                results[-1], self.ordering)
+        return results
+
+    def get_cursor_salt(self):
+        # cursors are only valid for the ordering they were created for
+        return '{}:{}'.format(self.cursor_salt, ','.join(self.ordering))
+
+    def decode_cursor(self, request):
+        """
+        Returns the position and direction stored in the cursor sent by the
+        client. An empty cursor points to the first page.
+        """
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        try:
+            data = signing.loads(cursor, salt=self.get_cursor_salt())
+            position, reverse = data['p'], data['r']
+        except (signing.BadSignature, KeyError, TypeError, ValueError):
+            raise Api400('Invalid cursor')
+        if len(position) != len(self.ordering):
+            raise Api400('Invalid cursor')
+        return position, bool(reverse)
+
+    def encode_cursor(self, position, reverse):
+        cursor = signing.dumps(
+            {'p': position, 'r': reverse}, salt=self.get_cursor_salt(),
+            compress=True)
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super(BasePagination, self).get_next_link()
+        if not self.has_next or self.last_position is None:
+            return None
+        return self.encode_cursor(self.last_position, False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super(BasePagination, self).get_previous_link()
+        if not self.has_previous or self.first_position is None:
+            return None
+        return self.encode_cursor(self.first_position, True)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super(BasePagination, self).get_paginated_response(data)
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('previous', self.get_previous_link()),
+            ('results', data)
+        ]))
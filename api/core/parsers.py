@@ -0,0 +1,63 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import csv
+import json
+
+from django.utils.encoding import force_text
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+def read_csv_rows(stream, encoding='utf-8'):
+    """
+    Yields a dict for each line of a CSV stream whose first line holds the
+    column names
+    """
+    reader = csv.reader(stream)
+    header = [force_text(name, encoding).strip()
+              for name in next(reader, [])]
+    for values in reader:
+        if not any(values):
+            continue
+        yield dict(zip(header, [force_text(value, encoding)
+                                for value in values]))
+
+
+def read_ndjson_rows(stream, encoding='utf-8'):
+    """
+    Yields the value of each line of a newline delimited JSON stream,
+    raising ValueError at the first line which is not valid JSON
+    """
+    for number, line in enumerate(stream, 1):
+        line = force_text(line, encoding).strip()
+        if not line:
+            continue
+        try:
+            yield json.loads(line)
+        except ValueError:
+            raise ValueError('Line {} is not valid JSON'.format(number))
+
+
+class CSVParser(BaseParser):
+    """Parses a CSV request body into a list of dicts"""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        try:
+            return list(read_csv_rows(stream, encoding))
+        except (csv.Error, UnicodeDecodeError) as e:
+            raise ParseError('CSV parse error - {}'.format(e))
+
+
+class NDJSONParser(BaseParser):
+    """Parses a newline delimited JSON request body into a list"""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        encoding = (parser_context or {}).get('encoding', 'utf-8')
+        try:
+            return list(read_ndjson_rows(stream, encoding))
+        except (ValueError, UnicodeDecodeError) as e:
+            raise ParseError('NDJSON parse error - {}'.format(e))
@@ -0,0 +1,153 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from itertools import combinations
+
+from django.db import connections
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.querysets import get_keyset_ordering, get_keyset_position, seek
+
+PAGE_SIZE = 20
+
+
+class QueryPlanCase(object):
+    """List query of a viewset for one combination of filters"""
+
+    def __init__(self, name, queryset, allow_sort=False,
+                 allow_index_scan=False):
+        self.name = name
+        self.queryset = queryset
+        # whether the few matching rows may be sorted after being found
+        self.allow_sort = allow_sort
+        # whether the ordering index may be walked until a page matches
+        self.allow_index_scan = allow_index_scan
+
+    def __repr__(self):
+        return '<QueryPlanCase {}>'.format(self.name)
+
+
+def explain(queryset):
+    """Returns the rows of the database query plan of queryset as dicts"""
+    connection = connections[queryset.db]
+    sql, params = queryset.query.sql_with_params()
+    if connection.vendor == 'sqlite':
+        sql = 'EXPLAIN QUERY PLAN ' + sql
+    else:
+        sql = 'EXPLAIN ' + sql
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [column[0] for column in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def find_plan_problems(plan, vendor, allow_sort=False,
+                       allow_index_scan=False):
+    """
+    Returns descriptions of the steps of plan which read whole tables
+    without an index, walk whole indexes without searching them or sort
+    rows after reading them
+    """
+    problems = []
+    for row in plan:
+        if vendor == 'mysql':
+            table = row.get('table') or ''
+            # materialized subqueries and derived tables are named <...>
+            derived = table.startswith('<')
+            if row.get('type') == 'ALL' and not derived:
+                problems.append('full scan of {}'.format(table))
+            if (row.get('type') == 'index' and not derived and
+                    not allow_index_scan):
+                problems.append('full index scan of {}'.format(table))
+            if 'filesort' in (row.get('Extra') or '') and not allow_sort:
+                problems.append('filesort on {}'.format(table))
+        elif vendor == 'sqlite':
+            detail = row['detail']
+            if detail.startswith('SCAN') and ' USING ' not in detail:
+                problems.append('full scan: {}'.format(detail))
+            elif detail.startswith('SCAN') and not allow_index_scan:
+                problems.append('full index scan: {}'.format(detail))
+            if 'TEMP B-TREE' in detail and not allow_sort:
+                problems.append('sort: {}'.format(detail))
+    return problems
+
+
+def get_filter_combinations(filters):
+    """Returns every combination of the sample filters, empty one included"""
+    names = sorted(filters)
+    for size in range(len(names) + 1):
+        for combination in combinations(names, size):
+            yield dict((name, filters[name]) for name in combination)
+
+
+def get_viewset_queryset(viewset_class, action, params):
+    """
+    Returns the filtered queryset a list action of viewset_class builds for
+    a request with given query params
+    """
+    request = APIRequestFactory().get('/', params)
+    viewset = viewset_class(
+        request=Request(request), action=action, kwargs={}, args=(),
+        format_kwarg=None)
+    return viewset.filter_queryset(viewset.get_queryset())
+
+
+def get_cursor_queryset(queryset):
+    """
+    Returns the query of a page after the first one in cursor pagination,
+    or None when the table is empty
+    """
+    ordering = get_keyset_ordering(queryset)
+    queryset = queryset.order_by(*ordering)
+    first = queryset.first()
+    if first is None:
+        # the plan does not depend on the position, seek from any row
+        first = queryset.model._default_manager.first()
+        if first is None:
+            return None
+        for field in ordering:
+            if not hasattr(first, field.lstrip('-')):
+                setattr(first, field.lstrip('-'), 0)
+    position = get_keyset_position(first, ordering)
+    return seek(queryset, ordering, position)[:PAGE_SIZE + 1]
+
+
+def get_query_plan_cases(registry, vendor):
+    """
+    Returns the query plan cases of every list action and filter
+    combination of the viewsets in a router registry. Viewsets declare the
+    sample values of their filters in explain_filters, the query params
+    required by each list action in explain_actions, the filters whose
+    matches may be sorted in sorted_filters, like ranked searches, the
+    filters only indexed on MySQL in fulltext_filters and the filters no
+    index can search in scanned_filters, like substring matches, whose pages
+    are read walking the ordering index. Pages without filters walk it too.
+    """
+    cases = []
+    for prefix, viewset_class, base_name in registry:
+        filters = dict(getattr(viewset_class, 'explain_filters', {}))
+        if vendor != 'mysql':
+            for name in getattr(viewset_class, 'fulltext_filters', ()):
+                filters.pop(name, None)
+        actions = getattr(viewset_class, 'explain_actions', {'list': {}})
+        sorted_filters = set(getattr(viewset_class, 'sorted_filters', ()))
+        scanned_filters = set(getattr(viewset_class, 'scanned_filters', ()))
+        for action, required in sorted(actions.items()):
+            for combination in get_filter_combinations(filters):
+                params = dict(required, **combination)
+                name = ' '.join([prefix, action] + [
+                    '{}={}'.format(key, value)
+                    for key, value in sorted(combination.items())])
+                allow_sort = bool(sorted_filters.intersection(combination))
+                allow_index_scan = scanned_filters.issuperset(combination)
+                queryset = get_viewset_queryset(viewset_class, action, params)
+                cases.append(QueryPlanCase(
+                    '{} page'.format(name), queryset[:PAGE_SIZE], allow_sort,
+                    allow_index_scan))
+                cursor_queryset = get_cursor_queryset(queryset)
+                if cursor_queryset is not None:
+                    cases.append(QueryPlanCase(
+                        '{} cursor'.format(name), cursor_queryset,
+                        allow_sort, allow_index_scan))
+    return cases
@@ -0,0 +1,117 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from datetime import date
+from decimal import Decimal
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db import models
+
+
+def get_keyset_ordering(queryset):
+    """
+    Returns the ordering of given queryset with the primary key appended as
+    tiebreaker, so every row has a unique position. The primary key follows
+    the direction of the last field, so one index can serve the ordering.
+    """
+    ordering = list(queryset.query.order_by or queryset.model._meta.ordering)
+    pk_name = queryset.model._meta.pk.name
+    if not any(field.lstrip('-') in ('pk', pk_name) for field in ordering):
+        if ordering and ordering[-1].startswith('-'):
+            pk_name = '-' + pk_name
+        ordering.append(pk_name)
+    return ordering
+
+
+def load_ordering_columns(queryset, ordering):
+    """
+    Returns queryset loading the columns of ordering even when restricted
+    with only(), so reading the position of its rows runs no query for
+    deferred fields
+    """
+    names, defer = queryset.query.deferred_loading
+    if defer or not names:
+        return queryset
+    pk_name = queryset.model._meta.pk.name
+    columns = set(names)
+    for field in ordering:
+        name = field.lstrip('-')
+        if name == 'pk':
+            name = pk_name
+        try:
+            queryset.model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # annotations and related lookups
+            continue
+        columns.add(name)
+    return queryset.only(*columns)
+
+
+def get_keyset_position(instance, ordering):
+    """
+    Returns the JSON serializable values of instance for the fields in
+    ordering, which may include annotations. Instance may also be a row of
+    a values queryset including those fields.
+    """
+    position = []
+    for field in ordering:
+        name = field.lstrip('-')
+        if isinstance(instance, dict):
+            value = instance[name]
+        else:
+            if name == 'pk':
+                name = instance._meta.pk.name
+            try:
+                name = instance._meta.get_field(name).attname
+            except FieldDoesNotExist:
+                pass
+            value = getattr(instance, name)
+        if isinstance(value, date):
+            value = value.isoformat()
+        elif isinstance(value, Decimal):
+            value = str(value)
+        position.append(value)
+    return position
+
+
+def seek(queryset, ordering, position, reverse=False):
+    """
+    Filters queryset keeping the rows placed after position in ordering or,
+    when reverse is True, the rows placed before it. The redundant bound of
+    the first column lets the database seek its index rather than walk it
+    from the start.
+    """
+    condition = None
+    bound = None
+    previous = {}
+    for field, value in zip(ordering, position):
+        name = field.lstrip('-')
+        if field.startswith('-') == reverse:
+            lookup = '{}__gt'.format(name)
+        else:
+            lookup = '{}__lt'.format(name)
+        if bound is None:
+            bound = models.Q(**{lookup + 'e': value})
+        term = models.Q(**previous) & models.Q(**{lookup: value})
+        condition = term if condition is None else condition | term
+        previous[name] = value
+    if len(previous) > 1:
+        condition = bound & condition
+    return queryset.filter(condition)
+
+
+def iterate_in_chunks(queryset, chunk_size):
+    """
+    Yields lists with up to chunk_size rows of queryset, seeking each chunk
+    from the last row of the previous one so memory usage does not depend on
+    the number of rows, whatever the database cursor implementation is
+    """
+    ordering = get_keyset_ordering(queryset)
+    queryset = load_ordering_columns(queryset.order_by(*ordering), ordering)
+    chunk = list(queryset[:chunk_size])
+    while chunk:
+        yield chunk
+        if len(chunk) < chunk_size:
+            return
+        position = get_keyset_position(chunk[-1], ordering)
+        chunk = list(seek(queryset, ordering, position)[:chunk_size])
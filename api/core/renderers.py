@@ -0,0 +1,75 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import csv
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from io import BytesIO
+
+from django.utils.encoding import force_text
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+
+def get_rows(data):
+    """Returns data as a list of rows, data being one row or a list"""
+    if data is None:
+        return []
+    if isinstance(data, dict):
+        return [data]
+    return data
+
+
+class CSVRenderer(BaseRenderer):
+    """
+    Renders a list of flat dicts as CSV lines, with the columns named by
+    fields in the renderer context. A header line comes first unless the
+    renderer context sets header to False.
+    """
+    media_type = 'text/csv'
+    format = 'csv'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        rows = get_rows(data)
+        fields = renderer_context.get('fields')
+        if fields is None:
+            fields = list(rows[0]) if rows else []
+        output = BytesIO()
+        writer = csv.writer(output)
+        if renderer_context.get('header', True):
+            writer.writerow([self.encode(field) for field in fields])
+        for row in rows:
+            writer.writerow([self.encode(row.get(field)) for field in fields])
+        return output.getvalue()
+
+    def encode(self, value):
+        if value is None:
+            return b''
+        if isinstance(value, (date, datetime)):
+            value = value.isoformat()
+        return force_text(value).encode(self.charset)
+
+
+class ExportJSONEncoder(JSONEncoder):
+    """Keeps decimals exact, as the API renders them"""
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj)
+        return super(ExportJSONEncoder, self).default(obj)
+
+
+class NDJSONRenderer(BaseRenderer):
+    """Renders a list as newline delimited JSON, one item per line"""
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+    charset = None
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return b''.join(
+            json.dumps(row, cls=ExportJSONEncoder, ensure_ascii=False,
+                       separators=(',', ':')).encode('utf-8') + b'\n'
+            for row in get_rows(data))
@@ -0,0 +1,54 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import re
+import unicodedata
+
+from django.utils.encoding import force_text
+
+MAX_TOKEN_LENGTH = 30
+MAX_SEARCH_TERMS = 5
+
+# weight of a token matching a whole word, against a prefix of it
+WORD_WEIGHT = 3
+PREFIX_WEIGHT = 1
+
+_separators = re.compile(r'\W+', re.UNICODE)
+
+
+def normalize_words(text):
+    """
+    Returns the lowercase words of text without accents and punctuation, so
+    'Zoë O'Brien' and 'zoe obrien' give the same words
+    """
+    text = unicodedata.normalize('NFKD', force_text(text or ''))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    text = text.lower().replace("'", '')
+    return [word for word in _separators.split(text) if word]
+
+
+def get_search_tokens(*values):
+    """
+    Returns a dict mapping every prefix of the words in values to its
+    weight. Whole words weigh more than their prefixes, so exact matches
+    rank first.
+    """
+    tokens = {}
+    for value in values:
+        for word in normalize_words(value):
+            word = word[:MAX_TOKEN_LENGTH]
+            for length in range(1, len(word) + 1):
+                weight = WORD_WEIGHT if length == len(word) else PREFIX_WEIGHT
+                token = word[:length]
+                tokens[token] = max(weight, tokens.get(token, 0))
+    return tokens
+
+
+def get_search_terms(query):
+    """Returns the normalised terms of a search query"""
+    terms = []
+    for word in normalize_words(query):
+        word = word[:MAX_TOKEN_LENGTH]
+        if word not in terms:
+            terms.append(word)
+    return terms[:MAX_SEARCH_TERMS]
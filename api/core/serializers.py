@@ -0,0 +1,82 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.db.models.constants import LOOKUP_SEP
+from rest_framework import serializers
+
+from core.eager_loading import get_eager_loading_plan
+from core.fieldsets import DEFAULT_FIELDSET
+from core.fragments import fragment_cache
+from core.models import Job
+
+
+class CachedFragmentMixin(object):
+    """
+    Reuses the representation of an object rendered before by the same
+    serializer class while neither the object nor the related objects it
+    embeds changed, as told by their updated_at. Representations taken from
+    the cache are shared and must not be modified.
+    """
+    required_sources = ('updated_at',)
+    # set by core.fieldsets.prune_serializer for sparse representations
+    fieldset = DEFAULT_FIELDSET
+
+    def get_fragment_version(self, instance):
+        """
+        Returns the updated_at of instance and of the related objects its
+        representation embeds, or None when any of them was not loaded
+        """
+        plan = get_eager_loading_plan(type(self), self.fieldset)
+        objects = [instance]
+        for lookup in plan.select_related:
+            related = instance
+            for attr in lookup.split(LOOKUP_SEP):
+                cache_name = related._meta.get_field(attr).get_cache_name()
+                # reading relations or fields which were not loaded would
+                # cost a query per object
+                if not hasattr(related, cache_name):
+                    return None
+                related = getattr(related, attr)
+                if related is None:
+                    return None
+            objects.append(related)
+        version = []
+        for obj in objects:
+            if 'updated_at' in obj.get_deferred_fields():
+                return None
+            version.append(obj.updated_at)
+        return tuple(version)
+
+    def to_representation(self, instance):
+        version = self.get_fragment_version(instance)
+        if version is None:
+            return super(CachedFragmentMixin, self).to_representation(
+                instance)
+        key = (type(self), self.fieldset, instance.pk, version)
+        data = fragment_cache.get(key)
+        if data is None:
+            data = super(CachedFragmentMixin, self).to_representation(
+                instance)
+            fragment_cache.set(key, data)
+        return data
+
+
+class JobSerializer(serializers.ModelSerializer):
+    result = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Job
+        fields = ('id', 'task', 'status', 'attempts', 'max_attempts',
+                  'run_at', 'created', 'finished_at', 'result',
+                  'last_error')
+
+    def get_result(self, job):
+        return job.get_result()
+
+    def to_representation(self, job):
+        data = super(JobSerializer, self).to_representation(job)
+        request = self.context.get('request')
+        # tracebacks may reveal internals, only staff users get them
+        if data['last_error'] and not (request and request.user.is_staff):
+            data['last_error'] = 'The job failed'
+        return data
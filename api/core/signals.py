@@ -0,0 +1,39 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+
+from core.models import HashIdModel, PropertyBaseUser, SearchToken
+from core.versions import bump_versions
+
+# sent after bulk_create, which neither calls save nor sends post_save
+post_bulk_create = Signal(providing_args=['instances'])
+
+
+def get_version_key(model):
+    """Returns the key of the version token of rows of model"""
+    return model._meta.label_lower
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_model_version(sender, **kwargs):
+    """
+    Marks the rows of api models as changed for every process, invalidating
+    cached responses and indexes built from them
+    """
+    if issubclass(sender, HashIdModel):
+        bump_versions(get_version_key(sender))
+
+
+@receiver(post_bulk_create)
+def bulk_created(sender, instances, **kwargs):
+    """
+    Does for rows inserted with bulk_create what saving them one by one
+    would have done
+    """
+    if issubclass(sender, HashIdModel):
+        bump_versions(get_version_key(sender))
+    if issubclass(sender, PropertyBaseUser):
+        SearchToken.objects.index(instances, *sender.search_fields)
@@ -1,5 +1,7 @@
 from __future__ import unicode_literals
 
+import json
+
 from rest_framework.test import APITestCase
 
 
@@ -16,3 +18,7 @@ class JWTAuthenticationTestCase(APITestCase):
             "HTTP_AUTHORIZATION": "JWT {}".format(token)
         }
         return headers
+
+    def get_streamed_data(self, response):
+        content = b''.join(response.streaming_content)
+        return json.loads(content.decode('utf-8'))
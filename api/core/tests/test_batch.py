@@ -0,0 +1,136 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from core.batch import resolve_references
+from core.tests import JWTAuthenticationTestCase
+from accounts.models import Landlord
+from accounts.tests.factories import UserFactory, TenantFactory
+from contracts.tests.factories import ContractFactory
+
+
+class TestReferences(TestCase):
+
+    def test_resolve_references(self):
+        """
+        Should replace references to earlier results, keeping the type of
+        values referenced alone
+        """
+        results = {'contract': {'id': 'abc', 'property': {'beds': 2},
+                                'ids': ['x', 'y']}}
+        self.assertEqual(
+            resolve_references({
+                'path': ('/properties/{{contract.id}}'
+                         '?beds={{ contract.property.beds }}'),
+                'beds': '{{contract.property.beds}}',
+                'ids': ['{{contract.ids.1}}', 'z']}, results),
+            {'path': '/properties/abc?beds=2', 'beds': 2, 'ids': ['y', 'z']})
+
+    def test_unknown_references(self):
+        """Should raise ValueError for references to missing values"""
+        results = {'contract': {'ids': ['x']}}
+        for value in ('{{property.id}}', '{{contract.id}}',
+                      '{{contract.ids.1}}'):
+            with self.assertRaises(ValueError):
+                resolve_references(value, results)
+
+
+class TestBatchEndpoint(JWTAuthenticationTestCase):
+
+    def setUp(self):
+        user = UserFactory(is_staff=False)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+        self.contract = ContractFactory()
+
+    def post(self, data):
+        return self.client.post(
+            '/api/batch', data, format='json', **self.headers)
+
+    def test_batch(self):
+        """
+        Should run sub-requests in order, authenticating once and resolving
+        references to earlier results
+        """
+        data = {'requests': [
+            {'name': 'contract',
+             'path': '/contracts/{}'.format(self.contract.id)},
+            {'path': 'properties/{{contract.property.id}}?fields=id,city'},
+            {'path': '/contracts?tenant_id={{contract.tenant.id}}'},
+            {'path': '/landlords/unknown'},
+        ]}
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post(data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        results = response.data['results']
+        self.assertEqual([result['status'] for result in results],
+                         [200, 200, 200, 404])
+        self.assertEqual(results[1]['body'], {
+            'id': self.contract.property.id,
+            'city': self.contract.property.city})
+        self.assertEqual(results[2]['body']['count'], 1)
+        user_queries = [query for query in queries
+                        if 'auth_user' in query['sql']]
+        self.assertEqual(len(user_queries), 1)
+
+    def test_sub_request_errors(self):
+        """Should report invalid sub-requests without running them"""
+        data = {'requests': [
+            'contracts', {'method': 'HEAD', 'path': '/contracts'},
+            {'method': 'GET'}, {'path': '/contracts/{{missing.id}}'},
+            {'path': '/unknown/path/'}, {'path': '/batch'},
+            {'path': '/contracts/export'},
+        ]}
+        response = self.post(data)
+        details = [result['body']['detail']
+                   for result in response.data['results']]
+        self.assertEqual(details, [
+            'Expected an object', 'Invalid method "HEAD"',
+            'Missing path parameter', 'Unknown reference "missing.id"',
+            'Not found', 'Batches can not be nested',
+            'Streamed responses can not be batched'])
+
+    def test_atomic_batch_rolled_back(self):
+        """
+        Should undo the changes of an atomic batch when a sub-request fails
+        """
+        data = {'atomic': True, 'requests': [
+            {'method': 'POST', 'path': '/landlords', 'name': 'landlord',
+             'body': {'first_name': 'Ann', 'last_name': 'Lee',
+                      'email': 'ann@email.com'}},
+            {'method': 'PATCH', 'path': '/landlords/{{landlord.id}}',
+             'body': {'email': 'invalid'}},
+            {'path': '/landlords'},
+        ]}
+        response = self.post(data)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.data['rolled_back'])
+        self.assertEqual([result['status']
+                          for result in response.data['results']],
+                         [201, 400])
+        self.assertFalse(
+            Landlord.objects.filter(email='ann@email.com').exists())
+
+    def test_atomic_batch(self):
+        """Should keep the changes of an atomic batch which succeeded"""
+        tenant = TenantFactory(email='other@email.com')
+        data = {'atomic': True, 'requests': [
+            {'method': 'PATCH', 'path': '/tenants/{}'.format(tenant.id),
+             'body': {'first_name': 'Ann'}},
+        ]}
+        response = self.post(data)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data['rolled_back'])
+        tenant.refresh_from_db()
+        self.assertEqual(tenant.first_name, 'Ann')
+
+    @override_settings(BATCH_MAX_REQUESTS=1)
+    def test_invalid_batches(self):
+        """Should get 400 for empty or too long batches"""
+        for requests in ([], [{'path': '/contracts'}] * 2, 'abc'):
+            response = self.post({'requests': requests})
+            self.assertEqual(response.status_code,
+                             status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,100 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from core.tests import JWTAuthenticationTestCase
+from accounts.tests.factories import UserFactory, LandlordFactory
+from properties.tests.factories import PropertyFactory
+from contracts.tests.factories import ContractFactory
+
+
+class TestCachedResponses(JWTAuthenticationTestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = UserFactory(is_staff=True)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+        self.landlord = LandlordFactory(first_name='George',
+                                        last_name='Foreman')
+        self.property = PropertyFactory(landlord=self.landlord)
+
+    def get(self, url, params=None):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params or {}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response, len(queries)
+
+    def test_repeated_request_served_from_cache(self):
+        """
+        Should answer a repeated request with the same data, only querying
+        the user and the version tokens
+        """
+        first, __ = self.get('/api/properties', {'city': 'London'})
+        second, queries = self.get('/api/properties', {'city': 'London'})
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(queries, 2)
+
+        __, queries = self.get('/api/properties', {'city': 'Sheffield'})
+        self.assertGreater(queries, 2)
+
+    def test_invalidated_by_rendered_model(self):
+        """
+        Should not serve cached pages embedding a landlord after renaming
+        it
+        """
+        url = '/api/properties/{}'.format(self.property.id)
+        self.get(url)
+        response = self.client.patch(
+            '/api/landlords/{}'.format(self.landlord.id),
+            {'first_name': 'Mike'}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response, __ = self.get(url)
+        self.assertEqual(response.data['landlord']['name'], 'Mike Foreman')
+
+    def test_invalidated_by_filtering_model(self):
+        """
+        Should not serve cached available properties after a contract is
+        created for them
+        """
+        params = {'from': '2017-01-01', 'to': '2017-12-31'}
+        response, __ = self.get('/api/properties/available', params)
+        self.assertEqual(response.data['count'], 1)
+        ContractFactory(property=self.property, start_date='2017-02-01',
+                        end_date='2017-06-01')
+        response, __ = self.get('/api/properties/available', params)
+        self.assertEqual(response.data['count'], 0)
+
+    def test_kinds_of_user_cached_apart(self):
+        """Should not share cached responses between staff and other users"""
+        self.get('/api/landlords')
+        user = UserFactory(is_staff=False)
+        headers = self.get_jwt_header(user.username, 'password123!')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get('/api/landlords', **headers)
+        self.assertGreater(len(queries), 2)
+
+    def test_streamed_list_not_cached(self):
+        """Should stream unpaginated lists every time"""
+        for index in range(2):
+            response = self.client.get(
+                '/api/properties', {'page_size': 'none'}, **self.headers)
+            self.assertTrue(response.streaming)
+            self.assertEqual(len(self.get_streamed_data(response)), 1)
+
+    def test_unpaginated_list_not_cached(self):
+        """
+        Should not cache unpaginated lists rendered at once, streaming the
+        next plain request
+        """
+        response = self.client.get(
+            '/api/properties', {'page_size': 'none'},
+            HTTP_ACCEPT='application/json; indent=4', **self.headers)
+        self.assertFalse(response.streaming)
+        response = self.client.get(
+            '/api/properties', {'page_size': 'none'}, **self.headers)
+        self.assertTrue(response.streaming)
+        self.assertEqual(len(self.get_streamed_data(response)), 1)
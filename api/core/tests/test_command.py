@@ -0,0 +1,57 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from StringIO import StringIO
+
+from django.test import TestCase
+from django.core.management import call_command
+from django.core.management.base import CommandError
+
+from core.models import SearchToken
+from accounts.models import Landlord, Tenant
+from accounts.tests.factories import LandlordFactory, TenantFactory
+
+
+class TestBenchmarkHashIdsCommand(TestCase):
+
+    def test_call_command(self):
+        """
+        Should report insert throughput and index size for both hash id
+        modes
+        """
+        output = StringIO()
+        call_command('benchmark_hash_ids', rows=300, batch_size=100,
+                     stdout=output)
+        lines = output.getvalue().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(lines[1].split()[:2], ['random', '300'])
+        self.assertEqual(lines[2].split()[:2], ['sortable', '300'])
+        self.assertGreater(int(lines[1].split()[3]), 0)
+
+
+class TestBuildSearchTokensCommand(TestCase):
+
+    def test_call_command(self):
+        """
+        Should index objects without tokens and remove tokens of removed
+        objects
+        """
+        landlord = LandlordFactory(first_name='John', last_name='Doe')
+        tenant = TenantFactory(first_name='Jane', last_name='Roe')
+        SearchToken.objects.all().delete()
+        SearchToken.objects.create(
+            kind='accounts.tenant', object_id='removed', token='x')
+
+        output = StringIO()
+        call_command('build_search_tokens', batch_size=1, stdout=output)
+        self.assertEqual(list(Landlord.objects.search('doe')), [landlord])
+        self.assertEqual(list(Tenant.objects.search('jane')), [tenant])
+        self.assertFalse(SearchToken.objects.filter(
+            object_id='removed').exists())
+        self.assertIn('accounts.tenant: 1 indexed, 1 stale tokens removed',
+                      output.getvalue())
+
+    def test_unknown_model(self):
+        """Should refuse models which are not searchable"""
+        with self.assertRaises(CommandError):
+            call_command('build_search_tokens', 'properties.property')
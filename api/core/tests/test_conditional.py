@@ -0,0 +1,143 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.query import QuerySet
+from django.test.utils import CaptureQueriesContext
+from mock import patch
+from rest_framework import status
+
+from core.tests import JWTAuthenticationTestCase
+from accounts.tests.factories import (UserFactory, LandlordFactory,
+                                      TenantFactory)
+from properties.tests.factories import PropertyFactory
+
+
+class TestConditionalRequests(JWTAuthenticationTestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = UserFactory(is_staff=True)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+        self.landlord = LandlordFactory(first_name='George',
+                                        last_name='Foreman')
+        self.property = PropertyFactory(landlord=self.landlord)
+        self.url = '/api/properties/{}'.format(self.property.id)
+
+    def test_list_not_modified(self):
+        """
+        Should answer 304 without loading any row when the list did not
+        change, and 200 once it changed
+        """
+        response = self.client.get('/api/properties', **self.headers)
+        etag = response['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/properties', HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response['ETag'], etag)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(len(queries), 2)
+
+        PropertyFactory(landlord=self.landlord)
+        response = self.client.get(
+            '/api/properties', HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_list_etag_depends_on_params(self):
+        """Should give different validators to differently filtered lists"""
+        first = self.client.get('/api/properties', **self.headers)
+        second = self.client.get(
+            '/api/properties', {'city': 'London'}, **self.headers)
+        self.assertNotEqual(first['ETag'], second['ETag'])
+
+    def test_retrieve_not_modified(self):
+        """
+        Should answer 304 while neither the object nor the objects it embeds
+        change
+        """
+        etag = self.client.get(self.url, **self.headers)['ETag']
+        # changes to other rows keep the validator
+        TenantFactory()
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH='W/{}'.format(etag), **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.landlord.first_name = 'Mike'
+        self.landlord.save()
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['landlord']['name'], 'Mike Foreman')
+
+    def test_retrieve_etag_depends_on_fieldset(self):
+        """
+        Should give representations of different fieldsets different
+        validators, not answering one with 304 for the other
+        """
+        first = self.client.get(
+            self.url, {'fields': 'id,city'}, **self.headers)
+        second = self.client.get(
+            self.url, {'fields': 'id,street'}, **self.headers)
+        self.assertNotEqual(first['ETag'], second['ETag'])
+        response = self.client.get(
+            self.url, {'fields': 'id,street'},
+            HTTP_IF_NONE_MATCH=first['ETag'], **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {
+            'id': self.property.id, 'street': self.property.street})
+
+    def test_retrieve_missing_object(self):
+        """Should keep answering 404 for unknown ids"""
+        response = self.client.get(
+            '/api/properties/unknown', HTTP_IF_NONE_MATCH='*',
+            **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_update_if_match(self):
+        """
+        Should update when If-Match holds the current validator and return
+        the new one
+        """
+        etag = self.client.get(self.url, **self.headers)['ETag']
+        response = self.client.patch(
+            self.url, {'number': '7'}, HTTP_IF_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(
+            self.client.get(self.url, **self.headers)['ETag'],
+            response['ETag'])
+
+    def test_update_if_match_modified(self):
+        """Should get 412 when the object changed since it was retrieved"""
+        etag = self.client.get(self.url, **self.headers)['ETag']
+        self.property.number = '8'
+        self.property.save()
+        response = self.client.put(
+            self.url, {'number': '7'}, HTTP_IF_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
+        self.assertEqual(response.data, {
+            'detail': 'Resource was modified since it was retrieved'})
+        self.property.refresh_from_db()
+        self.assertEqual(self.property.number, '8')
+
+    def test_update_if_match_locks_object(self):
+        """
+        Should validate If-Match against the locked object, so updates sent
+        with the same validator can not both be applied
+        """
+        etag = self.client.get(self.url, **self.headers)['ETag']
+        with patch.object(QuerySet, 'select_for_update', autospec=True,
+                          side_effect=lambda queryset: queryset) as lock:
+            response = self.client.patch(
+                self.url, {'number': '7'}, HTTP_IF_MATCH=etag,
+                **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(lock.call_count, 1)
+        response = self.client.patch(
+            self.url, {'number': '9'}, HTTP_IF_MATCH=etag, **self.headers)
+        self.assertEqual(response.status_code,
+                         status.HTTP_412_PRECONDITION_FAILED)
@@ -0,0 +1,118 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from core.eager_loading import build_eager_loading_plan
+from core.tests import JWTAuthenticationTestCase
+from accounts.serializers import LandlordSerializer, TenantSerializer
+from accounts.tests.factories import (UserFactory, LandlordFactory,
+                                      TenantFactory)
+from properties.serializers import PropertySerializer
+from properties.tests.factories import PropertyFactory
+from contracts.serializers import (ContractSerializer,
+                                   ContractModificationsSerializer)
+from contracts.models import Contract
+from contracts.tests.factories import ContractFactory
+
+
+class TestEagerLoadingPlan(TestCase):
+
+    def test_plan_for_flat_serializer(self):
+        """
+        Should only restrict loaded columns for serializer without nested
+        serializers, taking method fields and required sources into account
+        """
+        plan = build_eager_loading_plan(LandlordSerializer())
+        self.assertEqual(plan.select_related, [])
+        self.assertEqual(plan.prefetch_related, [])
+        self.assertEqual(plan.only, ['id', 'first_name', 'last_name',
+                                     'email', 'updated_at'])
+
+    def test_plan_for_nested_serializers(self):
+        """
+        Should select related objects rendered by nested serializers all the
+        way down the serializer tree
+        """
+        plan = build_eager_loading_plan(ContractSerializer())
+        self.assertEqual(plan.select_related,
+                         ['property', 'property__landlord', 'tenant'])
+        self.assertEqual(plan.prefetch_related, [])
+        self.assertEqual(plan.models, ['accounts.landlord', 'accounts.tenant',
+                                       'contracts.contract',
+                                       'properties.property'])
+        for lookup in ('created', 'property', 'property__description',
+                       'property__landlord', 'property__landlord__email',
+                       'tenant', 'tenant__first_name'):
+            self.assertIn(lookup, plan.only)
+
+    def test_plan_for_related_primary_keys(self):
+        """
+        Should not select related objects when serializer only renders their
+        primary keys
+        """
+        plan = build_eager_loading_plan(ContractModificationsSerializer())
+        self.assertEqual(plan.select_related, [])
+        self.assertEqual(plan.models, ['contracts.contract'])
+        self.assertIn('property', plan.only)
+        self.assertIn('tenant', plan.only)
+
+
+class TestQueryBudgets(JWTAuthenticationTestCase):
+    """
+    Fails whenever a full page of any list endpoint costs more queries than
+    its budget, which accounts for authentication, response cache version
+    tokens, count and page queries
+    """
+    page_size = 40
+    budgets = {
+        '/api/landlords': 4,
+        '/api/tenants': 4,
+        '/api/properties': 4,
+        '/api/contracts': 4,
+    }
+
+    def setUp(self):
+        user = UserFactory(is_staff=True)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+        for index in range(self.page_size):
+            landlord = LandlordFactory(
+                email='landlord{}@email.com'.format(index))
+            tenant = TenantFactory(email='tenant{}@email.com'.format(index))
+            ContractFactory(
+                property=PropertyFactory(landlord=landlord), tenant=tenant)
+
+    def test_list_pages_within_budget(self):
+        """Should list a full page of every resource within its budget"""
+        for url, budget in self.budgets.items():
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(
+                    url, {'page_size': self.page_size}, **self.headers)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(len(response.data['results']), self.page_size)
+            self.assertLessEqual(
+                len(queries), budget,
+                '{} costs {} queries, budget is {}'.format(
+                    url, len(queries), budget))
+
+    def test_retrieve_within_budget(self):
+        """
+        Should retrieve nested resources with a single object query besides
+        the user, the validator and the version tokens
+        """
+        contract = Contract.objects.first()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(
+                '/api/contracts/{}'.format(contract.id), **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertLessEqual(len(queries), 4)
+
+    def test_serializers_plans_are_restricted(self):
+        """Should restrict columns for every read serializer"""
+        for serializer_class in (LandlordSerializer, TenantSerializer,
+                                 PropertySerializer, ContractSerializer):
+            plan = build_eager_loading_plan(serializer_class())
+            self.assertIn('id', plan.only)
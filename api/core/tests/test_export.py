@@ -0,0 +1,99 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import csv
+import json
+from collections import OrderedDict
+from io import BytesIO
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from mock import patch
+from rest_framework import status
+
+from core.tests import JWTAuthenticationTestCase
+from accounts.tests.factories import UserFactory, LandlordFactory
+from properties.models import Property
+from properties.tests.factories import PropertyFactory
+from properties.views import PropertyView
+from contracts.tests.factories import ContractFactory
+
+
+class TestExport(JWTAuthenticationTestCase):
+
+    def setUp(self):
+        user = UserFactory(is_staff=False)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+        for index in range(5):
+            PropertyFactory(
+                landlord=LandlordFactory(
+                    first_name='Zo\xeb', last_name='Smith',
+                    email='landlord{}@email.com'.format(index)),
+                city='London' if index % 2 else 'Leeds',
+                description='Fantastic, "quiet" place')
+
+    def export(self, url, params):
+        response = self.client.get(url, params, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        return response, b''.join(response.streaming_content)
+
+    def test_export_csv(self):
+        """
+        Should stream the filtered rows as CSV in the list ordering, reading
+        them in chunks
+        """
+        with patch.object(PropertyView, 'export_chunk_size', 2):
+            with CaptureQueriesContext(connection) as queries:
+                response, content = self.export(
+                    '/api/properties/export',
+                    {'format': 'csv', 'city': 'leeds'})
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'],
+                         'attachment; filename="properties.csv"')
+        rows = list(csv.reader(BytesIO(content)))
+        self.assertEqual(rows[0], list(PropertyView.export_fields))
+        expected = Property.objects.filter(city='Leeds').order_by(
+            'city', 'zip_code', 'street', 'id')
+        self.assertEqual([row[0] for row in rows[1:]],
+                         [aproperty.id for aproperty in expected])
+        self.assertEqual(rows[1][5], b'Fantastic, "quiet" place')
+        self.assertEqual(rows[1][8], expected[0].landlord_id)
+        # the authentication query, a full chunk and the last one
+        self.assertEqual(len(queries), 3)
+
+    def test_export_ndjson(self):
+        """Should stream one JSON object per line"""
+        ContractFactory(start_date='2017-09-25', end_date='2018-09-25',
+                        rent='1250.50')
+        response, content = self.export(
+            '/api/contracts/export', {'format': 'ndjson'})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = content.decode('utf-8').splitlines()
+        self.assertEqual(len(lines), 1)
+        row = json.loads(lines[0], object_pairs_hook=OrderedDict)
+        self.assertEqual(
+            list(row), ['id', 'created', 'start_date', 'end_date', 'rent',
+                        'property', 'tenant'])
+        self.assertEqual(row['rent'], '1250.50')
+        self.assertEqual(row['start_date'], '2017-09-25')
+
+    def test_export_search(self):
+        """Should export the rows matching a search, accents included"""
+        response, content = self.export(
+            '/api/landlords/export', {'format': 'ndjson', 'search': 'zoe'})
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(rows[0]['first_name'], 'Zo\xeb')
+
+    def test_export_empty(self):
+        """Should stream only the header line when nothing matches"""
+        response, content = self.export(
+            '/api/tenants/export', {'format': 'csv'})
+        self.assertEqual(content, b'id,first_name,last_name,email\r\n')
+
+    def test_unknown_format(self):
+        """Should get 404 for formats without an export renderer"""
+        response = self.client.get(
+            '/api/tenants/export', {'format': 'xml'}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
@@ -0,0 +1,149 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from core.exceptions import Api400
+from core.fieldsets import (get_fieldset, parse_field_tree,
+                            prune_serializer)
+from core.fragments import fragment_cache
+from core.tests import JWTAuthenticationTestCase
+from accounts.tests.factories import UserFactory, LandlordFactory
+from contracts.serializers import ContractSerializer
+from properties.tests.factories import PropertyFactory
+from contracts.tests.factories import ContractFactory
+
+
+class TestFieldTrees(TestCase):
+
+    def test_parse_field_tree(self):
+        """Should parse dotted paths into a tree of fields"""
+        self.assertIsNone(parse_field_tree(None))
+        self.assertEqual(parse_field_tree(''), {})
+        self.assertEqual(
+            parse_field_tree('id, property.city,property.landlord.name,'),
+            {'id': None,
+             'property': {'city': None, 'landlord': {'name': None}}})
+
+    def test_whole_field_wins(self):
+        """Should keep every subfield of a field requested as a whole"""
+        self.assertEqual(parse_field_tree('property,property.city'),
+                         {'property': None})
+        self.assertEqual(parse_field_tree('property.city,property'),
+                         {'property': None})
+
+    def test_prune_serializer(self):
+        """
+        Should drop fields not requested and render relations not expanded
+        as primary keys
+        """
+        serializer = prune_serializer(ContractSerializer(), get_fieldset(
+            'id,property.city,property.landlord,tenant', 'property'))
+        self.assertEqual(list(serializer.fields), ['id', 'property', 'tenant'])
+        self.assertEqual(list(serializer.fields['property'].fields),
+                         ['city', 'landlord'])
+        self.assertFalse(hasattr(
+            serializer.fields['property'].fields['landlord'], 'fields'))
+        self.assertFalse(hasattr(serializer.fields['tenant'], 'fields'))
+
+    def test_invalid_fieldsets(self):
+        """Should refuse unknown fields and expanding plain fields"""
+        for fields, expand in (('id,cost', None), ('property.size', None),
+                               (None, 'rent'), (None, 'property.city')):
+            with self.assertRaises(Api400):
+                prune_serializer(ContractSerializer(),
+                                 get_fieldset(fields, expand))
+
+
+class TestFieldsetEndpoints(JWTAuthenticationTestCase):
+
+    def setUp(self):
+        cache.clear()
+        fragment_cache.clear()
+        user = UserFactory(is_staff=False)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+        self.contract = ContractFactory()
+
+    def get(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params, **self.headers)
+        sql = [query['sql'] for query in queries
+               if 'contracts_contract' in query['sql']]
+        return response, sql
+
+    def test_sparse_fields(self):
+        """
+        Should render only requested fields, selecting only their columns
+        """
+        response, sql = self.get(
+            '/api/contracts', {'fields': 'id,start_date,property.city'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['results'], [{
+            'id': self.contract.id,
+            'start_date': self.contract.start_date.isoformat(),
+            'property': {'city': self.contract.property.city}}])
+        page_query = sql[-1]
+        self.assertNotIn('description', page_query)
+        self.assertNotIn('accounts_tenant', page_query)
+        self.assertNotIn('accounts_landlord', page_query)
+
+    def test_sparse_fields_with_cursor(self):
+        """
+        Should load the ordering columns along with the requested fields,
+        paginating by cursor without queries for deferred columns
+        """
+        PropertyFactory(landlord=self.contract.property.landlord)
+        params = {'cursor': '', 'page_size': 1}
+        with CaptureQueriesContext(connection) as full:
+            response = self.client.get(
+                '/api/properties', params, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        params['fields'] = 'id'
+        with CaptureQueriesContext(connection) as sparse:
+            response = self.client.get(
+                '/api/properties', params, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data['results'][0]), ['id'])
+        self.assertLessEqual(len(sparse), len(full))
+
+    def test_collapsed_relations(self):
+        """Should render relations as ids without joining their tables"""
+        response, sql = self.get(
+            '/api/contracts/{}'.format(self.contract.id), {'expand': ''})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['property'], self.contract.property.id)
+        self.assertEqual(response.data['tenant'], self.contract.tenant.id)
+        self.assertNotIn('JOIN', sql[-1])
+
+    def test_expanded_relations(self):
+        """Should embed expanded relations only"""
+        response, sql = self.get(
+            '/api/contracts', {'expand': 'property.landlord'})
+        result = response.data['results'][0]
+        self.assertEqual(result['tenant'], self.contract.tenant.id)
+        self.assertEqual(result['property']['landlord']['id'],
+                         self.contract.property.landlord.id)
+        self.assertNotIn('accounts_tenant', sql[-1])
+
+    def test_invalid_fields(self):
+        """Should get 400 for unknown fields"""
+        response = self.client.get(
+            '/api/contracts', {'fields': 'id,price'}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'detail': 'Unknown field "price"'})
+
+    def test_sparse_fragments_kept_apart(self):
+        """
+        Should not reuse sparse representations for full ones, nor the
+        other way around
+        """
+        landlord = LandlordFactory(email='another@email.com')
+        url = '/api/landlords/{}'.format(landlord.id)
+        response = self.client.get(url, {'fields': 'email'}, **self.headers)
+        self.assertEqual(response.data, {'email': 'another@email.com'})
+        response = self.client.get(url, **self.headers)
+        self.assertEqual(list(response.data), ['id', 'name', 'email'])
@@ -0,0 +1,100 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework import status
+
+from core.fragments import FragmentCache, fragment_cache
+from core.tests import JWTAuthenticationTestCase
+from accounts.tests.factories import (UserFactory, LandlordFactory,
+                                      TenantFactory)
+from properties.tests.factories import PropertyFactory
+from contracts.tests.factories import ContractFactory
+
+
+class TestFragmentCache(TestCase):
+
+    def test_least_recently_used_evicted(self):
+        """
+        Should evict least recently used fragments once the memory cap is
+        exceeded
+        """
+        fragments = FragmentCache(max_bytes=40)
+        fragments.set('a', {'name': 'first'})
+        fragments.set('b', {'name': 'second'})
+        self.assertEqual(fragments.get('a'), {'name': 'first'})
+        fragments.set('c', {'name': 'third'})
+        self.assertIsNone(fragments.get('b'))
+        self.assertEqual(fragments.get('a'), {'name': 'first'})
+        stats = fragments.get_stats()
+        self.assertEqual(stats['hits'], 2)
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['evictions'], 1)
+        self.assertEqual(stats['fragments'], 2)
+        self.assertLessEqual(stats['bytes'], 40)
+
+    def test_oversized_fragment_not_stored(self):
+        """Should not store fragments bigger than the memory cap"""
+        fragments = FragmentCache(max_bytes=10)
+        fragments.set('a', {'name': 'too long to be stored'})
+        self.assertIsNone(fragments.get('a'))
+        self.assertEqual(fragments.get_stats()['bytes'], 0)
+
+
+class TestCachedFragments(JWTAuthenticationTestCase):
+
+    def setUp(self):
+        cache.clear()
+        fragment_cache.clear()
+        self.user = UserFactory(is_staff=True)
+        self.headers = self.get_jwt_header(self.user.username, 'password123!')
+        self.landlord = LandlordFactory(first_name='George',
+                                        last_name='Foreman')
+        for index in range(3):
+            PropertyFactory(landlord=self.landlord)
+
+    def test_embedded_landlord_serialized_once(self):
+        """
+        Should serialize the landlord of many properties once and reuse it
+        """
+        response = self.client.get('/api/properties', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        landlords = [item['landlord'] for item in response.data['results']]
+        self.assertEqual(landlords, [landlords[0]] * 3)
+        stats = fragment_cache.get_stats()
+        # each property misses, the landlord misses once and then hits
+        self.assertEqual(stats['misses'], 4)
+        self.assertEqual(stats['hits'], 2)
+
+    def test_changed_objects_serialized_again(self):
+        """
+        Should not reuse fragments of changed objects nor of objects
+        embedding them
+        """
+        contract = ContractFactory(
+            property=self.landlord.property_set.first(),
+            tenant=TenantFactory())
+        url = '/api/contracts/{}'.format(contract.id)
+        self.client.get(url, **self.headers)
+        self.landlord.first_name = 'Mike'
+        self.landlord.save()
+        response = self.client.get(url, **self.headers)
+        self.assertEqual(response.data['property']['landlord']['name'],
+                         'Mike Foreman')
+
+    def test_stats_endpoint(self):
+        """Should expose the fragment cache counters to staff users"""
+        self.client.get('/api/properties', **self.headers)
+        response = self.client.get(
+            '/api/stats/fragment-cache', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['hits'], 2)
+        self.assertIn('max_bytes', response.data)
+
+    def test_stats_endpoint_for_staff_only(self):
+        """Should refuse fragment cache counters to common users"""
+        user = UserFactory(is_staff=False)
+        headers = self.get_jwt_header(user.username, 'password123!')
+        response = self.client.get('/api/stats/fragment-cache', **headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,181 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import threading
+from datetime import timedelta
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+from freezegun import freeze_time
+from mock import patch
+from rest_framework import status
+
+from core.jobs import get_retry_delay, keep_leased, run_job
+from core.models import Job
+from core.tests import JWTAuthenticationTestCase
+from accounts.tests.factories import UserFactory
+
+calls = []
+
+
+def add(a, b):
+    calls.append((a, b))
+    return a + b
+
+
+def fail():
+    raise ValueError('Testing job')
+
+
+class TestJobQueue(TestCase):
+
+    def setUp(self):
+        del calls[:]
+
+    def test_claim_order(self):
+        """
+        Should claim due jobs by priority and then age, each one only once
+        """
+        low = Job.objects.enqueue(add, args=[1, 2])
+        high = Job.objects.enqueue('core.tests.test_jobs.add', args=[3, 4],
+                                   priority=5)
+        Job.objects.enqueue(add, args=[5, 6], delay=60)
+        self.assertEqual(Job.objects.claim('one'), [high])
+        self.assertEqual(Job.objects.claim('two', limit=5), [low])
+        self.assertEqual(Job.objects.claim('three'), [])
+        claimed = Job.objects.get(pk=low.pk)
+        self.assertEqual(claimed.status, Job.RUNNING)
+        self.assertEqual(claimed.worker, 'two')
+        self.assertEqual(claimed.attempts, 1)
+
+    def test_run_job(self):
+        """Should call the function of the job and store its result"""
+        job = Job.objects.enqueue(add, args=[1], kwargs={'b': 2})
+        self.assertTrue(run_job(Job.objects.claim('worker')[0]))
+        job = Job.objects.get(pk=job.pk)
+        self.assertEqual(calls, [(1, 2)])
+        self.assertEqual(job.status, Job.DONE)
+        self.assertEqual(job.get_result(), 3)
+        self.assertIsNotNone(job.finished_at)
+
+    def test_retries(self):
+        """
+        Should run failed jobs again after a growing delay until they run
+        out of attempts
+        """
+        job = Job.objects.enqueue(fail, max_attempts=2)
+        with freeze_time(timezone.now()) as frozen:
+            self.assertFalse(run_job(Job.objects.claim('worker')[0]))
+            job = Job.objects.get(pk=job.pk)
+            self.assertEqual(job.status, Job.QUEUED)
+            self.assertIn('ValueError: Testing job', job.last_error)
+            self.assertEqual(Job.objects.claim('worker'), [])
+            frozen.tick(timedelta(seconds=get_retry_delay(1)))
+            self.assertFalse(run_job(Job.objects.claim('worker')[0]))
+        job = Job.objects.get(pk=job.pk)
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    def test_retry_delay(self):
+        """Should double the delay after each failure, up to a maximum"""
+        with self.settings(JOB_RETRY_DELAY=10, JOB_MAX_RETRY_DELAY=100):
+            self.assertEqual([get_retry_delay(attempts)
+                              for attempts in range(1, 6)],
+                             [10, 20, 40, 80, 100])
+
+    def test_release_expired(self):
+        """
+        Should queue again the jobs of dead workers, failing the ones out of
+        attempts
+        """
+        retried = Job.objects.enqueue(add, args=[1, 2])
+        exhausted = Job.objects.enqueue(add, args=[1, 2], max_attempts=1)
+        Job.objects.claim('worker', lease=10, limit=2)
+        Job.objects.release_expired()
+        self.assertEqual(Job.objects.get(pk=retried.pk).status, Job.RUNNING)
+        with freeze_time(timezone.now() + timedelta(seconds=11)):
+            Job.objects.release_expired()
+        self.assertEqual(Job.objects.get(pk=retried.pk).status, Job.QUEUED)
+        self.assertEqual(Job.objects.get(pk=exhausted.pk).status, Job.FAILED)
+
+    def test_renew_lease(self):
+        """
+        Should extend the lease of running jobs, unless they were claimed
+        again meanwhile
+        """
+        job = Job.objects.enqueue(add, args=[1, 2])
+        job = Job.objects.claim('worker', lease=10)[0]
+        with freeze_time(timezone.now() + timedelta(seconds=8)):
+            self.assertTrue(Job.objects.renew_lease(job, lease=10))
+        with freeze_time(timezone.now() + timedelta(seconds=15)):
+            Job.objects.release_expired()
+            self.assertEqual(Job.objects.get(pk=job.pk).status, Job.RUNNING)
+        with freeze_time(timezone.now() + timedelta(seconds=19)):
+            Job.objects.release_expired()
+            Job.objects.claim('other')
+        self.assertFalse(Job.objects.renew_lease(job, lease=10))
+
+    def test_keep_leased(self):
+        """Should renew the lease of a job while it runs"""
+        job = Job.objects.enqueue(add, args=[1, 2])
+        renewed = threading.Event()
+        with patch.object(Job.objects, 'renew_lease',
+                          side_effect=lambda *args: renewed.set()) as renew:
+            with keep_leased(job, lease=0.03):
+                renewed.wait(1)
+        renew.assert_called_with(job, 0.03)
+
+    def test_run_workers(self):
+        """Should run every due job and exit with burst"""
+        for number in range(3):
+            Job.objects.enqueue(add, args=[number, 1])
+        Job.objects.enqueue(fail, max_attempts=1)
+        output = StringIO()
+        call_command('run_workers', burst=True, stdout=output)
+        self.assertEqual(output.getvalue(), '4 jobs processed\n')
+        self.assertEqual(sorted(calls), [(0, 1), (1, 1), (2, 1)])
+        self.assertEqual(Job.objects.filter(status=Job.DONE).count(), 3)
+        self.assertEqual(Job.objects.filter(status=Job.FAILED).count(), 1)
+
+
+class TestJobEndpoint(JWTAuthenticationTestCase):
+
+    def test_retrieve_job(self):
+        """Should report the status and result of a job"""
+        user = UserFactory(is_staff=False)
+        headers = self.get_jwt_header(user.username, 'password123!')
+        job = Job.objects.enqueue(add, args=[1, 2], user=user)
+        run_job(Job.objects.claim('worker')[0])
+        response = self.client.get('/api/jobs/{}'.format(job.id), **headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['status'], Job.DONE)
+        self.assertEqual(response.data['result'], 3)
+        response = self.client.get('/api/jobs/{}'.format(job.id + 1),
+                                   **headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_jobs_of_other_users_hidden(self):
+        """
+        Should not report jobs queued by other users to common users, nor
+        the errors of their own jobs
+        """
+        user = UserFactory(is_staff=False)
+        headers = self.get_jwt_header(user.username, 'password123!')
+        other = Job.objects.enqueue(add, args=[1, 2])
+        response = self.client.get('/api/jobs/{}'.format(other.id),
+                                   **headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+        job = Job.objects.enqueue(fail, max_attempts=1, priority=1,
+                                  user=user)
+        run_job(Job.objects.claim('worker')[0])
+        response = self.client.get('/api/jobs/{}'.format(job.id), **headers)
+        self.assertEqual(response.data['status'], Job.FAILED)
+        self.assertEqual(response.data['last_error'], 'The job failed')
+
+        staff = UserFactory(is_staff=True)
+        headers = self.get_jwt_header(staff.username, 'password123!')
+        response = self.client.get('/api/jobs/{}'.format(job.id), **headers)
+        self.assertIn('ValueError: Testing job', response.data['last_error'])
@@ -0,0 +1,129 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+import json
+import os
+import shutil
+import subprocess
+import tempfile
+
+from django.test import TestCase, override_settings
+from rest_framework import status
+
+from core.metrics import RequestMetrics, request_metrics
+from core.tests import JWTAuthenticationTestCase
+from accounts.tests.factories import UserFactory, LandlordFactory
+
+
+class TestRequestMetrics(TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_render_histograms(self):
+        """Should render cumulative buckets, sum and count of each series"""
+        metrics = RequestMetrics(self.directory)
+        metrics.observe('v1:landlords-list', 'GET',
+                        {'api_request_queries': 3})
+        metrics.observe('v1:landlords-list', 'GET',
+                        {'api_request_queries': 30})
+        output = metrics.render()
+        labels = 'route="v1:landlords-list",method="GET"'
+        self.assertIn('# TYPE api_request_queries histogram', output)
+        self.assertIn('api_request_queries_bucket{{{},le="2.0"}} 0'.format(
+            labels), output)
+        self.assertIn('api_request_queries_bucket{{{},le="5.0"}} 1'.format(
+            labels), output)
+        self.assertIn('api_request_queries_bucket{{{},le="50.0"}} 2'.format(
+            labels), output)
+        self.assertIn('api_request_queries_bucket{{{},le="+Inf"}} 2'.format(
+            labels), output)
+        self.assertIn('api_request_queries_sum{{{}}} 33.0'.format(labels),
+                      output)
+        self.assertIn('api_request_queries_count{{{}}} 2'.format(labels),
+                      output)
+
+    def test_processes_summed(self):
+        """Should sum the histograms written by every process"""
+        metrics = RequestMetrics(self.directory)
+        metrics.observe('v1:landlords-list', 'GET',
+                        {'api_request_queries': 3})
+        self.write_process_file(os.getppid())
+        series = metrics.collect()[
+            ('api_request_queries', 'v1:landlords-list', 'GET')]
+        self.assertEqual(series, [0, 0, 2, 2, 2, 2, 2, 7, 2])
+
+    def test_dead_processes_archived(self):
+        """
+        Should move the histograms of processes which exited to the archive,
+        keeping them in the sums
+        """
+        metrics = RequestMetrics(self.directory)
+        metrics.observe('v1:landlords-list', 'GET',
+                        {'api_request_queries': 3})
+        process = subprocess.Popen(['true'])
+        process.wait()
+        path = self.write_process_file(process.pid)
+        for attempt in range(2):
+            series = metrics.collect()[
+                ('api_request_queries', 'v1:landlords-list', 'GET')]
+            self.assertEqual(series, [0, 0, 2, 2, 2, 2, 2, 7, 2])
+        self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(
+            os.path.join(self.directory, 'archive.json')))
+
+    def write_process_file(self, pid):
+        """Writes the histograms of another process, returning its path"""
+        rows = [['api_request_queries', 'v1:landlords-list', 'GET',
+                 0, 0, 1, 1, 1, 1, 1, 4, 1]]
+        path = os.path.join(self.directory, 'metrics-{}-1.json'.format(pid))
+        with open(path, 'w') as output:
+            json.dump(rows, output)
+        return path
+
+
+class TestMetricsMiddleware(JWTAuthenticationTestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        override = override_settings(METRICS_DIR=self.directory)
+        override.enable()
+        self.addCleanup(override.disable)
+        request_metrics.series.clear()
+        user = UserFactory(is_staff=True)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+
+    def test_server_timing_header(self):
+        """Should echo the timings of the request in a header"""
+        LandlordFactory()
+        response = self.client.get('/api/landlords', **self.headers)
+        timing = response['Server-Timing']
+        self.assertTrue(timing.startswith('total;dur='))
+        self.assertIn('db;dur=', timing)
+        self.assertIn('serializer;dur=', timing)
+
+    def test_metrics_endpoint(self):
+        """Should expose the request histograms to staff users"""
+        self.client.get('/api/landlords', **self.headers)
+        response = self.client.get('/metrics', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        content = response.content.decode('utf-8')
+        labels = 'route="v1:landlords-list",method="GET"'
+        for name in ('api_request_duration_seconds',
+                     'api_request_db_duration_seconds',
+                     'api_request_queries',
+                     'api_request_serializer_duration_seconds',
+                     'api_response_size_bytes'):
+            self.assertIn('{}_count{{{}}} 1'.format(name, labels), content)
+        self.assertTrue(os.listdir(self.directory))
+        self.assertEqual(request_metrics.get_directory(), self.directory)
+
+    def test_metrics_endpoint_for_staff_only(self):
+        """Should refuse the request histograms to common users"""
+        user = UserFactory(is_staff=False)
+        headers = self.get_jwt_header(user.username, 'password123!')
+        response = self.client.get('/metrics', **headers)
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
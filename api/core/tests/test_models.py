@@ -3,9 +3,11 @@ from __future__ import unicode_literals
 
 import string
 
-from django.test import TestCase
+from django.test import TestCase, override_settings
+from freezegun import freeze_time
 
-from core.models import get_hash_id
+from core.models import get_hash_id, get_sortable_hash_id
+from core.validators import validate_hash_id
 
 
 class TestHashId(TestCase):
@@ -24,3 +26,35 @@ class TestHashId(TestCase):
         self.assertEqual(len(hash_id), 9)
         for char in hash_id:
             self.assertIn(char, self.valid_chars)
+
+    @override_settings(HASH_ID_MODE='random')
+    def test_get_random_hash_id(self):
+        """Should successfully get random hash id in random mode"""
+        hash_id = get_hash_id()
+        self.assertEqual(len(hash_id), 16)
+        self.assertIsNone(validate_hash_id(hash_id))
+
+    @override_settings(HASH_ID_MODE='sortable')
+    def test_get_sortable_hash_id(self):
+        """
+        Should successfully get valid hash ids sorted by generation time in
+        sortable mode
+        """
+        with freeze_time('2017-09-24 10:00:00'):
+            first = get_hash_id()
+        with freeze_time('2017-09-24 10:00:01'):
+            second = get_hash_id()
+        with freeze_time('2031-01-01 00:00:00'):
+            third = get_hash_id()
+        self.assertIsNone(validate_hash_id(first))
+        self.assertLess(first, second)
+        self.assertLess(second, third)
+
+    def test_sortable_hash_id_random_suffix(self):
+        """
+        Should get different sortable hash ids generated at the same time
+        """
+        with freeze_time('2017-09-24 10:00:00'):
+            hash_ids = set(get_sortable_hash_id() for x in range(100))
+        self.assertEqual(len(hash_ids), 100)
+        self.assertEqual(len(set(hash_id[:8] for hash_id in hash_ids)), 1)
@@ -0,0 +1,88 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.core.cache import cache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+
+from core.tests import JWTAuthenticationTestCase
+from accounts.tests.factories import (UserFactory, LandlordFactory,
+                                      TenantFactory)
+from properties.tests.factories import PropertyFactory
+from contracts.tests.factories import ContractFactory
+
+
+class TestMultiGet(JWTAuthenticationTestCase):
+
+    def setUp(self):
+        cache.clear()
+        user = UserFactory(is_staff=False)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+        self.contracts = [
+            ContractFactory(
+                property=PropertyFactory(landlord=LandlordFactory(
+                    email='landlord{}@email.com'.format(index))),
+                tenant=TenantFactory(email='tenant{}@email.com'.format(index)))
+            for index in range(6)]
+
+    def get_ids(self, *indexes):
+        return [self.contracts[index].id for index in indexes]
+
+    def test_get_ids(self):
+        """
+        Should return the objects in the requested order, leaving out
+        unknown and repeated ids
+        """
+        ids = self.get_ids(4, 1, 3) + ['unknown'] + self.get_ids(1)
+        response = self.client.get(
+            '/api/contracts', {'ids': ','.join(ids)}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data],
+                         self.get_ids(4, 1, 3))
+        self.assertEqual(response.data[0]['property']['landlord']['email'],
+                         'landlord4@email.com')
+
+    def test_queries_independent_of_ids(self):
+        """Should load any number of nested objects with one query"""
+        counts = []
+        for indexes in ((0,), (0, 1, 2, 3, 4, 5)):
+            cache.clear()
+            ids = ','.join(self.get_ids(*indexes))
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(
+                    '/api/contracts', {'ids': ids}, **self.headers)
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_post_ids(self):
+        """Should return the objects of the ids of a POST"""
+        properties = [contract.property for contract in self.contracts]
+        response = self.client.post(
+            '/api/properties/multi-get',
+            {'ids': [properties[2].id, properties[0].id]},
+            format='json', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data],
+                         [properties[2].id, properties[0].id])
+        self.assertIn('landlord', response.data[0])
+
+    def test_invalid_post(self):
+        """Should get 400 when ids are not a list"""
+        response = self.client.post(
+            '/api/tenants/multi-get', {'ids': 'abc'}, format='json',
+            **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {
+            'detail': 'Expected a list of ids in the ids field'})
+
+    @override_settings(MULTI_GET_MAX_IDS=2)
+    def test_too_many_ids(self):
+        """Should get 400 when more ids than allowed are requested"""
+        response = self.client.get(
+            '/api/contracts', {'ids': ','.join(self.get_ids(0, 1, 2))},
+            **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {
+            'detail': 'At most 2 ids can be requested at once'})
@@ -0,0 +1,149 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from urlparse import urlparse, parse_qs
+
+from django.test import TestCase
+from rest_framework import status
+
+from core.querysets import seek
+from core.tests import JWTAuthenticationTestCase
+from accounts.models import Landlord
+from accounts.tests.factories import UserFactory, LandlordFactory
+from properties.tests.factories import PropertyFactory
+from contracts.tests.factories import ContractFactory
+
+
+class TestCursorPagination(JWTAuthenticationTestCase):
+
+    def setUp(self):
+        user = UserFactory(is_staff=True)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+        self.landlords = [
+            LandlordFactory(first_name='Name{}'.format(index),
+                            last_name='Same',
+                            email='landlord{}@email.com'.format(index))
+            for index in range(5)]
+
+    def get_ids(self, response):
+        return [item['id'] for item in response.data['results']]
+
+    def test_first_page(self):
+        """
+        Should list the first page without counting results when an empty
+        cursor is given
+        """
+        response = self.client.get(
+            '/api/landlords', {'cursor': '', 'page_size': 2}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data.keys()),
+                         ['next', 'previous', 'results'])
+        self.assertEqual(self.get_ids(response),
+                         [landlord.id for landlord in self.landlords[:2]])
+        self.assertIsNone(response.data['previous'])
+        self.assertIn('cursor=', response.data['next'])
+
+    def test_follow_next_and_previous_links(self):
+        """
+        Should walk through all the results following next links and back
+        following previous links
+        """
+        response = self.client.get(
+            '/api/landlords', {'cursor': '', 'page_size': 2}, **self.headers)
+        ids = self.get_ids(response)
+        pages = [response]
+        while response.data['next']:
+            response = self.client.get(response.data['next'], **self.headers)
+            ids += self.get_ids(response)
+            pages.append(response)
+        self.assertEqual(ids, [landlord.id for landlord in self.landlords])
+        self.assertEqual(len(pages), 3)
+
+        response = self.client.get(
+            pages[-1].data['previous'], **self.headers)
+        self.assertEqual(self.get_ids(response), self.get_ids(pages[1]))
+        self.assertIsNotNone(response.data['next'])
+
+    def test_pages_stable_under_inserts(self):
+        """
+        Should not repeat nor skip results when rows are inserted before the
+        current position
+        """
+        response = self.client.get(
+            '/api/landlords', {'cursor': '', 'page_size': 2}, **self.headers)
+        LandlordFactory(first_name='Aaron', last_name='Same',
+                        email='aaron@email.com')
+        response = self.client.get(response.data['next'], **self.headers)
+        self.assertEqual(self.get_ids(response),
+                         [landlord.id for landlord in self.landlords[2:4]])
+
+    def test_ties_broken_by_id(self):
+        """
+        Should not skip rows sharing the same values for ordering fields
+        """
+        properties = [PropertyFactory(
+            landlord=self.landlords[index], city='London', zip_code='NW16XE',
+            street='Baker Street') for index in range(3)]
+        response = self.client.get(
+            '/api/properties', {'cursor': '', 'page_size': 1},
+            **self.headers)
+        ids = self.get_ids(response)
+        while response.data['next']:
+            response = self.client.get(response.data['next'], **self.headers)
+            ids += self.get_ids(response)
+        self.assertEqual(ids, sorted(item.id for item in properties))
+
+    def test_descending_datetime_ordering(self):
+        """
+        Should walk through contracts ordered by descending creation time
+        """
+        contracts = [ContractFactory(
+            property=PropertyFactory(landlord=landlord),
+            tenant__email='tenant{}@email.com'.format(index))
+            for index, landlord in enumerate(self.landlords)]
+        response = self.client.get(
+            '/api/contracts', {'cursor': '', 'page_size': 2},
+            **self.headers)
+        ids = self.get_ids(response)
+        while response.data['next']:
+            response = self.client.get(response.data['next'], **self.headers)
+            ids += self.get_ids(response)
+        self.assertEqual(ids, [contract.id for contract in contracts[::-1]])
+
+    def test_tampered_cursor(self):
+        """Should get 400 when cursor was not generated by the api"""
+        response = self.client.get(
+            '/api/landlords', {'cursor': 'tampered:cursor'}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'detail': 'Invalid cursor'})
+
+    def test_cursor_from_other_ordering(self):
+        """
+        Should get 400 when cursor was generated for an endpoint with a
+        different ordering
+        """
+        PropertyFactory(landlord=self.landlords[0])
+        PropertyFactory(landlord=self.landlords[1])
+        response = self.client.get(
+            '/api/properties', {'cursor': '', 'page_size': 1},
+            **self.headers)
+        cursor = parse_qs(urlparse(response.data['next']).query)['cursor'][0]
+        response = self.client.get(
+            '/api/landlords', {'cursor': cursor}, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TestSeek(TestCase):
+
+    def test_first_column_bounded(self):
+        """
+        Should bound the first column of the ordering on its own, so its
+        index is searched rather than walked from the start
+        """
+        queryset = Landlord.objects.order_by('first_name', 'last_name', 'id')
+        sql = str(seek(queryset, ['first_name', 'last_name', 'id'],
+                       ['Name1', 'Same', 'aryh149jfl0pol1r']).query)
+        self.assertIn('"first_name" >= Name1 AND', sql)
+        sql = str(seek(queryset, ['-first_name', 'id'],
+                       ['Name1', 'aryh149jfl0pol1r']).query)
+        self.assertIn('"first_name" <= Name1 AND', sql)
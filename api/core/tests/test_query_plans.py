@@ -0,0 +1,112 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from StringIO import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+
+from core.api import router
+from core.query_plans import (get_query_plan_cases, explain,
+                              find_plan_problems)
+from accounts.tests.factories import LandlordFactory, TenantFactory
+from properties.tests.factories import PropertyFactory
+from contracts.tests.factories import ContractFactory
+
+
+class TestQueryPlans(TestCase):
+    """
+    Fails whenever a filter or ordering of a list endpoint makes the
+    database read a whole table or sort all its rows
+    """
+
+    def setUp(self):
+        for index in range(3):
+            ContractFactory(
+                property=PropertyFactory(landlord=LandlordFactory(
+                    first_name='John', last_name='Doe',
+                    email='landlord{}@email.com'.format(index))),
+                tenant=TenantFactory(
+                    first_name='John', last_name='Doe',
+                    email='tenant{}@email.com'.format(index)))
+
+    def test_every_list_query_uses_indexes(self):
+        """Should read every list query through indexes without sorting"""
+        cases = get_query_plan_cases(router.registry, connection.vendor)
+        failures = []
+        for case in cases:
+            problems = find_plan_problems(
+                explain(case.queryset), connection.vendor, case.allow_sort,
+                case.allow_index_scan)
+            if problems:
+                failures.append('{}: {}'.format(case.name, problems))
+        self.assertEqual(failures, [])
+
+    def test_cases_cover_filters(self):
+        """
+        Should check every filter combination of every list action, with
+        page and cursor pagination
+        """
+        names = set(case.name for case in get_query_plan_cases(
+            router.registry, connection.vendor))
+        self.assertIn('landlords list page', names)
+        self.assertIn('tenants list search=john do cursor', names)
+        self.assertIn('properties list zipcode=NW16XE cursor', names)
+        self.assertIn('properties available beds=2 category=house page',
+                      names)
+        self.assertIn('contracts list end_date=2017-12-31 '
+                      'start_date=2017-01-01 cursor', names)
+
+    def test_find_plan_problems(self):
+        """
+        Should report full table and index scans and sorts of MySQL and
+        SQLite plans
+        """
+        plan = [{'table': 'properties_property', 'type': 'ALL',
+                 'Extra': 'Using where; Using filesort'},
+                {'table': 'accounts_tenant', 'type': 'index', 'Extra': None},
+                {'table': '<subquery2>', 'type': 'ALL', 'Extra': None}]
+        self.assertEqual(find_plan_problems(plan, 'mysql'), [
+            'full scan of properties_property',
+            'filesort on properties_property',
+            'full index scan of accounts_tenant'])
+        self.assertEqual(
+            find_plan_problems(plan, 'mysql', allow_index_scan=True), [
+                'full scan of properties_property',
+                'filesort on properties_property'])
+        plan = [{'detail': 'SCAN accounts_tenant'},
+                {'detail': 'SCAN accounts_tenant USING INDEX tenant_name_idx'},
+                {'detail': 'SEARCH accounts_tenant USING INDEX '
+                           'tenant_name_idx (first_name>?)'},
+                {'detail': 'USE TEMP B-TREE FOR ORDER BY'}]
+        self.assertEqual(find_plan_problems(plan, 'sqlite'), [
+            'full scan: SCAN accounts_tenant',
+            'full index scan: SCAN accounts_tenant USING INDEX '
+            'tenant_name_idx',
+            'sort: USE TEMP B-TREE FOR ORDER BY'])
+        self.assertEqual(
+            find_plan_problems(plan, 'sqlite', allow_sort=True,
+                               allow_index_scan=True),
+            ['full scan: SCAN accounts_tenant'])
+
+    def test_index_scans_allowed(self):
+        """
+        Should only let unfiltered pages and the filters declared as
+        scanned walk the ordering index
+        """
+        cases = dict((case.name, case) for case in get_query_plan_cases(
+            router.registry, connection.vendor))
+        self.assertTrue(cases['landlords list page'].allow_index_scan)
+        self.assertTrue(
+            cases['properties list city=London page'].allow_index_scan)
+        self.assertFalse(cases['properties list city=London zipcode=NW16XE '
+                               'page'].allow_index_scan)
+        self.assertFalse(cases['contracts list tenant_id=aryh149jfl0pol1r '
+                               'cursor'].allow_index_scan)
+
+    def test_call_command(self):
+        """Should report the number of checked list queries"""
+        output = StringIO()
+        call_command('check_query_plans', stdout=output)
+        self.assertIn('list queries checked', output.getvalue())
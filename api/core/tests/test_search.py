@@ -0,0 +1,102 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+
+from core.models import SearchToken
+from core.search import normalize_words, get_search_tokens, get_search_terms
+from accounts.models import Landlord, Tenant
+from accounts.tests.factories import LandlordFactory, TenantFactory
+
+
+class TestSearchTokens(TestCase):
+
+    def test_normalize_words(self):
+        """Should lowercase words and drop accents and punctuation"""
+        self.assertEqual(normalize_words("Zoë O'Brien-Müller"),
+                         ['zoe', 'obrien', 'muller'])
+        self.assertEqual(normalize_words('  '), [])
+        self.assertEqual(normalize_words(None), [])
+
+    def test_get_search_tokens(self):
+        """Should weigh whole words more than their prefixes"""
+        tokens = get_search_tokens('Ann', 'Annabel')
+        self.assertEqual(tokens, {
+            'a': 1, 'an': 1, 'ann': 3, 'anna': 1, 'annab': 1,
+            'annabe': 1, 'annabel': 3})
+
+    def test_get_search_terms(self):
+        """Should keep distinct terms up to the maximum number of terms"""
+        self.assertEqual(get_search_terms('Jo jo DOE'), ['jo', 'doe'])
+        self.assertEqual(len(get_search_terms('a b c d e f g')), 5)
+
+
+class TestSearchQuerySet(TestCase):
+
+    def setUp(self):
+        self.john = LandlordFactory(first_name='John', last_name='Doe',
+                                    email='john@email.com')
+        self.johanna = LandlordFactory(first_name='Johanna',
+                                       last_name='Döring',
+                                       email='johanna@email.com')
+        self.zoe = LandlordFactory(first_name='Zoë', last_name='Johnson',
+                                   email='zoe@email.com')
+
+    def search(self, query):
+        return list(Landlord.objects.order_by(
+            'first_name', 'last_name').search(query))
+
+    def test_tokens_maintained_on_save(self):
+        """Should replace tokens when names change"""
+        self.john.last_name = 'Smith'
+        self.john.save()
+        tokens = set(SearchToken.objects.filter(
+            object_id=self.john.id).values_list('token', flat=True))
+        self.assertIn('smith', tokens)
+        self.assertNotIn('doe', tokens)
+        self.assertEqual(self.search('doe'), [])
+
+    def test_tokens_removed_on_delete(self):
+        """Should delete tokens of deleted objects"""
+        self.john.delete()
+        self.assertFalse(SearchToken.objects.filter(
+            object_id=self.john.id).exists())
+
+    def test_prefix_search(self):
+        """
+        Should find objects with a word starting with the term, ranking
+        whole word matches first
+        """
+        self.assertEqual(self.search('joh'),
+                         [self.johanna, self.john, self.zoe])
+        self.assertEqual(self.search('john'), [self.john, self.zoe])
+
+    def test_every_term_matches(self):
+        """Should only find objects matching every term of the query"""
+        self.assertEqual(self.search('john doe'), [self.john])
+        self.assertEqual(self.search('do jo'), [self.johanna, self.john])
+        self.assertEqual(self.search('john smith'), [])
+
+    def test_accents_ignored(self):
+        """Should match names regardless of case and accents"""
+        self.assertEqual(self.search('ZOE'), [self.zoe])
+        self.assertEqual(self.search('zoë johnson'), [self.zoe])
+
+    def test_query_without_words(self):
+        """Should find nothing for queries without words"""
+        self.assertEqual(self.search(' - '), [])
+
+    def test_kinds_kept_apart(self):
+        """Should not find tenants when searching landlords"""
+        TenantFactory(first_name='John', last_name='Doe',
+                      email='john@email.com')
+        self.assertEqual(self.search('john doe'), [self.john])
+        self.assertEqual(len(Tenant.objects.search('john doe')), 1)
+
+    def test_single_query(self):
+        """Should search with one query whatever the number of terms"""
+        with CaptureQueriesContext(connection) as queries:
+            self.search('jo do')
+        self.assertEqual(len(queries), 1)
@@ -0,0 +1,63 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from mock import patch
+from rest_framework import status
+from rest_framework.renderers import JSONRenderer
+
+from core.tests import JWTAuthenticationTestCase
+from accounts.tests.factories import UserFactory, LandlordFactory
+from properties.tests.factories import PropertyFactory
+from properties.serializers import PropertySerializer
+from properties.models import Property
+from properties.views import PropertyView
+
+
+class TestStreamingList(JWTAuthenticationTestCase):
+
+    def setUp(self):
+        user = UserFactory(is_staff=True)
+        self.headers = self.get_jwt_header(user.username, 'password123!')
+        for index in range(5):
+            PropertyFactory(
+                landlord=LandlordFactory(
+                    email='landlord{}@email.com'.format(index)),
+                description='Fantastic rent price   near the m\xe9tro')
+
+    def get_expected_content(self):
+        queryset = Property.objects.all().order_by(
+            'city', 'zip_code', 'street', 'id')
+        data = PropertySerializer(queryset, many=True).data
+        return JSONRenderer().render(data)
+
+    def test_streamed_content_identical_to_rendered(self):
+        """
+        Should stream unpaginated results chunk by chunk with the same bytes
+        as rendering the whole list at once
+        """
+        with patch.object(PropertyView, 'stream_chunk_size', 2):
+            response = self.client.get(
+                '/api/properties', {'page_size': 'none'}, **self.headers)
+            content = b''.join(response.streaming_content)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(content, self.get_expected_content())
+
+    def test_streamed_empty_list(self):
+        """Should stream an empty JSON array when there are no results"""
+        response = self.client.get(
+            '/api/properties', {'page_size': 'none', 'city': 'Nowhere'},
+            **self.headers)
+        self.assertEqual(b''.join(response.streaming_content), b'[]')
+
+    def test_indented_response_not_streamed(self):
+        """
+        Should render the whole list at once when indented JSON is requested
+        """
+        response = self.client.get(
+            '/api/properties', {'page_size': 'none'},
+            HTTP_ACCEPT='application/json; indent=4', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.streaming)
+        self.assertEqual(len(response.data), 5)
@@ -0,0 +1,24 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.test import TestCase
+
+from core.versions import bump_versions, get_version, get_versions
+
+
+class TestVersions(TestCase):
+
+    def test_get_unknown_version(self):
+        """Should get empty token for keys which never changed"""
+        self.assertEqual(get_version('unknown'), '')
+
+    def test_bump_versions(self):
+        """Should replace tokens of bumped keys only"""
+        bump_versions('first', 'second')
+        first, second = get_versions('first', 'second')
+        self.assertEqual(len(first), 16)
+        self.assertNotEqual(first, second)
+
+        bump_versions('first')
+        self.assertNotEqual(get_version('first'), first)
+        self.assertEqual(get_version('second'), second)
@@ -2,8 +2,12 @@
 from __future__ import unicode_literals
 
 import string
+from collections import Hashable
 
 from django.core.exceptions import ValidationError
+from django.utils import six
+
+from core.exception_handlers import parse_error_messages
 
 
 def validate_hash_id(value):
@@ -15,3 +19,78 @@ def validate_hash_id(value):
     if not set(value).issubset(valid_chars) or len(value) != 16:
         raise ValidationError('ID must be a string containing 16 '
                               'alphanumeric lowercase characters')
+
+
+def is_scalar(value):
+    """Tells whether value may be looked up in the database"""
+    return isinstance(value, six.string_types + six.integer_types + (float,))
+
+
+def normalize_unique_value(value):
+    """
+    Returns value as compared by the unique indexes of the database, whose
+    collation ignores case
+    """
+    if isinstance(value, six.string_types):
+        return value.lower()
+    return value
+
+
+def find_missing_foreign_keys(model, instances, names, errors):
+    """
+    Adds to errors, a dict mapping indexes of instances to messages, the
+    instances whose foreign keys in names are empty or point to no row,
+    checking each foreign key with one query for the whole batch
+    """
+    for name in names:
+        field = model._meta.get_field(name)
+        ids = set(getattr(instance, field.attname)
+                  for index, instance in enumerate(instances)
+                  if index not in errors and
+                  is_scalar(getattr(instance, field.attname)))
+        existing = set(field.related_model._default_manager.filter(
+            pk__in=ids).values_list('pk', flat=True))
+        for index, instance in enumerate(instances):
+            if index in errors:
+                continue
+            value = getattr(instance, field.attname)
+            if not value:
+                errors[index] = ('Missing {0} parameter containing {0} '
+                                 'id'.format(name))
+            elif not is_scalar(value) or value not in existing:
+                errors[index] = '{} with id "{}" does not exist'.format(
+                    field.related_model.__name__, value)
+    return errors
+
+
+def find_duplicate_values(model, instances, errors):
+    """
+    Adds to errors the instances whose unique fields have values taken by
+    existing rows or by a previous instance of the batch, checking each
+    unique field with one query
+    """
+    for field in model._meta.fields:
+        if not field.unique or field.primary_key:
+            continue
+        # values failing validation may not even be hashable
+        values = dict(
+            (index, getattr(instance, field.attname))
+            for index, instance in enumerate(instances)
+            if index not in errors and
+            isinstance(getattr(instance, field.attname), Hashable))
+        taken = set(
+            normalize_unique_value(value) for value in
+            model._default_manager.filter(**{
+                '{}__in'.format(field.name): set(values.values())
+            }).values_list(field.attname, flat=True))
+        for index, instance in enumerate(instances):
+            if index not in values:
+                continue
+            value = normalize_unique_value(values[index])
+            if value in taken:
+                error = instance.unique_error_message(model, (field.name,))
+                errors[index] = parse_error_messages(
+                    {field.name: error.messages})
+            # later duplicates within the batch are also rejected
+            taken.add(value)
+    return errors
@@ -0,0 +1,39 @@
+# -*- encoding: UTF-8 -*-
+from __future__ import unicode_literals
+
+from django.db import IntegrityError, transaction
+
+from core.models import DataVersion, get_random_hash_id
+
+
+def get_versions(*keys):
+    """
+    Returns the current version tokens for given keys, in the same order,
+    with one query. Keys which never changed have an empty token.
+    """
+    tokens = dict(DataVersion.objects.filter(
+        key__in=keys).values_list('key', 'token'))
+    return [tokens.get(key, '') for key in keys]
+
+
+def get_version(key):
+    """Returns the current version token for given key"""
+    return get_versions(key)[0]
+
+
+def bump_versions(*keys):
+    """
+    Replaces the version tokens of given keys by new random ones. Random
+    tokens, unlike counters, never repeat a value after a rolled back
+    transaction.
+    """
+    for key in keys:
+        token = get_random_hash_id()
+        if DataVersion.objects.filter(key=key).update(token=token):
+            continue
+        try:
+            with transaction.atomic():
+                DataVersion.objects.create(key=key, token=token)
+        except IntegrityError:
+            # another process created the key meanwhile
+            DataVersion.objects.filter(key=key).update(token=token)
@@ -1,2 +1,695 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
+
+import hashlib
+import json
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.core.urlresolvers import Resolver404, resolve
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import six
+from django.utils.encoding import force_text
+from rest_framework import status
+from rest_framework.decorators import list_route
+from rest_framework.generics import RetrieveAPIView
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.renderers import JSONRenderer
+from rest_framework.response import Response
+from rest_framework.serializers import ListSerializer
+from rest_framework.settings import api_settings
+from rest_framework.views import APIView
+
+from core.batch import build_sub_request, resolve_references
+from core.eager_loading import get_eager_loading_plan
+from core.exceptions import Api400, Api412
+from core.exception_handlers import parse_error_messages
+from core.fieldsets import DEFAULT_FIELDSET, get_fieldset, prune_serializer
+from core.fragments import fragment_cache
+from core.metrics import request_metrics, time_serializer
+from core.models import Job
+from core.parsers import CSVParser, NDJSONParser
+from core.renderers import CSVRenderer, NDJSONRenderer
+from core.serializers import JobSerializer
+from core.querysets import get_keyset_ordering, iterate_in_chunks
+from core.signals import post_bulk_create
+from core.validators import find_duplicate_values, find_missing_foreign_keys
+from core.versions import get_versions
+
+# bulk payloads may also be sent as CSV or newline delimited JSON
+BULK_PARSER_CLASSES = list(api_settings.DEFAULT_PARSER_CLASSES) + [
+    CSVParser, NDJSONParser]
+# the first one is used when no format is requested
+EXPORT_RENDERER_CLASSES = [CSVRenderer, NDJSONRenderer]
+
+
+class EagerLoadingMixin(object):
+    """
+    Applies to the viewset queryset the eager loading plan derived from the
+    serializer used for reading, so rendering a page costs a fixed number of
+    queries.
+
+    Reading actions accept the fields and expand query params, which prune
+    the serializer and therefore the columns and joins of the plan.
+    """
+    eager_loading_actions = ('list', 'retrieve')
+
+    def get_fieldset(self):
+        """Returns the fieldset requested for the current action"""
+        if self.action not in self.eager_loading_actions:
+            return DEFAULT_FIELDSET
+        params = self.request.query_params
+        return get_fieldset(params.get('fields'), params.get('expand'))
+
+    def get_queryset(self):
+        queryset = super(EagerLoadingMixin, self).get_queryset()
+        if self.action in self.eager_loading_actions:
+            plan = get_eager_loading_plan(
+                self.get_serializer_class(), self.get_fieldset())
+            queryset = plan.apply(queryset)
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super(EagerLoadingMixin, self).get_serializer(
+            *args, **kwargs)
+        fieldset = self.get_fieldset()
+        if fieldset != DEFAULT_FIELDSET:
+            if isinstance(serializer, ListSerializer):
+                prune_serializer(serializer.child, fieldset)
+            else:
+                prune_serializer(serializer, fieldset)
+        return time_serializer(serializer)
+
+
+class CachedResponseMixin(object):
+    """
+    Caches the data of list and retrieve responses, keyed by the query
+    parameters, the kind of user and the version tokens of every model
+    rendered by the serializer. Saving or deleting any of those rows bumps
+    its model version, so cached responses are never served stale.
+    """
+    cache_actions = ('list', 'retrieve')
+    cache_alias = 'default'
+    cache_timeout = 300
+    # labels of models read by filters but not rendered by the serializer
+    cache_dependencies = ()
+
+    def get_cache_dependencies(self):
+        plan = get_eager_loading_plan(self.get_serializer_class())
+        dependencies = set(plan.models)
+        dependencies.update(self.cache_dependencies)
+        return sorted(dependencies)
+
+    def get_request_digest(self, request):
+        """
+        Returns a digest of everything the response to request depends on,
+        computed once per request
+        """
+        digest = getattr(self, '_request_digest', None)
+        if digest is None:
+            dependencies = self.get_cache_dependencies()
+            params = sorted(
+                (key, sorted(request.query_params.getlist(key)))
+                for key in request.query_params)
+            key = json.dumps([
+                request.get_host(), request.path,
+                'staff' if request.user.is_staff else 'user', params,
+                dependencies, get_versions(*dependencies)])
+            digest = hashlib.md5(key.encode('utf-8')).hexdigest()
+            self._request_digest = digest
+        return digest
+
+    def get_cache_key(self, request):
+        return 'core.views.response:{}'.format(
+            self.get_request_digest(request))
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        """
+        Returns the response of handler, from the cache when an equivalent
+        request was answered since the last change of its models
+        """
+        if (self.action not in self.cache_actions or
+                not self.is_bounded_response(request)):
+            return handler(request, *args, **kwargs)
+        cache = caches[self.cache_alias]
+        key = self.get_cache_key(request)
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, self.cache_timeout)
+        return response
+
+    def is_bounded_response(self, request):
+        """
+        Tells whether the response to request has a bounded size. Lists
+        requested without pagination are unbounded, they are never cached
+        whether streamed or not.
+        """
+        if self.action != 'list' or self.paginator is None:
+            return True
+        return self.paginator.get_page_size(request) is not None
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super(CachedResponseMixin, self).list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super(CachedResponseMixin, self).retrieve, request, *args,
+            **kwargs)
+
+
+def parse_etags(header):
+    """Returns the entity tags listed in an If-Match or If-None-Match"""
+    etags = []
+    for etag in header.split(','):
+        etag = etag.strip()
+        if etag.startswith('W/'):
+            etag = etag[2:]
+        if etag:
+            etags.append(etag)
+    return etags
+
+
+class ConditionalRequestMixin(object):
+    """
+    Adds ETag validators to list and retrieve responses, answers matching
+    If-None-Match requests with 304 Not Modified before any serializer is
+    built, and rejects updates whose If-Match does not match the current
+    representation with 412 Precondition Failed.
+
+    List validators are the request digest of CachedResponseMixin, made of
+    the model version tokens. Object validators are made of the updated_at
+    of the object and of every related object its representation embeds.
+    """
+
+    def get_list_etag(self, request):
+        return '"{}"'.format(self.get_request_digest(request))
+
+    def get_object_etag(self, lock=False):
+        """
+        Returns the validator of the object retrieved by the current
+        request, with one query, or None when it does not exist. With lock,
+        the rows it is made of stay locked until the end of the transaction.
+        """
+        # updates are validated against the retrieved representation
+        action, self.action = self.action, 'retrieve'
+        try:
+            serializer_class = self.get_serializer_class()
+            fieldset = self.get_fieldset()
+            queryset = self.filter_queryset(self.get_queryset())
+        finally:
+            self.action = action
+        plan = get_eager_loading_plan(serializer_class, fieldset)
+        fields = ['updated_at'] + [
+            '{}__updated_at'.format(lookup) for lookup in plan.select_related]
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        if lock:
+            queryset = queryset.select_for_update()
+        row = queryset.filter(**{
+            self.lookup_field: self.kwargs[lookup_url_kwarg]
+        }).values_list(*fields).first()
+        if row is None:
+            return None
+        # representations of other fieldsets are other entities
+        key = json.dumps([
+            self.request.path,
+            'staff' if self.request.user.is_staff else 'user', fieldset,
+            [value.isoformat() if value else None for value in row]])
+        return '"{}"'.format(hashlib.md5(key.encode('utf-8')).hexdigest())
+
+    def is_not_modified(self, request, etag):
+        etags = parse_etags(request.META.get('HTTP_IF_NONE_MATCH', ''))
+        return etag is not None and (etag in etags or '*' in etags)
+
+    def get_not_modified_response(self, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED,
+                        headers={'ETag': etag})
+
+    def list(self, request, *args, **kwargs):
+        etag = self.get_list_etag(request)
+        if self.is_not_modified(request, etag):
+            return self.get_not_modified_response(etag)
+        response = super(ConditionalRequestMixin, self).list(
+            request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response['ETag'] = etag
+        return response
+
+    def retrieve(self, request, *args, **kwargs):
+        etag = self.get_object_etag()
+        if self.is_not_modified(request, etag):
+            return self.get_not_modified_response(etag)
+        response = super(ConditionalRequestMixin, self).retrieve(
+            request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK and etag:
+            response['ETag'] = etag
+        return response
+
+    def update(self, request, *args, **kwargs):
+        header = request.META.get('HTTP_IF_MATCH')
+        if header is None:
+            response = super(ConditionalRequestMixin, self).update(
+                request, *args, **kwargs)
+        else:
+            # the object stays locked from the check until it is written, so
+            # concurrent updates validated against the same representation
+            # can not both be applied
+            with transaction.atomic():
+                etag = self.get_object_etag(lock=True)
+                etags = parse_etags(header)
+                if etag is None or (etag not in etags and '*' not in etags):
+                    raise Api412('Resource was modified since it was '
+                                 'retrieved')
+                response = super(ConditionalRequestMixin, self).update(
+                    request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            etag = self.get_object_etag()
+            if etag:
+                response['ETag'] = etag
+        return response
+
+
+class BulkCreateMixin(object):
+    """
+    Adds a bulk endpoint creating the objects of a list of payloads with a
+    fixed number of queries. Unique fields and foreign keys are checked
+    with one query per batch, valid objects are inserted together and
+    invalid ones are reported per item without aborting the others.
+    """
+    bulk_max_items = 1000
+    # number of rows per insert statement
+    bulk_batch_size = 500
+    # foreign keys given by id in the payloads, checked for existence
+    bulk_foreign_keys = ()
+
+    def get_bulk_fields(self):
+        serializer = self.get_serializer()
+        fields = [name for name, field in serializer.fields.items()
+                  if not field.read_only]
+        return fields + list(self.bulk_foreign_keys)
+
+    def build_bulk_instance(self, item, fields):
+        """Returns an unsaved instance with the values of item"""
+        model = self.get_queryset().model
+        instance = model()
+        for name in fields:
+            if name not in item:
+                continue
+            if name in self.bulk_foreign_keys:
+                setattr(instance, model._meta.get_field(name).attname,
+                        item[name])
+            else:
+                setattr(instance, name, item[name])
+        return instance
+
+    def validate_bulk_instances(self, instances):
+        """
+        Validates instances returning a dict of errors by index. Checks
+        needing the database run once for the whole batch.
+        """
+        model = self.get_queryset().model
+        errors = {}
+        for index, instance in enumerate(instances):
+            try:
+                self.clean_bulk_instance(instance)
+            except ValidationError as e:
+                errors[index] = parse_error_messages(e.message_dict)
+            # values of unexpected types may break model cleaning, which
+            # only fails their own item
+            except (AttributeError, TypeError, ValueError) as e:
+                errors[index] = force_text(e)
+        find_missing_foreign_keys(
+            model, instances, self.bulk_foreign_keys, errors)
+        return find_duplicate_values(model, instances, errors)
+
+    def clean_bulk_instance(self, instance):
+        """Validates instance without queries, raising ValidationError"""
+        # uniqueness and foreign keys are checked in batch
+        instance.full_clean(exclude=self.bulk_foreign_keys,
+                            validate_unique=False)
+
+    def perform_bulk_create(self, instances):
+        model = self.get_queryset().model
+        with transaction.atomic():
+            model._default_manager.bulk_create(
+                instances, batch_size=self.bulk_batch_size)
+            post_bulk_create.send(sender=model, instances=instances)
+
+    @list_route(methods=['post'], url_path='bulk',
+                parser_classes=BULK_PARSER_CLASSES)
+    def bulk(self, request, *args, **kwargs):
+        items = request.data
+        if not isinstance(items, list):
+            raise Api400('Expected a list of objects')
+        if len(items) > self.bulk_max_items:
+            raise Api400('At most {} objects can be created at '
+                         'once'.format(self.bulk_max_items))
+
+        fields = self.get_bulk_fields()
+        instances = []
+        errors = {}
+        for index, item in enumerate(items):
+            if not isinstance(item, dict):
+                errors[index] = 'Expected an object'
+                item = {}
+            instances.append(self.build_bulk_instance(item, fields))
+        for index, error in self.validate_bulk_instances(instances).items():
+            errors.setdefault(index, error)
+
+        valid = [instance for index, instance in enumerate(instances)
+                 if index not in errors]
+        if valid:
+            try:
+                self.perform_bulk_create(valid)
+            except IntegrityError:
+                raise Api400('Objects were changed concurrently, please '
+                             'try again')
+
+        results = []
+        for index, instance in enumerate(instances):
+            if index in errors:
+                results.append({'status': status.HTTP_400_BAD_REQUEST,
+                                'detail': errors[index]})
+            else:
+                results.append({'status': status.HTTP_201_CREATED,
+                                'data': self.get_serializer(instance).data})
+        return Response(
+            {'created': len(valid), 'failed': len(errors),
+             'results': results},
+            status=status.HTTP_201_CREATED if valid
+            else status.HTTP_400_BAD_REQUEST)
+
+
+class MultiGetMixin(object):
+    """
+    Returns the objects of a list of ids, with the ids query param of the
+    list or the ids of a POST to multi-get for long lists. Objects are
+    loaded with one query and rendered in the requested order, ids without
+    object being left out.
+    """
+
+    def get_multi_get_max_ids(self):
+        return getattr(settings, 'MULTI_GET_MAX_IDS', 100)
+
+    def get_multi_get_response(self, ids):
+        # checked before any work, duplicated ids count against the limit
+        max_ids = self.get_multi_get_max_ids()
+        if len(ids) > max_ids:
+            raise Api400('At most {} ids can be requested at '
+                         'once'.format(max_ids))
+        # removes duplicated ids keeping the first occurrence
+        seen = set()
+        unique_ids = []
+        for value in ids:
+            value = force_text(value)
+            if value not in seen:
+                seen.add(value)
+                unique_ids.append(value)
+        ids = unique_ids
+        queryset = self.filter_queryset(self.get_queryset())
+        objects = dict(
+            (obj.pk, obj) for obj in queryset.filter(pk__in=ids))
+        objects = [objects[pk] for pk in ids if pk in objects]
+        serializer = self.get_serializer(objects, many=True)
+        return Response(serializer.data)
+
+    def list(self, request, *args, **kwargs):
+        ids = request.query_params.get('ids')
+        if ids is None:
+            return super(MultiGetMixin, self).list(request, *args, **kwargs)
+        return self.get_multi_get_response(
+            [pk.strip() for pk in ids.split(',') if pk.strip()])
+
+    @list_route(methods=['post'], url_path='multi-get')
+    def multi_get(self, request, *args, **kwargs):
+        data = request.data
+        ids = data.get('ids') if isinstance(data, dict) else None
+        if not isinstance(ids, list):
+            raise Api400('Expected a list of ids in the ids field')
+        # objects are loaded and rendered as they are listed
+        self.action = 'list'
+        return self.get_multi_get_response(ids)
+
+
+class StreamingListMixin(object):
+    """
+    Streams unpaginated list responses as a JSON array rendered chunk by
+    chunk, producing the same bytes the non streamed response would have
+    """
+    stream_chunk_size = 500
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            serializer = self.get_serializer(page, many=True)
+            return self.get_paginated_response(serializer.data)
+
+        if self.can_stream(request):
+            return self.get_streaming_response(request, queryset)
+
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
+    def can_stream(self, request):
+        renderer = request.accepted_renderer
+        if not isinstance(renderer, JSONRenderer):
+            return False
+        # indented output can not be concatenated from rendered chunks
+        indent = renderer.get_indent(
+            request.accepted_media_type, self.get_renderer_context())
+        return indent is None
+
+    def get_streaming_response(self, request, queryset):
+        renderer = request.accepted_renderer
+        media_type = request.accepted_media_type
+        context = self.get_renderer_context()
+
+        def render_chunks():
+            yield b'['
+            separator = b''
+            for chunk in iterate_in_chunks(queryset, self.stream_chunk_size):
+                data = self.get_serializer(chunk, many=True).data
+                rendered = renderer.render(data, media_type, context)
+                yield separator + rendered[1:-1]
+                separator = b','
+            yield b']'
+
+        return StreamingHttpResponse(render_chunks(), content_type=media_type)
+
+
+class ExportMixin(object):
+    """
+    Adds an export endpoint streaming every row matching the list filters as
+    CSV or newline delimited JSON. Rows are read as values of export_fields
+    in keyset chunks, so memory usage does not depend on the number of rows.
+    """
+    export_fields = ()
+    export_chunk_size = 2000
+
+    @list_route(methods=['get'], url_path='export',
+                renderer_classes=EXPORT_RENDERER_CLASSES)
+    def export(self, request, *args, **kwargs):
+        queryset = self.filter_queryset(self.get_queryset())
+        fields = list(self.export_fields)
+        ordering = get_keyset_ordering(queryset)
+        # the ordering values locate each chunk after the previous one
+        columns = fields + [field.lstrip('-') for field in ordering
+                            if field.lstrip('-') not in fields]
+        queryset = queryset.order_by(*ordering).values(*columns)
+
+        renderer = request.accepted_renderer
+        media_type = request.accepted_media_type
+        context = dict(self.get_renderer_context(), fields=fields)
+
+        def render_chunks():
+            header = True
+            for chunk in iterate_in_chunks(queryset, self.export_chunk_size):
+                rows = [OrderedDict((field, row[field]) for field in fields)
+                        for row in chunk]
+                yield renderer.render(
+                    rows, media_type, dict(context, header=header))
+                header = False
+            if header:
+                yield renderer.render([], media_type, context)
+
+        content_type = media_type
+        if renderer.charset:
+            content_type = '{}; charset={}'.format(
+                media_type, renderer.charset)
+        response = StreamingHttpResponse(
+            render_chunks(), content_type=content_type)
+        name = force_text(queryset.model._meta.verbose_name_plural).lower()
+        response['Content-Disposition'] = (
+            'attachment; filename="{}.{}"'.format(name, renderer.format))
+        return response
+
+
+class FragmentCacheStatsView(APIView):
+    """
+    Reports the counters of the serialized fragment cache of the process
+    answering the request:
+
+    `GET /stats/fragment-cache`
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return Response(fragment_cache.get_stats())
+
+
+class MetricsView(APIView):
+    """
+    Reports the request histograms of every worker process in the
+    Prometheus text format:
+
+    `GET /metrics`
+    """
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(request_metrics.render(),
+                            content_type='text/plain; version=0.0.4')
+
+
+class JobView(RetrieveAPIView):
+    """
+    Reports the status of a background job and, once done, its result, to
+    the user who queued it and to staff users:
+
+    `GET /jobs/:id`
+    """
+
+    permission_classes = (IsAuthenticated,)
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+
+    def get_queryset(self):
+        queryset = super(JobView, self).get_queryset()
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user=self.request.user)
+        return queryset
+
+
+class BatchView(APIView):
+    """
+    Runs a list of sub-requests in the process answering the request, with
+    its authentication, and returns their statuses and bodies in order:
+
+    `POST /batch`
+
+    Sample payload:
+
+    ```
+    {
+        'atomic': false,
+        'requests': [
+            {'name': 'contract', 'method': 'GET',
+             'path': '/contracts/aryh149jfl0pol1r'},
+            {'method': 'GET',
+             'path': '/contracts?tenant_id={{contract.tenant.id}}'}
+        ]
+    }
+    ```
+
+    Paths are relative to the api root. Strings in paths and bodies may
+    reference the body of an earlier named sub-request with
+    `{{name.field}}`. When `atomic` is true the sub-requests run in one
+    transaction, which is rolled back at the first failed sub-request.
+    """
+
+    permission_classes = (IsAuthenticated,)
+    methods = ('GET', 'POST', 'PUT', 'PATCH', 'DELETE')
+
+    def get_max_requests(self):
+        return getattr(settings, 'BATCH_MAX_REQUESTS', 20)
+
+    def post(self, request, *args, **kwargs):
+        data = request.data
+        items = data.get('requests') if isinstance(data, dict) else None
+        if not isinstance(items, list) or not items:
+            raise Api400('Expected a list of requests')
+        max_requests = self.get_max_requests()
+        if len(items) > max_requests:
+            raise Api400('At most {} requests can be batched'.format(
+                max_requests))
+
+        if not data.get('atomic'):
+            results = self.run_requests(request, items)
+            return Response({'results': results})
+
+        with transaction.atomic():
+            results = self.run_requests(request, items, stop_on_error=True)
+            failed = results[-1]['status'] >= status.HTTP_400_BAD_REQUEST
+            if failed:
+                transaction.set_rollback(True)
+        return Response(
+            {'results': results, 'rolled_back': failed},
+            status=status.HTTP_400_BAD_REQUEST if failed
+            else status.HTTP_200_OK)
+
+    def run_requests(self, request, items, stop_on_error=False):
+        # bodies of the successful named sub-requests
+        named = {}
+        results = []
+        for item in items:
+            result = self.run_request(request, item, named)
+            results.append(result)
+            if result['status'] >= status.HTTP_400_BAD_REQUEST:
+                if stop_on_error:
+                    break
+            elif item.get('name'):
+                named[item['name']] = result['body']
+        return results
+
+    def get_error(self, code, detail):
+        return {'status': code, 'body': {'detail': detail}}
+
+    def run_request(self, request, item, named):
+        """Runs one sub-request returning its status and body"""
+        if not isinstance(item, dict):
+            return self.get_error(
+                status.HTTP_400_BAD_REQUEST, 'Expected an object')
+        method = force_text(item.get('method', 'GET')).upper()
+        if method not in self.methods:
+            return self.get_error(
+                status.HTTP_400_BAD_REQUEST,
+                'Invalid method "{}"'.format(method))
+        path = item.get('path')
+        if not path or not isinstance(path, six.string_types):
+            return self.get_error(
+                status.HTTP_400_BAD_REQUEST, 'Missing path parameter')
+        try:
+            path = resolve_references(path, named)
+            body = resolve_references(item.get('body'), named)
+        except ValueError as e:
+            return self.get_error(status.HTTP_400_BAD_REQUEST, force_text(e))
+
+        # paths are relative to the api root, where this view is
+        root = request.path_info.rsplit('/', 1)[0]
+        sub_request = build_sub_request(
+            request, method, '{}/{}'.format(root, path.lstrip('/')), body)
+        try:
+            match = resolve(sub_request.path_info)
+        except Resolver404:
+            return self.get_error(status.HTTP_404_NOT_FOUND, 'Not found')
+        if getattr(match.func, 'cls', None) is type(self):
+            return self.get_error(
+                status.HTTP_400_BAD_REQUEST, 'Batches can not be nested')
+        sub_request.resolver_match = match
+
+        response = match.func(sub_request, *match.args, **match.kwargs)
+        if response.streaming or not hasattr(response, 'data'):
+            return self.get_error(
+                status.HTTP_400_BAD_REQUEST,
+                'Streamed responses can not be batched')
+        return {'status': response.status_code, 'body': response.data}
@@ -1,9 +1,15 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
+from functools import reduce
+from operator import or_
+
 from django.contrib import admin
+from django.db import models
 
+from accounts.models import Landlord
 from properties.models import Property
+from properties.search import FULLTEXT_FIELDS, get_text_search_terms
 
 
 @admin.register(Property)
@@ -24,6 +30,37 @@ class PropertyAdmin(admin.ModelAdmin):
                      'description', 'city', 'street', 'zip_code')
     ordering = ('id',)
 
+    def get_search_results(self, request, queryset, search_term):
+        """
+        Keeps the properties matching every word of search_term in any of
+        the search fields, or whose zip code starts with it. Description,
+        street and city are searched through the full text index and
+        landlord names through their search tokens instead of scanning the
+        tables with leading wildcards.
+        """
+        words = search_term.split()
+        if not words:
+            return queryset, False
+        condition = models.Q()
+        for word in words:
+            condition &= self.get_word_condition(word)
+        zip_code = ''.join(words)
+        condition |= models.Q(zip_code__istartswith=zip_code)
+        return queryset.filter(condition), False
+
+    def get_word_condition(self, word):
+        """Returns the condition of the properties matching word"""
+        landlords = Landlord.objects.search(word).order_by()
+        condition = (models.Q(landlord__in=landlords.values('id')) |
+                     models.Q(zip_code__istartswith=word))
+        if get_text_search_terms(word):
+            matches = Property.objects.search(word).order_by()
+            return condition | models.Q(id__in=matches.values('id'))
+        # words too short for the full text index
+        return condition | reduce(or_, [
+            models.Q(**{'{}__icontains'.format(field): word})
+            for field in FULLTEXT_FIELDS])
+
     def get_landlord_name(self, obj):
         return obj.landlord.get_full_name()
     get_landlord_name.short_description = 'Landlord'
@@ -0,0 +1,38 @@
+# -*- coding: utf-8 -*-
+# Generated by Django 1.11.4 on 2026-10-18 06:06
+# flake8: noqa
+from __future__ import unicode_literals
+
+from django.db import migrations
+
+FULLTEXT_INDEX = 'property_text_idx'
+FULLTEXT_FIELDS = ('description', 'street', 'city')
+
+
+def add_fulltext_index(apps, schema_editor):
+    # only MySQL has FULLTEXT indexes, other databases search without them
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    quote = schema_editor.quote_name
+    schema_editor.execute('ALTER TABLE {} ADD FULLTEXT INDEX {} ({})'.format(
+        quote('properties_property'), quote(FULLTEXT_INDEX),
+        ', '.join(quote(field) for field in FULLTEXT_FIELDS)))
+
+
+def remove_fulltext_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'mysql':
+        return
+    quote = schema_editor.quote_name
+    schema_editor.execute('ALTER TABLE {} DROP INDEX {}'.format(
+        quote('properties_property'), quote(FULLTEXT_INDEX)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('properties', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(add_fulltext_index, remove_fulltext_index),
+    ]
@@ -1,10 +1,36 @@
 # -*- coding: utf-8 -*-
 from __future__ import unicode_literals
 
-from django.db import models
+from django.db import connections, models
 
 from core.models import HashIdModel
 from accounts.models import Landlord
+from properties.search import (FULLTEXT_FIELDS, FullTextMatch,
+                               get_text_search_terms, get_fallback_relevance,
+                               get_fallback_condition)
+
+
+class PropertyQuerySet(models.QuerySet):
+
+    def search(self, query):
+        """
+        Keeps the properties with description, street or city containing
+        every word of query, most relevant first and then in the current
+        ordering. Uses the FULLTEXT index on MySQL and substring matching
+        on other databases.
+        """
+        terms = get_text_search_terms(query)
+        if not terms:
+            return self.none()
+        if connections[self.db].vendor == 'mysql':
+            queryset = self.annotate(
+                relevance=FullTextMatch(FULLTEXT_FIELDS, terms)
+            ).filter(relevance__gt=0)
+        else:
+            queryset = self.filter(get_fallback_condition(terms)).annotate(
+                relevance=get_fallback_relevance(terms))
+        ordering = list(self.query.order_by or self.model._meta.ordering)
+        return queryset.order_by('-relevance', *ordering)
 
 
 class Property(HashIdModel):
@@ -50,17 +76,42 @@ class Property(HashIdModel):
     landlord = models.ForeignKey(Landlord, help_text=u'owner of the property',
                                  on_delete=models.CASCADE)
 
+    objects = PropertyQuerySet.as_manager()
+
     class Meta:
         verbose_name = 'Property'
         verbose_name_plural = 'Properties'
+        # listing ordering, alone and after each equality filter
+        indexes = [
+            models.Index(fields=['city', 'zip_code', 'street', 'id'],
+                         name='property_location_idx'),
+            models.Index(
+                fields=['landlord', 'city', 'zip_code', 'street', 'id'],
+                name='property_landlord_idx'),
+            models.Index(
+                fields=['category', 'city', 'zip_code', 'street', 'id'],
+                name='property_category_idx'),
+            models.Index(fields=['beds', 'city', 'zip_code', 'street', 'id'],
+                         name='property_beds_idx'),
+            models.Index(fields=['zip_code', 'city', 'street', 'id'],
+                         name='property_zip_code_idx'),
+        ]
 
     def save(self, *args, **kwargs):
         self.full_clean()
         super(Property, self).save(*args, **kwargs)
 
     def clean(self):
-        self.zip_code = self.zip_code.replace(' ', '')
+        if self.zip_code:
+            self.zip_code = self.zip_code.replace(' ', '')
 
     def __unicode__(self):
+        return self.get_label(
+            self.category, self.street, self.number, self.city)
+
+    @classmethod
+    def get_label(cls, category, street, number, city):
+        """Returns the representation of a property from its values"""
         return u'{} at {}, {} - {}'.format(
-            self.get_category_display(), self.street, self.number, self.city)
+            dict(cls.CATEGORY_CHOICES).get(category, category), street,
+            number, city)
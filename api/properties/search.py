@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from __future__ import unicode_literals
+
+import re
+from functools import reduce
+from operator import add, or_
+
+from django.db import models
+
+FULLTEXT_INDEX = 'property_text_idx'
+FULLTEXT_FIELDS = ('description', 'street', 'city')
+
+# weight of a term found in each field for the fallback relevance
+FALLBACK_WEIGHTS = (('description', 1), ('street', 2), ('city', 2))
+
+# innodb_ft_min_token_size, shorter words are not in the index
+MIN_TERM_LENGTH = 3
+MAX_TERMS = 10
+
+_words = re.compile(r'\w+', re.UNICODE)
+
+
+def get_text_search_terms(query):
+    """
+    Returns the distinct words of query long enough to be found in the full
+    text index
+    """
+    terms = []
+    for word in _words.findall((query or '').lower()):
+        if len(word) >= MIN_TERM_LENGTH and word not in terms:
+            terms.append(word)
+    return terms[:MAX_TERMS]
+
+
+class FullTextMatch(models.Expression):
+    """
+    Relevance of the row for a MySQL boolean mode full text search of terms
+    in fields, which must be covered by a FULLTEXT index. Every term is
+    required and matches words starting with it.
+    """
+
+    def __init__(self, fields, terms):
+        super(FullTextMatch, self).__init__(output_field=models.FloatField())
+        self.fields = [models.F(field) for field in fields]
+        self.terms = terms
+
+    def get_source_expressions(self):
+        return self.fields
+
+    def set_source_expressions(self, exprs):
+        self.fields = exprs
+
+    def as_sql(self, compiler, connection):
+        columns = [compiler.compile(field)[0] for field in self.fields]
+        query = ' '.join('+{}*'.format(term) for term in self.terms)
+        sql = 'MATCH ({}) AGAINST (%s IN BOOLEAN MODE)'.format(
+            ', '.join(columns))
+        return sql, [query]
+
+
+def get_fallback_relevance(terms):
+    """
+    Returns an expression weighing the fields containing each term, used
+    where the database has no full text index
+    """
+    return reduce(add, [
+        models.Case(
+            models.When(**{'{}__icontains'.format(field): term,
+                           'then': models.Value(weight)}),
+            default=models.Value(0), output_field=models.FloatField())
+        for term in terms for field, weight in FALLBACK_WEIGHTS])
+
+
+def get_fallback_condition(terms):
+    """Returns the condition keeping rows containing every term"""
+    condition = models.Q()
+    for term in terms:
+        condition &= reduce(or_, [
+            models.Q(**{'{}__icontains'.format(field): term})
+            for field in FULLTEXT_FIELDS])
+    return condition
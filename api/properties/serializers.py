@@ -3,11 +3,13 @@ from __future__ import unicode_literals
 
 from rest_framework import serializers
 
+from core.serializers import CachedFragmentMixin
 from accounts.serializers import LandlordSerializer
 from properties.models import Property
 
 
-class PropertySerializer(serializers.HyperlinkedModelSerializer):
+class PropertySerializer(CachedFragmentMixin,
+                         serializers.HyperlinkedModelSerializer):
     landlord = LandlordSerializer(read_only=True)
 
     class Meta:
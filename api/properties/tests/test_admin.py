@@ -1,9 +1,12 @@
 # -*- encoding: UTF-8 -*-
 import factory
+from django.contrib import admin
 from django.test import TestCase
 from django.contrib.auth.models import User
 
 from accounts.models import Landlord
+from accounts.tests.factories import LandlordFactory
+from properties.models import Property
 from properties.tests.factories import PropertyFactory
 
 
@@ -138,3 +141,39 @@ class TestPropertyAdmin(TestCase):
         self.assertIn(self.property_two['street'], content)
         self.assertIn(self.property_two['zip_code'], content)
         self.assertNotIn(self.property_one['street'], content)
+
+
+class TestPropertyAdminSearch(TestCase):
+    def setUp(self):
+        self.smith_property = PropertyFactory(
+            city='London', street='Baker Street', zip_code='NW16XE',
+            description='Nice flat', landlord=LandlordFactory(
+                first_name='John', last_name='Smith',
+                email='smith@email.com'))
+        self.jones_property = PropertyFactory(
+            city='London', street='Elm Row', zip_code='SY79XE',
+            description='Cosy home', landlord=LandlordFactory(
+                first_name='Mary', last_name='Jones',
+                email='jones@email.com'))
+
+    def search(self, search_term):
+        model_admin = admin.site._registry[Property]
+        queryset, __ = model_admin.get_search_results(
+            None, Property.objects.all(), search_term)
+        return set(queryset)
+
+    def test_words_matching_different_fields(self):
+        """Should match each word against any of the search fields"""
+        self.assertEqual(self.search('London Smith'), {self.smith_property})
+        self.assertEqual(self.search('london'),
+                         {self.smith_property, self.jones_property})
+        self.assertEqual(self.search('London Brown'), set())
+
+    def test_zip_code_prefix(self):
+        """Should match zip codes starting with the search term"""
+        self.assertEqual(self.search('NW1'), {self.smith_property})
+        self.assertEqual(self.search('nw1 6xe'), {self.smith_property})
+
+    def test_short_words(self):
+        """Should keep words too short for the full text index"""
+        self.assertEqual(self.search('London St'), {self.smith_property})
@@ -4,9 +4,11 @@ from __future__ import unicode_literals
 from rest_framework import status
 
 from core.tests import JWTAuthenticationTestCase
-from accounts.tests.factories import UserFactory
+from accounts.tests.factories import UserFactory, TenantFactory
 from accounts.models import Landlord
 from properties.models import Property
+from properties.tests.factories import PropertyFactory
+from contracts.tests.factories import ContractFactory
 
 
 class TestPropertyEndpoints(JWTAuthenticationTestCase):
@@ -349,7 +351,7 @@ class TestPropertyEndpoints(JWTAuthenticationTestCase):
         response = self.client.get(
             '/api/properties', params, **self.staff_headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(self.get_streamed_data(response), expected_data)
 
     def test_list_properties_split_in_pages_as_staff(self):
         """
@@ -779,7 +781,7 @@ class TestPropertyEndpoints(JWTAuthenticationTestCase):
         response = self.client.get(
             '/api/properties', params, **self.common_headers)
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, expected_data)
+        self.assertEqual(self.get_streamed_data(response), expected_data)
 
     def test_list_properties_split_in_pages_as_common(self):
         """
@@ -1001,3 +1003,237 @@ class TestPropertyEndpoints(JWTAuthenticationTestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertEqual(response.data, expected)
         self.assertEqual(Property.objects.count(), 4)
+
+
+class TestPropertyAvailabilityEndpoint(JWTAuthenticationTestCase):
+    def setUp(self):
+        self.user = UserFactory(is_staff=False)
+        self.headers = self.get_jwt_header(
+            self.user.username, 'password123!')
+
+        self.landlord = Landlord.objects.create(
+            first_name='George', last_name='Foreman',
+            email='george@mail.com')
+        self.rented = PropertyFactory(landlord=self.landlord, city='London')
+        self.free = PropertyFactory(landlord=self.landlord, city='London')
+        self.elsewhere = PropertyFactory(
+            landlord=self.landlord, city='Sheffield')
+        ContractFactory(
+            property=self.rented, tenant=TenantFactory(),
+            start_date='2018-01-01', end_date='2018-12-31')
+
+    def get_ids(self, response):
+        return sorted(item['id'] for item in response.data['results'])
+
+    def test_list_available_properties(self):
+        """
+        Should list only properties without contracts overlapping the
+        given dates
+        """
+        params = {'from': '2018-06-01', 'to': '2019-06-01'}
+        response = self.client.get(
+            '/api/properties/available', params, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_ids(response),
+                         sorted([self.free.id, self.elsewhere.id]))
+
+    def test_list_available_properties_outside_contract(self):
+        """
+        Should list rented properties when their contracts do not overlap
+        the given dates
+        """
+        params = {'from': '2019-01-01', 'to': '2019-06-01'}
+        response = self.client.get(
+            '/api/properties/available', params, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['count'], 3)
+
+    def test_list_available_properties_with_filters(self):
+        """
+        Should apply properties listing filters to available properties
+        """
+        params = {'from': '2018-06-01', 'to': '2018-07-01', 'city': 'lond'}
+        response = self.client.get(
+            '/api/properties/available', params, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.get_ids(response), [self.free.id])
+
+    def test_list_available_properties_missing_dates(self):
+        """Should get 400 when dates are not given"""
+        response = self.client.get(
+            '/api/properties/available', {'from': '2018-06-01'},
+            **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data,
+            {'detail': 'Missing to parameter containing a date'})
+
+    def test_list_available_properties_invalid_dates(self):
+        """Should get 400 when dates are invalid or in wrong order"""
+        response = self.client.get(
+            '/api/properties/available', {'from': '2018-13-01',
+                                          'to': '2018-12-01'},
+            **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            response.data,
+            {'detail': 'Invalid date "2018-13-01" for from parameter'})
+
+        response = self.client.get(
+            '/api/properties/available', {'from': '2018-12-01',
+                                          'to': '2018-06-01'},
+            **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_property_availability(self):
+        """
+        Should check if one particular property is free within given dates
+        """
+        url = '/api/properties/{}/availability'
+        params = {'from': '2018-06-01', 'to': '2019-06-01'}
+        response = self.client.get(
+            url.format(self.rented.id), params, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data,
+                         {'id': self.rented.id, 'available': False})
+
+        response = self.client.get(
+            url.format(self.free.id), params, **self.headers)
+        self.assertEqual(response.data,
+                         {'id': self.free.id, 'available': True})
+
+        response = self.client.get(
+            url.format('a' * 16), params, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class TestPropertySearchEndpoint(JWTAuthenticationTestCase):
+    def setUp(self):
+        self.user = UserFactory(is_staff=False)
+        self.headers = self.get_jwt_header(
+            self.user.username, 'password123!')
+
+        self.landlord = Landlord.objects.create(
+            first_name='George', last_name='Foreman',
+            email='george@mail.com')
+        self.garden = PropertyFactory(
+            landlord=self.landlord, city='London', street='Garden Row',
+            description='Quiet house with garden', category='house')
+        self.described = PropertyFactory(
+            landlord=self.landlord, city='Bristol', street='High Street',
+            description='Flat near the garden centre', category='flat')
+        self.other = PropertyFactory(
+            landlord=self.landlord, city='London', street='Baker Street',
+            description='Bright flat near the station', category='flat')
+
+    def get_ids(self, params):
+        response = self.client.get('/api/properties', params, **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [item['id'] for item in response.data['results']]
+
+    def test_search_ranked_by_relevance(self):
+        """
+        Should keep properties containing the words, ranking matches in
+        street and city before matches in description only
+        """
+        self.assertEqual(self.get_ids({'q': 'Garden'}),
+                         [self.garden.id, self.described.id])
+
+    def test_search_requires_every_word(self):
+        """Should keep properties containing every searched word"""
+        self.assertEqual(self.get_ids({'q': 'flat station'}),
+                         [self.other.id])
+        self.assertEqual(self.get_ids({'q': 'garden station'}), [])
+
+    def test_search_combined_with_filters(self):
+        """Should apply the other filters on search results"""
+        self.assertEqual(self.get_ids({'q': 'garden', 'category': 'flat'}),
+                         [self.described.id])
+        self.assertEqual(
+            self.get_ids({'q': 'garden', 'landlord_id': self.landlord.id,
+                          'beds': self.garden.beds, 'city': 'london'}),
+            [self.garden.id])
+
+    def test_search_short_words(self):
+        """Should find nothing when no word is long enough to be indexed"""
+        self.assertEqual(self.get_ids({'q': 'a b'}), [])
+
+
+class TestPropertyBulkCreateEndpoint(JWTAuthenticationTestCase):
+    def setUp(self):
+        self.user = UserFactory(is_staff=False)
+        self.headers = self.get_jwt_header(
+            self.user.username, 'password123!')
+        self.landlords = [
+            Landlord.objects.create(
+                first_name='George', last_name='Foreman',
+                email='george{}@mail.com'.format(index))
+            for index in range(2)]
+
+    def get_item(self, landlord_id, **values):
+        item = {
+            'street': 'Riverdale Avenue',
+            'number': '78',
+            'city': 'South Yorkshire',
+            'zip_code': 'SY7 9XEW',
+            'description': 'Incredible property with nice location',
+            'beds': '2',
+            'category': 'house',
+            'landlord': landlord_id
+        }
+        item.update(values)
+        return item
+
+    def test_bulk_create_properties(self):
+        """
+        Should create properties of several landlords checking landlords
+        with a single query
+        """
+        payload = [self.get_item(landlord.id) for landlord in self.landlords]
+        response = self.client.post(
+            '/api/properties/bulk', payload, format='json', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 2)
+        data = response.data['results'][1]['data']
+        self.assertEqual(data['landlord'], self.landlords[1].id)
+        self.assertEqual(data['zip_code'], 'SY79XEW')
+        self.assertEqual(Property.objects.count(), 2)
+
+    def test_invalid_properties_reported(self):
+        """Should report properties with invalid values or landlords"""
+        payload = [
+            self.get_item(self.landlords[0].id),
+            self.get_item('unknown'),
+            self.get_item(None),
+            self.get_item(self.landlords[0].id, beds='7'),
+            self.get_item([self.landlords[0].id]),
+        ]
+        response = self.client.post(
+            '/api/properties/bulk', payload, format='json', **self.headers)
+        self.assertEqual(response.data['created'], 1)
+        details = [result.get('detail')
+                   for result in response.data['results']]
+        self.assertEqual(details[:3], [
+            None,
+            'Landlord with id "unknown" does not exist',
+            'Missing landlord parameter containing landlord id',
+        ])
+        self.assertTrue(details[3].startswith("'beds': Value "))
+        self.assertTrue(details[4].startswith('Landlord with id '))
+
+    def test_null_values_reported(self):
+        """
+        Should report items with null values and still create the valid
+        ones
+        """
+        payload = [
+            self.get_item(self.landlords[0].id, zip_code=None),
+            self.get_item(self.landlords[1].id),
+        ]
+        response = self.client.post(
+            '/api/properties/bulk', payload, format='json', **self.headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 1)
+        self.assertEqual(response.data['results'][0]['detail'],
+                         "'zip_code': This field cannot be null.")
+        self.assertEqual(Property.objects.count(), 1)
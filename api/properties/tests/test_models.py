@@ -6,6 +6,8 @@ from django.core.exceptions import ValidationError
 from properties.models import Property
 from accounts.models import Landlord
 from properties.tests.factories import PropertyFactory
+from properties.search import (FULLTEXT_FIELDS, FullTextMatch,
+                               get_text_search_terms)
 
 
 class TestProperty(TestCase):
@@ -272,3 +274,25 @@ class TestProperty(TestCase):
         Landlord.objects.all().delete()
         self.assertEqual(Landlord.objects.count(), 0)
         self.assertEqual(Property.objects.count(), 0)
+
+
+class TestPropertySearch(TestCase):
+
+    def test_get_text_search_terms(self):
+        """Should keep distinct lowercase words long enough to be indexed"""
+        self.assertEqual(get_text_search_terms(u'Near the métro, NEAR a'),
+                         [u'near', u'the', u'métro'])
+
+    def test_fulltext_match_sql(self):
+        """
+        Should match every term as a word prefix in boolean mode against the
+        indexed columns
+        """
+        queryset = Property.objects.annotate(
+            relevance=FullTextMatch(FULLTEXT_FIELDS, ['garden', 'flat']))
+        sql, params = queryset.query.sql_with_params()
+        self.assertIn('MATCH ("properties_property"."description", '
+                      '"properties_property"."street", '
+                      '"properties_property"."city") AGAINST (%s IN BOOLEAN '
+                      'MODE)', sql)
+        self.assertIn('+garden* +flat*', params)
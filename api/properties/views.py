@@ -2,20 +2,35 @@
 from __future__ import unicode_literals
 
 from django.core.exceptions import ValidationError
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, mixins
+from rest_framework.decorators import detail_route, list_route
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
 from rest_framework import status
 
+from core.views import (BulkCreateMixin, ConditionalRequestMixin,
+                        CachedResponseMixin, EagerLoadingMixin,
+                        ExportMixin, MultiGetMixin,
+                        StreamingListMixin)
 from core.exceptions import Api400, Api401, Api404
 from accounts.models import Landlord
 from properties.models import Property
 from properties.validators import is_category_valid, is_number_of_beds_valid
 from properties.serializers import (PropertySerializer,
                                     PropertyModificationsSerializer)
-
-
-class PropertyView(mixins.RetrieveModelMixin,
+from contracts.models import Contract
+from contracts.occupancy import occupancy_index
+
+
+class PropertyView(BulkCreateMixin,
+                   ExportMixin,
+                   ConditionalRequestMixin,
+                   CachedResponseMixin,
+                   EagerLoadingMixin,
+                   MultiGetMixin,
+                   StreamingListMixin,
+                   mixins.RetrieveModelMixin,
                    mixins.ListModelMixin,
                    mixins.CreateModelMixin,
                    mixins.UpdateModelMixin,
@@ -33,6 +48,23 @@ class PropertyView(mixins.RetrieveModelMixin,
 
         `GET /properties/:id`
 
+    *   Retrieve many properties by id, in the given order:
+
+        `GET /properties?ids=id1,id2`
+
+        or, for long lists, `POST /properties/multi-get` with the payload
+        `{'ids': ['id1', 'id2']}`. Up to 100 ids are accepted.
+
+    *   List properties with no contracts overlapping given dates:
+
+        `GET /properties/available?from=:start_date&to=:end_date`
+
+        Accepts all the filters of the properties listing
+
+    *   Check if one particular property is free within given dates:
+
+        `GET /properties/:id/availability?from=:start_date&to=:end_date`
+
     *  Create Property:
 
         `POST /properties`
@@ -52,6 +84,14 @@ class PropertyView(mixins.RetrieveModelMixin,
         }
         ```
 
+    *  Create many properties at once, up to 1000:
+
+        `POST /properties/bulk`
+
+        Accepts a list of payloads like the one for creating a property.
+        Valid items are created even when others are invalid. The response
+        lists the created data or the error of every item, in order.
+
     *  Update Property:
 
         `PUT /properties/:id`
@@ -86,6 +126,13 @@ class PropertyView(mixins.RetrieveModelMixin,
 
     Available filters:
 
+    *   `q`: Searches words in description, street and city
+
+        `GET /properties?q=garden near station`
+
+        Keeps properties containing every word of at least 3 characters,
+        most relevant first. Combines with all other filters.
+
     *   `landlord_id`: Filters properties by landlord
 
         `GET /properties?landlord_id=landlord_id`
@@ -122,17 +169,77 @@ class PropertyView(mixins.RetrieveModelMixin,
     *   `page_size`: specifies the page size. If not provided, results are
     paginated by 20. Max value is 40. If 'none' is provided, pagination is
     disabled.
+
+    *   `cursor`: switches to cursor pagination, which keeps pages stable
+    while new records are created and costs the same for any page. Send it
+    empty for the first page and follow the `next` and `previous` links.
+
+    Representation parameters, for list and retrieve:
+
+    *   `fields`: comma separated fields to render, dotted for fields of
+    embedded objects, like `fields=id,city,landlord.name`.
+    Columns of other fields are not read.
+
+    *   `expand`: comma separated relations to embed, dotted for nested
+    ones. Relations not listed are rendered as ids, without joining their
+    tables.
+
+    Export:
+
+    *   `GET /properties/export?format=csv`: streams every Property matching
+    the list filters as CSV, or as one JSON object per line with
+    `format=ndjson`.
+
+    Conditional requests:
+
+    *   `If-None-Match`: list and retrieve responses carry an `ETag`.
+    Sending it back gets `304 Not Modified` while the data is unchanged.
+
+    *   `If-Match`: updates sending the `ETag` of the retrieved record get
+    `412 Precondition Failed` when it was modified meanwhile.
     """
 
     permission_classes = (IsAuthenticated,)
     queryset = Property.objects.all().order_by(
         'city', 'zip_code', 'street')
+    export_fields = ('id', 'city', 'zip_code', 'street', 'number',
+                     'description', 'category', 'beds', 'landlord')
+    eager_loading_actions = ('list', 'retrieve', 'available')
+    bulk_foreign_keys = ('landlord',)
+    cache_actions = ('list', 'retrieve', 'available')
+    # availability is filtered by contracts, which are not rendered
+    cache_dependencies = ('contracts.contract',)
+    # sample list filters and actions for the query plans checks
+    explain_filters = {
+        'q': 'garden', 'landlord_id': 'aryh149jfl0pol1r', 'city': 'London',
+        'zipcode': 'NW16XE', 'street': 'Baker', 'category': 'house',
+        'beds': '2'}
+    explain_actions = {
+        'list': {}, 'available': {'from': '2017-01-01', 'to': '2017-12-31'}}
+    sorted_filters = ('q',)
+    fulltext_filters = ('q',)
+    # substrings of cities and streets are matched walking the ordering
+    scanned_filters = ('city', 'street')
 
     def filter_queryset(self, queryset):
         queryset = super(PropertyView, self).filter_queryset(queryset)
         if self.kwargs.get('pk'):
             return queryset
 
+        # filter by availability
+        if self.action == 'available':
+            start_date, end_date = self.get_availability_dates()
+            # anti-join answered by the contracts property and dates index
+            occupied = Contract.objects.filter(
+                start_date__lte=end_date, end_date__gte=start_date)
+            queryset = queryset.exclude(
+                id__in=occupied.values('property_id'))
+
+        # filter by full text search
+        text = self.request.query_params.get('q')
+        if text:
+            queryset = queryset.search(text)
+
         # filter by landlord
         landlord = self.request.query_params.get('landlord_id')
         if landlord:
@@ -174,6 +281,39 @@ class PropertyView(mixins.RetrieveModelMixin,
                     'Invalid number of beds "{}" for property'.format(beds))
         return queryset
 
+    def get_availability_dates(self):
+        """Returns the dates given for checking properties availability"""
+        dates = []
+        for param in ('from', 'to'):
+            value = self.request.query_params.get(param)
+            if not value:
+                raise Api400('Missing {} parameter containing a '
+                             'date'.format(param))
+            try:
+                parsed = parse_date(value)
+            except ValueError:
+                parsed = None
+            if parsed is None:
+                raise Api400(
+                    'Invalid date "{}" for {} parameter'.format(value, param))
+            dates.append(parsed)
+        if dates[1] < dates[0]:
+            raise Api400('Invalid dates for availability. Ending date should '
+                         'not come before starting date.')
+        return dates
+
+    @list_route(url_path='available')
+    def available(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+    @detail_route(url_path='availability')
+    def availability(self, request, *args, **kwargs):
+        aproperty = self.get_object()
+        start_date, end_date = self.get_availability_dates()
+        available = occupancy_index.is_property_available(
+            aproperty.id, start_date, end_date)
+        return Response({'id': aproperty.id, 'available': available})
+
     def create(self, request, *args, **kwargs):
         landlord_id = request.data.get('landlord', None)
         if landlord_id:
@@ -204,6 +344,6 @@ class PropertyView(mixins.RetrieveModelMixin,
         return super(PropertyView, self).destroy(request, *args, **kwargs)
 
     def get_serializer_class(self):
-        if self.action == 'list' or self.action == 'retrieve':
+        if self.action in ('list', 'retrieve', 'available'):
             return PropertySerializer
         return PropertyModificationsSerializer